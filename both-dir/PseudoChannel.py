@@ -18,8 +18,9 @@ import json
 from pprint import pprint
 import random
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from plexapi.server import PlexServer
-import schedule
 from time import sleep
 from src import PseudoChannelDatabase
 from src import Movie
@@ -30,6 +31,11 @@ from src import Video
 from src import PseudoDailyScheduleController
 from src import PseudoChannelCommercial
 from src import PseudoChannelRandomMovie
+from src import ScheduleTime
+from src import TimeGrid
+from src import DailyScheduleRow
+from src import PseudoChannelTimer
+from src import PseudoChannelRunner
 import pseudo_config as config
 from importlib import reload
 
@@ -51,12 +57,27 @@ class PseudoChannel():
     DEBUG = config.debug_mode
     ROTATE_LOG = config.rotateLog
     USE_DIRTY_GAP_FIX = config.useDirtyGapFix
+    COMMERCIAL_NO_REPEAT_WINDOW = getattr(config, 'commercialNoRepeatWindow', 10)
+    COMMERCIAL_SEED = getattr(config, 'commercialSeed', None)
     HTML_PSEUDO_TITLE = config.htmlPseudoTitle
-
-    def __init__(self):
+    BULK_METADATA_PAGE_SIZE = getattr(config, 'bulkMetadataPageSize', 100)
+    PLEX_FETCH_WORKERS = getattr(config, 'plexFetchWorkers', 8)
+    SYNC_SETTING_PREFIX = 'sync_hwm:'
+    PLEX_TYPE_IDS = {'movie' : 1, 'show' : 2, 'episode' : 4, 'artist' : 8}
+    METADATA_TAG_ELEMENTS = {
+        'genres' : 'Genre',
+        'actors' : 'Role',
+        'collections' : 'Collection',
+        'similar' : 'Similar',
+    }
+    # the tags stored for each kind of item (a bulk element without one of these lists gets a fetchItem())
+    MEDIA_TAG_ATTRIBUTES = {'movie' : ('genres', 'actors', 'collections'), 'show' : ('genres', 'actors', 'similar')}
+
+    def __init__(self, database="pseudo-channel.db"):
 
         logging.basicConfig(filename="pseudo-channel.log", level=logging.INFO)
-        self.db = PseudoChannelDatabase("pseudo-channel.db")
+        self.db = PseudoChannelDatabase(database,
+            PseudoChannelDatabase.find_library(os.getcwd(), getattr(config, 'libraryDatabase', PseudoChannelDatabase.LIBRARY_DATABASE)))
         self.controller = PseudoDailyScheduleController(
             config.baseurl, 
             config.token, 
@@ -64,11 +85,14 @@ class PseudoChannel():
             self.CONTROLLER_SERVER_PATH,
             self.CONTROLLER_SERVER_PORT,
             self.DEBUG,
-            self.HTML_PSEUDO_TITLE
+            self.HTML_PSEUDO_TITLE,
+            artworkLookup=self.db.get_art
         )
 
         self.movieMagic = PseudoChannelRandomMovie()
 
+        self.metadata_stats = {'items' : 0, 'requests' : 0, 'fallbacks' : 0}
+
     """Database functions.
         update_db(): Grab the media from the Plex DB and store it in the local pseudo-channel.db.
         drop_db(): Drop the local database. Fresh start. 
@@ -100,6 +124,231 @@ class PseudoChannel():
         #    sys.stdout.write('\n')
         sys.stdout.flush()
 
+    '''
+    *
+    * Fetch the full metadata (genres, actors, collections, similar) of every item in a library section
+    * by asking Plex for up to BULK_METADATA_PAGE_SIZE items per request (/library/metadata/<key>,<key>,...)
+    * instead of one fetchItem() round trip per item.
+    * @param sectionMedia: list of items returned by section.all()
+    * @return dict: ratingKey -> {'genres': [...], 'actors': [...], 'collections': [...], 'similar': [...]},
+    *         None for a list the element doesn't have
+    *
+    '''
+    def get_section_metadata(self, sectionMedia):
+
+        sectionMetadata = {}
+        if self.BULK_METADATA_PAGE_SIZE < 1:
+            return sectionMetadata
+        keys = [str(media.ratingKey) for media in sectionMedia]
+        pages = [keys[start:start + self.BULK_METADATA_PAGE_SIZE] for start in range(0, len(keys), self.BULK_METADATA_PAGE_SIZE)]
+        for page, container in self.fetch_concurrently(self.get_metadata_page, pages):
+            self.metadata_stats['requests'] += 1
+            if container is None:
+                continue
+            for element in container:
+                ratingKey = element.attrib.get('ratingKey')
+                if ratingKey is None:
+                    continue
+                sectionMetadata[ratingKey] = {
+                    attribute: [tag.attrib.get('tag') for tag in element.findall(tagName)] if element.find(tagName) is not None else None
+                    for attribute, tagName in self.METADATA_TAG_ELEMENTS.items()
+                }
+        return sectionMetadata
+
+    def get_metadata_page(self, page):
+
+        try:
+            return self.PLEX.query('/library/metadata/' + ','.join(page) + '?includeGuids=1')
+        except Exception as e:
+            print("\nERROR: Bulk metadata request failed, falling back to fetching items one by one")
+            print(e)
+            return None
+
+    '''
+    *
+    * Get the genres / actors / collections / similar tags of a media item, using the bulk payload
+    * when it has the item's lists and falling back to a single fetchItem() for the lists it doesn't.
+    *
+    '''
+    def get_media_tags(self, media, sectionMetadata):
+
+        self.metadata_stats['items'] += 1
+        bulkTags = sectionMetadata.get(str(media.ratingKey), {})
+        tags = dict((attribute, bulkTags.get(attribute) or []) for attribute in self.METADATA_TAG_ELEMENTS)
+        missing = [attribute for attribute in self.MEDIA_TAG_ATTRIBUTES.get(media.type, self.METADATA_TAG_ELEMENTS)
+            if bulkTags.get(attribute) is None]
+        if not missing:
+            return tags
+        self.metadata_stats['fallbacks'] += 1
+        fetchMedia = self.PLEX.fetchItem(media.key)
+        for attribute in missing:
+            try:
+                tags[attribute] = [tag.tag for tag in getattr(fetchMedia, attribute)]
+            except:
+                tags[attribute] = []
+        return tags
+
+    def print_metadata_stats(self):
+
+        stats = self.metadata_stats
+        saved = stats['items'] - stats['requests'] - stats['fallbacks']
+        print("INFO: Metadata for {} items fetched in {} bulk requests + {} single requests, {} round trips saved".format(
+            stats['items'], stats['requests'], stats['fallbacks'], max(saved, 0)))
+
+    def fetch_concurrently(self, fetch, items):
+
+        """Run fetch(item) for every item on a pool of PLEX_FETCH_WORKERS threads and yield (item, result) in the
+        original order. Only the Plex requests run in the pool, the caller stays the single writer of the database.
+        At most 2 * PLEX_FETCH_WORKERS results wait for the caller, so a whole library's episodes never pile up ahead of it."""
+        if self.PLEX_FETCH_WORKERS < 2:
+            for item in items:
+                yield item, fetch(item)
+            return
+        items = iter(items)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.PLEX_FETCH_WORKERS) as executor:
+            for item in itertools.islice(items, 2 * self.PLEX_FETCH_WORKERS):
+                pending.append((item, executor.submit(fetch, item)))
+            while pending:
+                item, future = pending.popleft()
+                for nextItem in itertools.islice(items, 1):
+                    pending.append((nextItem, executor.submit(fetch, nextItem)))
+                yield item, future.result()
+
+    def get_updated_at(self, media):
+
+        """Unix time a Plex item last changed (falls back to when it was added)."""
+        stamp = getattr(media, 'updatedAt', None) or getattr(media, 'addedAt', None)
+        if stamp is None:
+            return 0
+        return int(mktime(stamp.timetuple()))
+
+    def get_art(self, media):
+
+        """The art path of a Plex item ("/library/metadata/<key>/art/<stamp>"), '' when it has none."""
+        art = getattr(media, 'art', None)
+        return art if isinstance(art, str) else ''
+
+    def add_show_episodes_to_db(self, section, media, episodes, prefix):
+
+        """Add every episode of one show to the episodes table, in Plex order. Returns the newest updatedAt seen."""
+        newest = 0
+        rows = []
+        for j, episode in enumerate(episodes):
+            newest = max(newest, self.get_updated_at(episode))
+            duration = episode.duration
+            rows.append((
+                    media.ratingKey if duration else episode.ratingKey, 
+                    episode.title, 
+                    duration if duration else 0, 
+                    episode.index, 
+                    episode.parentIndex, 
+                    media.title,
+                    episode.key,
+                    section.title,
+                    episode.contentRating,
+                    episode.originallyAvailableAt,
+                    episode.summary
+                ))
+            self.print_progress(
+                    j + 1,
+                    len(episodes),
+                    prefix = prefix+" "+media.title+': ',
+                    suffix = 'Complete ['+episode.title[0:40]+']',
+                    bar_length = 40
+                )
+        self.db.add_episodes_to_db_many(rows)
+        return newest
+
+    def add_shows_with_episodes_to_db(self, section, sectionMedia):
+
+        """Add shows (and all of their episodes) to the database. Returns the newest updatedAt seen."""
+        newest = 0
+        sectionMetadata = self.get_section_metadata(sectionMedia)
+        for i, media in enumerate(sectionMedia):
+            newest = max(newest, self.get_updated_at(media))
+            tags = self.get_media_tags(media, sectionMetadata)
+            self.db.add_shows_to_db(
+                media.ratingKey, 
+                media.title, 
+                media.duration if media.duration else 1, 
+                '', 
+                media.originallyAvailableAt, 
+                media.key, 
+                section.title,
+                media.contentRating,
+                str(tags['genres']),
+                str(tags['actors']),
+                str(tags['similar']),
+                media.studio,
+                self.get_art(media)
+            )
+            self.print_progress(
+                    i + 1,
+                    len(sectionMedia),
+                    prefix = 'TV Show '+str(i+1)+' of '+str(len(sectionMedia))+': ',
+                    suffix = 'Complete ['+media.title[0:40]+']',
+                    bar_length = 40
+                )
+        #add all episodes of each tv show to episodes table
+        showEpisodes = self.fetch_concurrently(lambda media: media.episodes(), sectionMedia)
+        for i, (media, episodes) in enumerate(showEpisodes):
+            newest = max(newest, self.add_show_episodes_to_db(
+                section,
+                media,
+                episodes,
+                str(i+1)+' of '+str(len(sectionMedia))
+            ))
+        return newest
+
+    def add_movies_section_to_db(self, section, sectionMedia):
+
+        newest = 0
+        sectionMetadata = self.get_section_metadata(sectionMedia)
+        for i, media in enumerate(sectionMedia):
+            newest = max(newest, self.get_updated_at(media))
+            tags = self.get_media_tags(media, sectionMetadata)
+            self.db.add_movies_to_db(media.ratingKey, media.title, media.duration, media.key, section.title, media.contentRating, media.summary, media.originallyAvailableAt, str(tags['genres']), str(tags['actors']), str(tags['collections']), media.studio, self.get_art(media))
+            self.print_progress(
+                    i + 1, 
+                    len(sectionMedia), 
+                    prefix = section.title+" "+str(i+1)+' of '+str(len(sectionMedia))+": ", 
+                    suffix = 'Complete ['+media.title+']', 
+                    bar_length = 40
+                )
+        return newest
+
+    def add_commercials_section_to_db(self, section, sectionMedia):
+
+        newest = 0
+        media_length = len(sectionMedia)
+        for i, media in enumerate(sectionMedia):
+            newest = max(newest, self.get_updated_at(media))
+            self.db.add_commercials_to_db(3, media.title, media.duration, media.key, section.title, self.get_art(media))
+            self.print_progress(
+                i + 1, 
+                media_length, 
+                prefix = section.title+" "+str(i+1)+' of '+str(len(sectionMedia))+":", 
+                suffix = 'Complete['+media.title[0:40]+']', 
+                bar_length = 40
+            )
+        return newest
+
+    def update_db_section(self, section, correct_lib_name):
+
+        """Full update of one library section. Records the sync high-water mark used by update_db_sync()."""
+        sectionMedia = self.PLEX.library.section(section.title).all()
+        with self.db.batch():
+            if correct_lib_name == "Movies":
+                newest = self.add_movies_section_to_db(section, sectionMedia)
+            elif correct_lib_name == "TV Shows":
+                newest = self.add_shows_with_episodes_to_db(section, sectionMedia)
+            elif correct_lib_name == "Commercials":
+                newest = self.add_commercials_section_to_db(section, sectionMedia)
+            else:
+                return
+            self.db.set_setting(self.SYNC_SETTING_PREFIX+section.title, newest)
+
     def update_db(self):
 
         print("NOTICE: Updating Local Database")
@@ -109,259 +358,224 @@ class PseudoChannel():
         for section in sections:
             for correct_lib_name, user_lib_name in libs_dict.items():
                 if section.title.lower() in [x.lower() for x in user_lib_name]:
-                    if correct_lib_name == "Movies":
-                        sectionMedia = self.PLEX.library.section(section.title).all()
-                        for i, media in enumerate(sectionMedia):
-                            fetchMedia = self.PLEX.fetchItem(media.key)
-                            try:
-                                genres = [genre.tag for genre in fetchMedia.genres]
-                            except:
-                                genres = ''
-                            try:
-                                actors = [actor.tag for actor in fetchMedia.actors]
-                            except:
-                                actors = ''
-                            try:
-                                collections = [collection.tag for collection in fetchMedia.collections]
-                            except:
-                                collections = ''
-                            #actors = {}
-                            #for actor in fetchMedia.actors:
-                            #    actors[actor.tag] = str(actor.id)
-                            self.db.add_movies_to_db(media.ratingKey, media.title, media.duration, media.key, section.title, media.contentRating, media.summary, media.originallyAvailableAt, str(genres), str(actors), str(collections), media.studio)
-                            self.print_progress(
-                                    i + 1, 
-                                    len(sectionMedia), 
-                                    prefix = section.title+" "+str(i+1)+' of '+str(len(sectionMedia))+": ", 
-                                    suffix = 'Complete ['+media.title+']', 
-                                    bar_length = 40
-                                )
-                        #print('')
-                    elif correct_lib_name == "TV Shows":
-                        sectionMedia = self.PLEX.library.section(section.title).all()
-                        for i, media in enumerate(sectionMedia):
-                            fetchMedia = self.PLEX.fetchItem(media.key)
-                            try:
-                                genres = [genre.tag for genre in fetchMedia.genres]
-                            except:
-                                genres = ''
-                            try:
-                                actors = [actor.tag for actor in fetchMedia.actors]
-                            except:
-                                actors = ''
-                            try:
-                                similars = [similar.tag for similar in fetchMedia.similar]
-                            except:
-                                similars = ''
-
-                            self.db.add_shows_to_db(
-                                media.ratingKey, 
-                                media.title, 
-                                media.duration if media.duration else 1, 
-                                '', 
-                                media.originallyAvailableAt, 
-                                media.key, 
-                                section.title,
-                                media.contentRating,
-                                str(genres),
-                                str(actors),
-                                str(similars),
-                                media.studio
-                            )
-                            self.print_progress(
-                                    i + 1,
-                                    len(sectionMedia),
-                                    prefix = 'TV Show '+str(i+1)+' of '+str(len(sectionMedia))+': ',
-                                    suffix = 'Complete ['+media.title[0:40]+']',
-                                    bar_length = 40
-                                )
-                        #add all episodes of each tv show to episodes table
-                        for i, media in enumerate(sectionMedia):
-                            episodes = self.PLEX.library.section(section.title).get(media.title).episodes()
-                            for j, episode in enumerate(episodes):
-                                duration = episode.duration
-                                if duration:
-                                    self.db.add_episodes_to_db(
-                                            media.ratingKey, 
-                                            episode.title, 
-                                            duration, 
-                                            episode.index, 
-                                            episode.parentIndex, 
-                                            media.title,
-                                            episode.key,
-                                            section.title,
-                                            episode.contentRating,
-                                            episode.originallyAvailableAt,
-                                            episode.summary
-                                        )
-                                else:
-                                    self.db.add_episodes_to_db(
-                                            episode.ratingKey, 
-                                            episode.title, 
-                                            0, 
-                                            episode.index, 
-                                            episode.parentIndex, 
-                                            media.title,
-                                            episode.key,
-                                            section.title,
-                                            episode.contentRating,
-                                            episode.originallyAvailableAt,
-                                            episode.summary
-                                        )
-                                self.print_progress(
-                                        j + 1,
-                                        len(episodes),
-                                        prefix = str(i+1)+' of '+str(len(sectionMedia))+" "+media.title+': ',
-                                        suffix = 'Complete ['+episode.title[0:40]+']',
-                                        bar_length = 40
-                                    )
-                        #print('')
-                    elif correct_lib_name == "Commercials":
-                        sectionMedia = self.PLEX.library.section(section.title).all()
-                        media_length = len(sectionMedia)
-                        for i, media in enumerate(sectionMedia):
-                            self.db.add_commercials_to_db(3, media.title, media.duration, media.key, section.title)
-                            self.print_progress(
-                                i + 1, 
-                                media_length, 
-                                prefix = section.title+" "+str(i+1)+' of '+str(len(sectionMedia))+":", 
-                                suffix = 'Complete['+media.title[0:40]+']', 
-                                bar_length = 40
-                            )
-                        #print('')
+                    self.update_db_section(section, correct_lib_name)
         dothething = "yes"
         if dothething == "yes":
-            playlists = self.PLEX.playlists()
-            for i, playlist in enumerate(playlists):
-                duration_average = playlist.duration / playlist.leafCount
-                playlist_added = playlist.addedAt.strftime("%Y-%m-%d %H:%M:%S")
-                self.db.add_shows_to_db(
-                    playlist.ratingKey,
-                    playlist.title,
-                    duration_average,
-                    '',
-                    playlist_added,
-                    playlist.key,
-                    playlist.type,
-                    '',
-                    '',
-                    '',
-                    '',
-                    ''
-                )
-                # add all entries of playlist to episodes table
-                episodes = self.PLEX.playlist(playlist.title).items()
-                for j, episode in enumerate(episodes):
-                    duration = episode.duration
-                    sectionTitle = "Playlists"
-                    itemID = str(episode.playlistItemID)
-                    itemData = self.PLEX.fetchItem(episode.key)
-                    if itemData.type == "episode":
-                        sNo = str(itemData.parentIndex)
-                        eNo = str(itemData.index)
-                        plTitle = episode.grandparentTitle +" - "+ episode.title + " (S" + sNo + "E" + eNo + ")"
-                    else:
-                        sNo = "0"
-                        eNo = "0"
-                        plTitle = episode.title + " ("+str(episode.year)+")"
-                    if duration:
-                        self.db.add_playlist_entries_to_db(
-                            episode.ratingKey,
-                            plTitle,
-                            duration,
-                            eNo,
-                            sNo,
-                            playlist.title,
-                            episode.key,
-                            sectionTitle,
-                            episode.contentRating,
-                            episode.originallyAvailableAt,
-                            episode.summary
-                        )
-                    else:
-                        self.db.add_playlist_entries_to_db(
-                            episode.ratingKey,
-                            episode.title,
-                            0,
-                            eNo,
-                            sNo,
-                            playlist.title,
-                            episode.key,
-                            sectionTitle,
-                            episode.contentRating,
-                            episode.originallyAvailableAt,
-                            episode.summary
-                        )
-                    self.print_progress(
-                        j + 1,
-                        len(episodes),
-                        prefix = 'Playlist '+str(i+1)+' of '+str(len(playlists))+': ',
-                        suffix = 'Complete ['+playlist.title[0:40]+']',
-                        bar_length = 40
+            with self.db.batch():
+                playlists = self.PLEX.playlists()
+                playlistItems = self.fetch_concurrently(lambda playlist: self.PLEX.playlist(playlist.title).items(), playlists)
+                for i, (playlist, episodes) in enumerate(playlistItems):
+                    duration_average = playlist.duration / playlist.leafCount
+                    playlist_added = playlist.addedAt.strftime("%Y-%m-%d %H:%M:%S")
+                    self.db.add_shows_to_db(
+                        playlist.ratingKey,
+                        playlist.title,
+                        duration_average,
+                        '',
+                        playlist_added,
+                        playlist.key,
+                        playlist.type,
+                        '',
+                        '',
+                        '',
+                        '',
+                        ''
                     )
+                    # add all entries of playlist to episodes table
+                    playlistEntries = self.fetch_concurrently(lambda episode: self.PLEX.fetchItem(episode.key), episodes)
+                    for j, (episode, itemData) in enumerate(playlistEntries):
+                        duration = episode.duration
+                        sectionTitle = "Playlists"
+                        itemID = str(episode.playlistItemID)
+                        if itemData.type == "episode":
+                            sNo = str(itemData.parentIndex)
+                            eNo = str(itemData.index)
+                            plTitle = episode.grandparentTitle +" - "+ episode.title + " (S" + sNo + "E" + eNo + ")"
+                        else:
+                            sNo = "0"
+                            eNo = "0"
+                            plTitle = episode.title + " ("+str(episode.year)+")"
+                        if duration:
+                            self.db.add_playlist_entries_to_db(
+                                episode.ratingKey,
+                                plTitle,
+                                duration,
+                                eNo,
+                                sNo,
+                                playlist.title,
+                                episode.key,
+                                sectionTitle,
+                                episode.contentRating,
+                                episode.originallyAvailableAt,
+                                episode.summary
+                            )
+                        else:
+                            self.db.add_playlist_entries_to_db(
+                                episode.ratingKey,
+                                episode.title,
+                                0,
+                                eNo,
+                                sNo,
+                                playlist.title,
+                                episode.key,
+                                sectionTitle,
+                                episode.contentRating,
+                                episode.originallyAvailableAt,
+                                episode.summary
+                            )
+                        self.print_progress(
+                            j + 1,
+                            len(episodes),
+                            prefix = 'Playlist '+str(i+1)+' of '+str(len(playlists))+': ',
+                            suffix = 'Complete ['+playlist.title[0:40]+']',
+                            bar_length = 40
+                        )
                 #print('', end='\r')
             sys.stdout.write("\033[K")
             sys.stdout.write('\rNOTICE: Database Update Complete!')
             print('')
+            self.print_metadata_stats()
+            self.db.rebuild_tag_tables()
+            self.db.rebuild_show_stats()
+
+    def get_section_total_size(self, section, plexType):
+
+        """Ask Plex how many items of a type a section holds without downloading them."""
+        container = self.PLEX.query('/library/sections/%s/all?type=%d&X-Plex-Container-Start=0&X-Plex-Container-Size=0' % (section.key, plexType))
+        return int(container.attrib.get('totalSize', container.attrib.get('size', 0)))
+
+    def remove_vanished_media(self, section, table, plexType):
+
+        """Delete rows of a section whose items no longer exist in Plex.
+        The full key listing is only downloaded when the local row count and the Plex count disagree."""
+        localCount = self.db.get_section_row_count(table, section.title)
+        if localCount == self.get_section_total_size(section, plexType):
+            return 0
+        container = self.PLEX.query('/library/sections/%s/all?type=%d' % (section.key, plexType))
+        plexKeys = set('/library/metadata/'+element.attrib['ratingKey'] for element in container if 'ratingKey' in element.attrib)
+        vanished = [key for key in self.db.get_section_plexMediaIDs(table, section.title) if key not in plexKeys]
+        self.db.remove_media_by_plexMediaID(table, vanished)
+        return len(vanished)
+
+    def sync_db_section(self, section, correct_lib_name, since):
+
+        """Incremental update of one library section: only items Plex reports as changed after 'since'
+        are (re)written, then rows for items that were removed from Plex are deleted."""
+        newest = since
+        sectionType = self.PLEX_TYPE_IDS.get(section.type, 1)
+        changed = self.PLEX.fetchItems('/library/sections/%s/all?updatedAt>>=%d' % (section.key, since))
+        if correct_lib_name == "Movies":
+            newest = max(newest, self.add_movies_section_to_db(section, changed))
+            removed = self.remove_vanished_media(section, 'movies', sectionType)
+        elif correct_lib_name == "Commercials":
+            newest = max(newest, self.add_commercials_section_to_db(section, changed))
+            removed = self.remove_vanished_media(section, 'commercials', sectionType)
+        elif correct_lib_name == "TV Shows":
+            changedEpisodes = self.PLEX.fetchItems('/library/sections/%s/all?type=%d&updatedAt>>=%d' % (section.key, self.PLEX_TYPE_IDS['episode'], since))
+            showKeys = [show.ratingKey for show in changed]
+            for episode in changedEpisodes:
+                newest = max(newest, self.get_updated_at(episode))
+                if episode.grandparentRatingKey not in showKeys:
+                    showKeys.append(episode.grandparentRatingKey)
+            shows = changed + [show for key, show in self.fetch_concurrently(lambda key: self.PLEX.fetchItem(int(key)), showKeys[len(changed):])]
+            # A changed show is re-added whole so its episodes keep their Plex order (the episode queue walks episodes by id),
+            # then gets its place in the queue back
+            queues = self.db.remove_shows_for_update([show.key for show in shows], section.title)
+            newest = max(newest, self.add_shows_with_episodes_to_db(section, shows))
+            self.db.restore_show_queues(queues)
+            removed = self.remove_vanished_media(section, 'shows', sectionType)
+            removed += self.remove_vanished_media(section, 'episodes', self.PLEX_TYPE_IDS['episode'])
+        else:
+            return
+        self.db.set_setting(self.SYNC_SETTING_PREFIX+section.title, newest)
+        sys.stdout.write("\033[K")
+        print("\rINFO: "+section.title+": "+str(len(changed))+" changed, "+str(removed)+" removed")
+
+    def update_db_sync(self):
+
+        """Incremental version of update_db(). Sections that were never fully imported fall back to a full update.
+        Playlists are not touched, use update_db() to refresh them."""
+        print("NOTICE: Syncing Local Database with Plex changes")
+        self.db.create_tables()
+        libs_dict = config.plexLibraries
+        sections = self.PLEX.library.sections()
+        for section in sections:
+            for correct_lib_name, user_lib_name in libs_dict.items():
+                if section.title.lower() in [x.lower() for x in user_lib_name]:
+                    since = self.db.get_setting(self.SYNC_SETTING_PREFIX+section.title)
+                    if since is None:
+                        print("NOTICE: "+section.title+" has not been synced before, doing a full update")
+                        self.update_db_section(section, correct_lib_name)
+                    else:
+                        with self.db.batch():
+                            self.sync_db_section(section, correct_lib_name, int(since))
+        sys.stdout.write("\033[K")
+        sys.stdout.write('\rNOTICE: Database Sync Complete!')
+        print('')
+        self.print_metadata_stats()
+        self.db.rebuild_tag_tables()
+        self.db.rebuild_show_stats()
+
     def update_db_playlist(self):
         dothething = "yes"
         if dothething == "yes":
-            playlists = self.PLEX.playlists()
-            for i, playlist in enumerate(playlists):
-                duration_average = playlist.duration / playlist.leafCount
-                self.db.add_shows_to_db(
-                    2,
-                    playlist.title,
-                    duration_average,
-                    '',
-                    '',
-                    playlist.key,
-                    playlist.type
-                )
-                # add all entries of playlist to episodes table
-                episodes = self.PLEX.playlist(playlist.title).items()
-                for j, episode in enumerate(episodes):
-                    duration = episode.duration
-                    sectionTitle = "Playlists"
-                    itemID = str(episode.playlistItemID)
-                    itemData = self.PLEX.fetchItem(episode.key)
-                    if itemData.type == "episode":
-                        sNo = str(itemData.parentIndex)
-                        eNo = str(itemData.index)
-                        plTitle = episode.grandparentTitle +" - "+ episode.title + " (S" + sNo + "E" + eNo + ")"
-                    else:
-                        sNo = "0"
-                        eNo = "0"
-                        plTitle = episode.title + " ("+str(episode.year)+")"
-                    if duration:
-                        self.db.add_playlist_entries_to_db(
-                            5,
-                            plTitle,
-                            duration,
-                            eNo,
-                            sNo,
-                            playlist.title,
-                            episode.key,
-                            sectionTitle
-                        )
-                    else:
-                        self.db.add_playlist_entries_to_db(
-                            5,
-                            episode.title,
-                            0,
-                            eNo,
-                            sNo,
-                            playlist.title,
-                            episode.key,
-                            sectionTitle
-                        )
-                    self.print_progress(
-                        j + 1,
-                        len(episodes),
-                        prefix = 'Progress Playlist '+str(i+1)+' of '+str(len(playlists))+': ',
-                        suffix = 'Complete ['+playlist.title+']',
-                        bar_length = 40
+            with self.db.batch():
+                playlists = self.PLEX.playlists()
+                playlistItems = self.fetch_concurrently(lambda playlist: self.PLEX.playlist(playlist.title).items(), playlists)
+                for i, (playlist, episodes) in enumerate(playlistItems):
+                    duration_average = playlist.duration / playlist.leafCount
+                    self.db.add_shows_to_db(
+                        2,
+                        playlist.title,
+                        duration_average,
+                        '',
+                        '',
+                        playlist.key,
+                        playlist.type
                     )
+                    # add all entries of playlist to episodes table
+                    playlistEntries = self.fetch_concurrently(lambda episode: self.PLEX.fetchItem(episode.key), episodes)
+                    for j, (episode, itemData) in enumerate(playlistEntries):
+                        duration = episode.duration
+                        sectionTitle = "Playlists"
+                        itemID = str(episode.playlistItemID)
+                        if itemData.type == "episode":
+                            sNo = str(itemData.parentIndex)
+                            eNo = str(itemData.index)
+                            plTitle = episode.grandparentTitle +" - "+ episode.title + " (S" + sNo + "E" + eNo + ")"
+                        else:
+                            sNo = "0"
+                            eNo = "0"
+                            plTitle = episode.title + " ("+str(episode.year)+")"
+                        if duration:
+                            self.db.add_playlist_entries_to_db(
+                                5,
+                                plTitle,
+                                duration,
+                                eNo,
+                                sNo,
+                                playlist.title,
+                                episode.key,
+                                sectionTitle
+                            )
+                        else:
+                            self.db.add_playlist_entries_to_db(
+                                5,
+                                episode.title,
+                                0,
+                                eNo,
+                                sNo,
+                                playlist.title,
+                                episode.key,
+                                sectionTitle
+                            )
+                        self.print_progress(
+                            j + 1,
+                            len(episodes),
+                            prefix = 'Progress Playlist '+str(i+1)+' of '+str(len(playlists))+': ',
+                            suffix = 'Complete ['+playlist.title+']',
+                            bar_length = 40
+                        )
                 #print('', end='\r')
             sys.stdout.write("\033[K")
             sys.stdout.write('\rNOTICE: Playlist Database Update Complete!')
@@ -378,31 +592,11 @@ class PseudoChannel():
                 if section.title.lower() in [x.lower() for x in user_lib_name]:
                     if correct_lib_name == "Movies":
                         sectionMedia = self.PLEX.library.section(section.title).all()
-                        for i, media in enumerate(sectionMedia):
-                            fetchMedia = self.PLEX.fetchItem(media.key)
-                            try:
-                                genres = [genre.tag for genre in fetchMedia.genres]
-                            except:
-                                genres = ''
-                            try:
-                                actors = [actor.tag for actor in fetchMedia.actors]
-                            except:
-                                actors = ''
-                            try:
-                                collections = [collection.tag for collection in fetchMedia.collections]
-                            except:
-                                collections = ''
-                            #actors = {}
-                            #for actor in fetchMedia.actors:
-                            #    actors[actor.tag] = str(actor.id)
-                            self.db.add_movies_to_db(media.key.replace('/library/metadata/',''), media.title, media.duration, media.key, section.title, media.contentRating, media.summary, media.originallyAvailableAt, str(genres), str(actors), str(collections), media.studio)
-                            self.print_progress(
-                                    i + 1, 
-                                    len(sectionMedia), 
-                                    prefix = 'Progress '+section.title+": ", 
-                                    suffix = 'Complete ['+media.title+']', 
-                                    bar_length = 40
-                                )
+                        with self.db.batch():
+                            self.add_movies_section_to_db(section, sectionMedia)
+        print('')
+        self.print_metadata_stats()
+        self.db.rebuild_tag_tables()
     def update_db_tv(self):
 
         print("NOTICE: Updating Local Database, TV ONLY")
@@ -414,57 +608,15 @@ class PseudoChannel():
                 if section.title.lower() in [x.lower() for x in user_lib_name]:
                     if correct_lib_name == "TV Shows":
                         sectionMedia = self.PLEX.library.section(section.title).all()
-                        for i, media in enumerate(sectionMedia):
-                            backgroundImagePath = self.PLEX.library.section(section.title).get(media.title)
-                            backgroundImgURL = ''
-                            if isinstance(backgroundImagePath.art, str):
-                                backgroundImgURL = config.baseurl+backgroundImagePath.art+"?X-Plex-Token="+config.token
-                            self.db.add_shows_to_db(
-                                2, 
-                                media.title, 
-                                media.duration if media.duration else 1, 
-                                '', 
-                                backgroundImgURL, 
-                                media.key, 
-                                section.title
-                            )
-                            #add all episodes of each tv show to episodes table
-                            episodes = self.PLEX.library.section(section.title).get(media.title).episodes()
-                            for j, episode in enumerate(episodes):
-                                duration = episode.duration
-                                if duration:
-                                    self.db.add_episodes_to_db(
-                                            4, 
-                                            episode.title, 
-                                            duration, 
-                                            episode.index, 
-                                            episode.parentIndex, 
-                                            media.title,
-                                            episode.key,
-                                            section.title
-                                        )
-                                else:
-                                    self.db.add_episodes_to_db(
-                                            4, 
-                                            episode.title, 
-                                            0, 
-                                            episode.index, 
-                                            episode.parentIndex, 
-                                            media.title,
-                                            episode.key,
-                                            section.title
-                                        )
-                                self.print_progress(
-                                        j + 1,
-                                        len(episodes),
-                                        prefix = 'Progress TV Show '+str(i+1)+' of '+str(len(sectionMedia))+': ',
-                                        suffix = 'Complete ['+media.title+']',
-                                        bar_length = 40
-                                    )
+                        with self.db.batch():
+                            self.add_shows_with_episodes_to_db(section, sectionMedia)
             #print('', end='\r')
         sys.stdout.write("\033[K")
         sys.stdout.write('\rNOTICE: TV Shows Database Update Complete!')
         print('')
+        self.print_metadata_stats()
+        self.db.rebuild_tag_tables()
+        self.db.rebuild_show_stats()
     def update_db_comm(self):
 
         print("NOTICE: Updating Local Database, COMMERCIALS ONLY")
@@ -476,16 +628,8 @@ class PseudoChannel():
                 if section.title.lower() in [x.lower() for x in user_lib_name]:
                     if correct_lib_name == "Commercials":
                         sectionMedia = self.PLEX.library.section(section.title).all()
-                        media_length = len(sectionMedia)
-                        for i, media in enumerate(sectionMedia):
-                            self.db.add_commercials_to_db(3, media.title, media.duration, media.key, section.title)
-                            self.print_progress(
-                                i + 1, 
-                                media_length, 
-                                prefix = 'Progress '+section.title+":", 
-                                suffix = 'Complete ['+media.title[0:12]+']', 
-                                bar_length = 40
-                            )
+                        with self.db.batch():
+                            self.add_commercials_section_to_db(section, sectionMedia)
             #print('', end='\r')
         sys.stdout.write("\033[K")
         sys.stdout.write('\rNOTICE: Commercials Database Update Complete!')
@@ -599,15 +743,10 @@ class PseudoChannel():
     def time_diff(self, time1,time2):
         '''
         *
-        * Getting the offest by comparing both times from the unix epoch time and getting the difference.
+        * Minutes from time1 to time2 ("%H:%M:%S"), worked out on seconds since the start of the day.
         *
         '''
-        timeA = datetime.datetime.strptime(time1, pseudo_channel.APP_TIME_FORMAT_STR)
-        timeB = datetime.datetime.strptime(time2, pseudo_channel.APP_TIME_FORMAT_STR)
-        timeAEpoch = calendar.timegm(timeA.timetuple())
-        timeBEpoch = calendar.timegm(timeB.timetuple())
-        tdelta = abs(timeAEpoch) - abs(timeBEpoch)
-        return int(tdelta/60)
+        return ScheduleTime.diff_minutes(time1, time2)
 
 
     '''
@@ -622,58 +761,38 @@ class PseudoChannel():
         self.TIME_GAP = timeGap
         self.OVERLAP_GAP = timeGap
         self.OVERLAP_MAX = overlapMax
-        time1 = prevEndTime.strftime(self.APP_TIME_FORMAT_STR)
-        timeB = datetime.datetime.strptime(intendedStartTime, self.APP_TIME_FORMAT_STR).strftime(self.APP_TIME_FORMAT_STR)
-        print("INFO: Previous End Time: ", time1, "Intended start time: ", timeB)
-        timeDiff = self.time_diff(time1, timeB)
+        prevEnd = ScheduleTime.to_seconds(prevEndTime)
+        intendedStart = ScheduleTime.to_seconds(intendedStartTime)
+        print("INFO: Previous End Time: ", ScheduleTime.to_string(prevEnd), "Intended start time: ", ScheduleTime.to_string(intendedStart))
+        timeDiff = ScheduleTime.diff_minutes(prevEnd, intendedStart)
         print("INFO: Time Difference = "+ str(timeDiff))
-        newTimeObj = timeB
-        newStartTime = timeB
-        
+        newStartTime = intendedStart
+        grid = TimeGrid.get(self.OVERLAP_GAP)
+        print("INFO: Last Element of the Day: ", ScheduleTime.to_string(grid.last))
+
         '''
         *
         * ADDED PIECE 6/21/18: Need to check if we are near the day's end
-        * We will do this by checking if our previous end time is larger than ALL times
-        * Listed in the "timeset" variable. If it is, we must have hit the end of a
-        * day and can simply pick the first value of the timeset. 
+        * We will do this by checking if our previous end time is past the last slot of the
+        * time grid. If it is, we must have hit the end of a day and can simply pick the
+        * first slot of the grid.
         *
         * If this doesn't apply, simply move on to the regular "checks"
         *
         '''
-        time1A=prevEndTime.strftime('%H:%M:%S')
-        time1A_comp = datetime.datetime.strptime(time1A, '%H:%M:%S') # there was an issue with the date changing to 1/2, so we had to do this for correct comparison
-        timeset=[datetime.time(h,m).strftime("%H:%M:%S") for h,m in itertools.product(range(0,24),range(0,60,int(self.OVERLAP_GAP)))]
-        timeset_last = timeset[-1]
-        theTimeSetInterval_last = datetime.datetime.strptime(timeset_last, '%H:%M:%S')
-        
-        prevEndTime = time1A_comp #maybe this will change things?
-        print("INFO: Previous End Time: ", time1A_comp)
-        print("INFO: Last Element of the Day: ", theTimeSetInterval_last)
-        
-        if time1A_comp > theTimeSetInterval_last:
+        if prevEnd > grid.last:
             print("NOTICE: We are starting a show with the new day.  Using first element of the next day")
-            theTimeSetInterval = datetime.datetime.strptime(timeset[0], '%H:%M:%S') #This must be the element we are looking for
-            newStartTime = theTimeSetInterval
-            '''
-            *
-            * If time difference is negative, then we know there is overlap
-            *
-            '''
+            newStartTime = grid.first
         elif timeDiff < 0:
             '''
             *
-            * If there is an overlap, then the overlapGap var in config will determine the next increment. If it is set to "15", then the show will will bump up to the next 15 minute interval past the hour.
+            * If time difference is negative, then we know there is overlap.
+            * The overlapGap var in config will determine the next increment. If it is set to "15", then the show will will bump up to the next 15 minute interval past the hour.
             *
             '''
             print("NOTICE: OVERLAP DETECTED - elif timeDiff < 0")
-            timeSetToUse = None
-            for time in timeset:
-                theTimeSetInterval = datetime.datetime.strptime(time, '%H:%M:%S')
-                print("INFO: Time Set Interval: "+str(theTimeSetInterval))
-                if theTimeSetInterval >= prevEndTime:
-                    print("NOTICE: There is overlap. Setting new time-interval:", theTimeSetInterval)
-                    newStartTime = theTimeSetInterval
-                    break
+            newStartTime = grid.ceil(prevEnd)
+            print("NOTICE: There is overlap. Setting new time-interval:", ScheduleTime.to_string(newStartTime))
         elif (timeDiff >= 0) and (self.TIME_GAP != -1):
             '''
             *
@@ -682,18 +801,12 @@ class PseudoChannel():
             *
             '''
             print("NOTICE: OVERLAP DETECTED - (timeDiff >= 0) and (self.TIME_GAP != -1)")
-            for time in timeset:
-                theTimeSetInterval = datetime.datetime.strptime(time, '%H:%M:%S')
-                tempTimeTwoStr = datetime.datetime.strptime(time1, self.APP_TIME_FORMAT_STR).strftime('%H:%M:%S')
-                formatted_time_two = datetime.datetime.strptime(tempTimeTwoStr, '%H:%M:%S')
-                if theTimeSetInterval >= formatted_time_two:
-                    print("INFO: Setting new time-interval:", theTimeSetInterval)
-                    newStartTime = theTimeSetInterval
-                    break
+            newStartTime = grid.ceil(prevEnd)
+            print("INFO: Setting new time-interval:", ScheduleTime.to_string(newStartTime))
         else:
             print("NOTICE: time1A_comp < theTimeSetInterval_last")
-        print("INFO: New Start Time = "+newStartTime.strftime(self.APP_TIME_FORMAT_STR))
-        return newStartTime.strftime(self.APP_TIME_FORMAT_STR)
+        print("INFO: New Start Time = "+ScheduleTime.to_string(newStartTime))
+        return ScheduleTime.to_string(newStartTime)
 
     def get_end_time_from_duration(self, startTime, duration):
 
@@ -710,16 +823,23 @@ class PseudoChannel():
         self.db.drop_daily_schedule_table()
         print("NOTICE: Adding New Daily Schedule Table to Database")
         self.db.create_daily_schedule_table()
+        self.db.create_indexes()
+        self.db.ensure_tag_tables()
+        self.db.ensure_show_stats()
 
         if self.USING_COMMERCIAL_INJECTION:
             print("NOTICE: Getting Commercials List from Database")
             self.commercials = PseudoChannelCommercial(
                 self.db.get_commercials(),
                 self.COMMERCIAL_PADDING_IN_SECONDS,
-                self.USE_DIRTY_GAP_FIX
+                self.USE_DIRTY_GAP_FIX,
+                self.COMMERCIAL_NO_REPEAT_WINDOW,
+                None if self.COMMERCIAL_SEED is None else "%s-%s" % (self.COMMERCIAL_SEED, datetime.date.today())
             )
         print("NOTICE: Getting Base Schedule")
         schedule = self.db.get_schedule_alternate(config.dailyUpdateTime)
+        scheduledShows = self.db.get_scheduled_show_titles()
+        self.db.clear_filter_cache()
         weekday_dict = {
             "0" : ["mondays", "weekdays", "everyday"],
             "1" : ["tuesdays", "weekdays", "everyday"],
@@ -739,26 +859,26 @@ class PseudoChannel():
         prev_movies = []
         for entry in schedule:
             schedule_advance_watcher += 1
-            section = entry[9]
+            section = entry.section
             for key, val in weekday_dict.items(): 
-                if str(entry[7]) in str(val) and int(weekno) == int(key):
-                    media_id = entry[2]
+                if str(entry.dayOfWeek) in str(val) and int(weekno) == int(key):
+                    media_id = entry.mediaID
                     if section == "TV Shows":
                         next_episode = None
                         try:
-                            minmax = entry[4].split(",")
+                            minmax = entry.duration.split(",")
                             min = int(minmax[0])
                             min = min * 60000
                             max = int(minmax[1])
                             max = max * 60000
                         except:
-                            minmax = entry[4]
+                            minmax = entry.duration
                             min = int(minmax)
                             min = min * 60000
                             max = int(minmax)
                             max = max * 60000
-                        if str(entry[3]).lower() == "random":
-                            if entry[14] == 0:
+                        if str(entry.title).lower() == "random":
+                            if entry.rerun == 0:
                                 media_id = 998
                             else:
                                 media_id = 999
@@ -774,11 +894,12 @@ class PseudoChannel():
                                                 print("----------------------------------")
                                                 shows = self.PLEX.library.section(theSection.title)
                                                 print("NOTICE: Getting Show That Matches Data Filters")
-                                                the_show = self.db.get_random_show_data("TV Shows",int(min),int(max),entry[15],entry[16],entry[17],entry[18],entry[19],entry[20])
-                                                print("INFO: " + the_show[3])
+                                                the_show = self.db.get_random_show_data("TV Shows",int(min),int(max),entry.year,entry.genres,entry.actors,entry.collections,entry.rating,entry.studio)
+                                                if (the_show != None):
+                                                    print("INFO: " + the_show[3])
                                                 if (the_show == None):
                                                     print("NOTICE: Failed to get shows with data filters, trying with less")
-                                                    the_show = self.db.get_random_show_data("TV Shows",int(min),int(max),entry[15],None,None,None,entry[19],None)
+                                                    the_show = self.db.get_random_show_data("TV Shows",int(min),int(max),entry.year,None,None,None,entry.rating,None)
                                                     #the_show = self.db.get_shows(random.choice(shows_list).title)
                                                     try:
                                                         print("INFO: "+str(the_show[3]))
@@ -788,87 +909,87 @@ class PseudoChannel():
                                                     print("ACTION: Getting random episode of random show")
                                                     next_episode = self.db.get_random_episode_duration(int(min), int(max))
                                                     attempt = 1
-                                                    episode_duration = next_episode[4]
+                                                    episode_duration = next_episode.duration
                                                     while episode_duration < min or episode_duration > max:
                                                         print("NOTICE: EPISODE LENGTH OUTSIDE PARAMETERS")
                                                         print("ACTION: Getting random episode of random show")
                                                         next_episode = self.db.get_random_episode_duration(int(min), int(max))
-                                                        episode_duration = int(next_episode[4])
+                                                        episode_duration = int(next_episode.duration)
                                                         attempt = attempt + 1
                                                         if attempt > 1000:
                                                             episode_duration = max
                                                         else:
-                                                            episode_duration = int(next_episode[4])
-                                                    print("INFO: Random Selection: "+next_episode[7]+" - S"+str(next_episode[6])+"E"+str(next_episode[5])+" - "+next_episode[3])
+                                                            episode_duration = int(next_episode.duration)
+                                                    print("INFO: Random Selection: "+next_episode.showTitle+" - S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+" - "+next_episode.title)
                                                 else:
-                                                    print("INFO: entry[2] = " + str(entry[2]))
+                                                    print("INFO: entry.mediaID = " + str(entry.mediaID))
                                                     print("INFO: media_id = " + str(media_id))
-                                                    if entry[2] == 999 or media_id == 999:
+                                                    if entry.mediaID == 999 or media_id == 999:
                                                         media_id = 999
                                                         print("ACTION: Choosing random episode of "+the_show[3].upper())
                                                         try:
-                                                            next_episode = self.db.get_random_episode_of_show_by_data(the_show[2],int(min),int(max),entry[15],entry[21].split(',')[0],entry[21].split(',')[1])
+                                                            next_episode = self.db.get_random_episode_of_show_by_data(the_show[2],int(min),int(max),entry.year,entry.seasonEpisode.split(',')[0],entry.seasonEpisode.split(',')[1])
                                                         except:
-                                                            next_episode = self.db.get_random_episode_of_show_by_data(the_show[2],int(min),int(max),entry[15])
-                                                    elif entry[2] == 998 or media_id == 998:
+                                                            next_episode = self.db.get_random_episode_of_show_by_data(the_show[2],int(min),int(max),entry.year)
+                                                    elif entry.mediaID == 998 or media_id == 998:
                                                         media_id = 998
-                                                        if entry[14] == 1:
+                                                        if entry.rerun == 1:
                                                             print("ACTION: Choosing last episode of " +the_show[3].upper())
                                                             advance_episode = "no"
                                                             next_episode = self.db.get_last_episode(the_show[2]) #get last episode
                                                             try:
-                                                                print("INFO: Scheduled: "+next_episode[7]+" - (S"+str(next_episode[6])+"E"+str(next_episode[5])+") "+next_episode[3])
+                                                                print("INFO: Scheduled: "+next_episode.showTitle+" - (S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+") "+next_episode.title)
                                                             except:
                                                                 pass
                                                         else:
                                                             print("ACTION: Choosing next episode of " +the_show[3].upper())
                                                             advance_episode = "yes"
-                                                            next_episode = self.db.get_next_episode(the_show[3],entry) #get next episode
+                                                            next_episode = self.db.get_next_episode(the_show[3],entry,scheduledShows) #get next episode
                                                             try:
-                                                                print("INFO: Scheduled: "+next_episode[7]+" - (S"+str(next_episode[6])+"E"+str(next_episode[5])+") "+next_episode[3])
+                                                                print("INFO: Scheduled: "+next_episode.showTitle+" - (S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+") "+next_episode.title)
                                                             except:
                                                                 pass
-                                            episode_duration = int(next_episode[4])
-                                            show_title = next_episode[7]
+                                            episode_duration = int(next_episode.duration)
+                                            show_title = next_episode.showTitle
                                             xtraSeason = None
                                             xtraEpisode = None
-                                            print("INFO: " + next_episode[7] + " - " + next_episode[3] + " (S" + str(next_episode[6]) + "E" + str(next_episode[5]) + ")")
+                                            print("INFO: " + next_episode.showTitle + " - " + next_episode.title + " (S" + str(next_episode.seasonNumber) + "E" + str(next_episode.episodeNumber) + ")")
                             print("----------------------------------")
-                        elif entry[2] == 9999:
+                        elif entry.mediaID == 9999:
                             media_id = 9999
                             advance_episode = "no"
-                            print("ACTION: Getting random episode of "+entry[3])
-                            if entry[15] != None:
-                                if entry[15][3] == '*':
-                                    print("INFO: Decade = " + str(entry[15]))
-                                    airDate=entry[15][0:3]
+                            print("ACTION: Getting random episode of "+entry.title)
+                            if entry.year != None:
+                                if entry.year[3] == '*':
+                                    print("INFO: Decade = " + str(entry.year))
+                                    airDate=entry.year[0:3]
                                 else:
-                                    print("INFO: Air Date = " + str(entry[15]))
-                                    airDate=entry[15]
+                                    print("INFO: Air Date = " + str(entry.year))
+                                    airDate=entry.year
                             else:
                                 airDate=None
                             try:
-                                next_episode = self.db.get_random_episode_of_show_by_data_alt(entry[3], int(min), int(max), airDate, entry[21].split(',')[0], entry[21].split(',')[1])
+                                next_episode = self.db.get_random_episode_of_show_by_data_alt(entry.title, int(min), int(max), airDate, entry.seasonEpisode.split(',')[0], entry.seasonEpisode.split(',')[1])
                             except Exception as e:
                                 print("ERROR: " + str(e))
-                                next_episode = self.db.get_random_episode_of_show_by_data_alt(entry[3], int(min), int(max), airDate)
-                            print("INFO: Episode Selected: S"+str(next_episode[6])+"E"+str(next_episode[5])+" "+next_episode[3].upper())
-                            show_title = next_episode[7]
-                            episode_duration = next_episode[4]
+                                next_episode = self.db.get_random_episode_of_show_by_data_alt(entry.title, int(min), int(max), airDate)
+                            print("INFO: Episode Selected: S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+" "+next_episode.title.upper())
+                            show_title = next_episode.showTitle
+                            episode_duration = next_episode.duration
                             attempt = 1
                             while int(episode_duration) < min or episode_duration > max:
-                                print("ACTION: Getting random episode of "+entry[3])
-                                next_episode = self.db.get_random_episode_of_show(entry[3])
-                                print("INFO: Episode Selected: S"+str(next_episode[6])+"E"+str(next_episode[5])+" "+next_episode[3].upper())
+                                print("ACTION: Getting random episode of "+entry.title)
+                                next_episode = self.db.get_random_episode_of_show(entry.title)
+                                print("INFO: Episode Selected: S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+" "+next_episode.title.upper())
                                 attempt = attempt + 1
                                 if attempt > 500:
                                     episode_duration = max
                                 else:
-                                    episode_duration = next_episode[4]
-                            show_title = next_episode[7]
+                                    episode_duration = next_episode.duration
+                            show_title = next_episode.showTitle
                         else:
                             print("----------------------------------")
-                            if entry[14] == 1:
+                            if entry.rerun == 1:
                                 advance_episode = "no"
                                 print("ACTION: RERUNNING LAST SCHEDULED EPISODE")
                                 #check for same show in MEDIA list
@@ -877,10 +998,10 @@ class PseudoChannel():
                                         seriesTitle = m.show_series_title
                                     except:
                                         seriesTitle = None
-                                    if seriesTitle == entry[3]:
+                                    if seriesTitle == entry.title:
                                         next_episode = self.db.get_episode_from_plexMediaID(m.plex_media_id)
                                 if next_episode == None:
-                                    next_episode = self.db.get_last_episode_alt(entry[3]) #get last episode
+                                    next_episode = self.db.get_last_episode_alt(entry.title) #get last episode
                             else:
                                 advance_episode = "yes"
                                 #print("ACTION: GETTING NEXT EPISODE")
@@ -891,67 +1012,67 @@ class PseudoChannel():
                                         seriesTitle = m.show_series_title
                                     except:
                                         seriesTitle = None
-                                    if seriesTitle == entry[3] and m.media_id == 2:
+                                    if seriesTitle == entry.title and m.media_id == 2:
                                         episodeID = self.db.get_episode_id_alternate(m.plex_media_id,seriesTitle)[0]
                                         #print("INFO: episode ID = "+str(episodeID))
                                         #print("INFO: plex_media_id = "+str(m.plex_media_id))
                                 if episodeID != None:
                                     print("ACTION: GETTING NEXT EPISODE FROM SERIES TITLE ["+seriesTitle+"] AND EPISODE ID ["+str(episodeID)+"]")
-                                    next_episode = self.db.get_next_episode_alt(seriesTitle, episodeID, entry)
+                                    next_episode = self.db.get_next_episode_alt(seriesTitle, episodeID, entry, scheduledShows)
                                 if next_episode == None:
-                                    print("ACTION: GETTING NEXT EPISODE FROM SERIES TITLE["+entry[3]+"]")
-                                    next_episode = self.db.get_next_episode(entry[3],entry) #get next episode
+                                    print("ACTION: GETTING NEXT EPISODE FROM SERIES TITLE["+entry.title+"]")
+                                    next_episode = self.db.get_next_episode(entry.title,entry,scheduledShows) #get next episode
                             try:
-                                print("INFO: Scheduled: "+next_episode[7]+" - (S"+str(next_episode[6])+"E"+str(next_episode[5])+") "+next_episode[3])
+                                print("INFO: Scheduled: "+next_episode.showTitle+" - (S"+str(next_episode.seasonNumber)+"E"+str(next_episode.episodeNumber)+") "+next_episode.title)
                             except:
                                 pass
-                            show_title = next_episode[7]
+                            show_title = next_episode.showTitle
                         try:
-                            episode_rating = str(next_episode[10])
+                            episode_rating = str(next_episode.rating)
                         except Exception as e:
                             print(e)
                             episode_rating = "None"
                         try:
-                            episode_notes = str(next_episode[12])
+                            episode_notes = str(next_episode.summary)
                         except Exception as e:
                             print(e)
                             episode_notes = ""
                         notes_data = "Rated " + episode_rating +  "</br>" + episode_notes
                         if next_episode != None:
-                            customSectionName = next_episode[9]
+                            customSectionName = next_episode.customSectionName
                             episode = Episode(
                                 section, # section_type
-                                next_episode[3], # title
-                                entry[5], # natural_start_time
-                                self.get_end_time_from_duration(self.translate_time(entry[5]), next_episode[4]), # natural_end_time
-                                next_episode[4], # duration
-                                entry[7], # day_of_week
-                                entry[10], # is_strict_time
-                                entry[11], # time_shift
-                                entry[12], # overlap_max
-                                #next_episode[8] if len(next_episode) >= 9 else '', # plex id
-                                next_episode[8], # plex_media_id
+                                next_episode.title, # title
+                                entry.startTime, # natural_start_time
+                                self.get_end_time_from_duration(self.translate_time(entry.startTime), next_episode.duration), # natural_end_time
+                                next_episode.duration, # duration
+                                entry.dayOfWeek, # day_of_week
+                                entry.strictTime, # is_strict_time
+                                entry.timeShift, # time_shift
+                                entry.overlapMax, # overlap_max
+                                #next_episode.plexMediaID if len(next_episode) >= 9 else '', # plex id
+                                next_episode.plexMediaID, # plex_media_id
                                 customSectionName, # custom lib name
                                 media_id, #media_id
                                 show_title, # show_series_title
-                                next_episode[5], # episode_number
-                                next_episode[6], # season_number
+                                next_episode.episodeNumber, # episode_number
+                                next_episode.seasonNumber, # season_number
                                 advance_episode, # advance_episode
                                 notes_data #notes
                                 )
                             self.MEDIA.append(episode)
                         else:
-                            print("ERROR: Cannot find TV Show Episode, {} in the local db".format(entry[3]))
+                            print("ERROR: Cannot find TV Show Episode, {} in the local db".format(entry.title))
                     elif section == "Movies":
-                        minmax = entry[4].split(",")
+                        minmax = entry.duration.split(",")
                         min = int(minmax[0])
                         min = min * 60000
                         max = int(minmax[1])
                         max = max * 60000
                         movies_list = []
                         movies_list_filtered = []
-                        if str(entry[3]).lower() == "random":
-                            if(entry[13] != ''): # xtra params
+                        if str(entry.title).lower() == "random":
+                            if(entry.xtra != ''): # xtra params
                                 """
                                 Using specified Movies library names
                                 """
@@ -961,17 +1082,17 @@ class PseudoChannel():
                                 for theSection in sections:
                                     for correct_lib_name, user_lib_name in libs_dict.items():
                                         if theSection.title.lower() in [x.lower() for x in user_lib_name]:
-                                            if correct_lib_name == "Movies" and entry[13] != "":
+                                            if correct_lib_name == "Movies" and entry.xtra != "":
                                                 print("----------------------------------")
-                                                print("INFO: Movie Xtra Arguments: ", entry[13])
+                                                print("INFO: Movie Xtra Arguments: ", entry.xtra)
                                                 movies = self.PLEX.library.section(theSection.title)
                                                 xtra = []
                                                 d = {}
                                                 if ";" in xtra:
-                                                    xtra = entry[13].split(';')
+                                                    xtra = entry.xtra.split(';')
                                                 else:
                                                     if xtra != None:
-                                                        xtra = str(entry[13]) + ';'
+                                                        xtra = str(entry.xtra) + ';'
                                                         xtra = xtra.split(';')
                                                 print(xtra)
                             try:
@@ -982,10 +1103,10 @@ class PseudoChannel():
                                 # turn values into list
                                 for key, val in d.items():
                                     d[key] = val.split(',')"""
-                                if entry[13] != "" and entry[13] != None:
-                                    movie_search = self.db.get_movies_xtra(correct_lib_name,int(min),int(max),xtra)
+                                if entry.xtra != "" and entry.xtra != None:
+                                    movie_search = self.db.get_movies_xtra(int(min),int(max),xtra)
                                 else:
-                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry[15],entry[16],entry[17],entry[18],entry[19],entry[20])
+                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry.year,entry.genres,entry.actors,entry.collections,entry.rating,entry.studio)
                                 for movie in movie_search:
                                     movies_list.append(movie)
                             except:
@@ -1023,7 +1144,7 @@ class PseudoChannel():
                                 self.db.update_movies_table_with_last_played_date(the_movie[3])
                             else:
                                 print("ERROR: xtra args not found, getting random movie")
-                                movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,None,None,entry[19],None)
+                                movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,None,None,entry.rating,None)
                                 for movie in movie_search:
                                     if movie not in movies_list and movie[3] not in last_movie:
                                         movies_list.append(movie)
@@ -1049,7 +1170,7 @@ class PseudoChannel():
                                         movie_duration = the_movie[4]
                                 """Updating movies table in the db with lastPlayedDate entry"""
                                 self.db.update_movies_table_with_last_played_date(the_movie[3])
-                            """minmax = str(entry[4]).split(",")
+                            """minmax = str(entry.duration).split(",")
                             min = int(minmax[0])
                             min = min * 60000
                             max = int(minmax[1])
@@ -1069,7 +1190,7 @@ class PseudoChannel():
                                     sections = self.PLEX.library.sections()
                                     #Updating movies table in the db with lastPlayedDate entry
                                     self.db.update_movies_table_with_last_played_date(the_movie[3])"""
-                        elif str(entry[3]).lower() == "kevinbacon":
+                        elif str(entry.title).lower() == "kevinbacon":
                             #kevin bacon mode
                             print("----------------------------------")
                             print("NOTICE: Kevin Bacon Mode Initiated")
@@ -1092,19 +1213,19 @@ class PseudoChannel():
                                     if theSection.title.lower() in [x.lower() for x in user_lib_name]:
                                         if correct_lib_name == "Movies":
                                             movies = self.PLEX.library.section(theSection.title)
-                            '''if(entry[13] != None or len(actors_list) > 0): # xtra params
+                            '''if(entry.xtra != None or len(actors_list) > 0): # xtra params
                                 xtra = []
                                 try:
-                                    print("INFO: Movie Xtra Arguments: ", entry[13])
+                                    print("INFO: Movie Xtra Arguments: ", entry.xtra)
                                 except:
                                     print("INFO: Xtra Arguments Not Found")
                                 d = {}'''
                             if len(actors_list) > 0:
                                 xtra_actors = []
-                                if entry[17] != None and ',' in entry[17]:
-                                    xtra_actors = entry[17].split(',')
-                                elif entry[17] != None and ',' not in entry[17]:
-                                    xtra_actors.append(entry[17])
+                                if entry.actors != None and ',' in entry.actors:
+                                    xtra_actors = entry.actors.split(',')
+                                elif entry.actors != None and ',' not in entry.actors:
+                                    xtra_actors.append(entry.actors)
                                 for actorName in actors_list:
                                     the_actors = []
                                     for xActor in xtra_actors:
@@ -1116,8 +1237,8 @@ class PseudoChannel():
                                     print("----------------------------------")
                                     print("INFO: Actor from " + last_movie + " selected - " + actorName)
                                     print("NOTICE: Executing movies search for matches")
-                                    print("INFO: " + str(entry[15]) + ', ' + str(entry[16]) + ', ' + str(the_actors) + ', ' + str(entry[18]) + ', ' + str(entry[19]) + ', ' + str(entry[20]))
-                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry[15],entry[16],the_actors,entry[18],entry[19],entry[20])
+                                    print("INFO: " + str(entry.year) + ', ' + str(entry.genres) + ', ' + str(the_actors) + ', ' + str(entry.collections) + ', ' + str(entry.rating) + ', ' + str(entry.studio))
+                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry.year,entry.genres,the_actors,entry.collections,entry.rating,entry.studio)
                                     print("INFO: " + str(len(movie_search)) + " results found")
                                     #except Exception as e:
                                         #print(e)
@@ -1135,11 +1256,11 @@ class PseudoChannel():
                                     #print("INFO: Movies List: " + str(movies_list))
                             else:
                                 print("NOTICE: No previous actor data, skipping...")
-                                '''if ";" in entry[13]:
-                                    xtra = entry[13].split(';')
+                                '''if ";" in entry.xtra:
+                                    xtra = entry.xtra.split(';')
                                 else:
-                                    if entry[13] != None:
-                                        xtra = str(entry[13]) + ';'
+                                    if entry.xtra != None:
+                                        xtra = str(entry.xtra) + ';'
                                         xtra = xtra.split(';')
                                 print(xtra)'''
                                 try:
@@ -1150,7 +1271,7 @@ class PseudoChannel():
                                     # turn values into list
                                     for key, val in d.items():
                                         d[key] = val.split(',')"""
-                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry[15],entry[16],entry[17],entry[18],entry[19],entry[20])
+                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry.year,entry.genres,entry.actors,entry.collections,entry.rating,entry.studio)
                                     for movie in movie_search:
                                         movies_list.append(movie)
                                         #print("INFO: Match Found - " + movie)
@@ -1229,7 +1350,7 @@ class PseudoChannel():
                                             # turn values into list
                                             for key, val in d.items():
                                                 d[key] = val.split(',')"""
-                                            movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,actor_data,None,entry[19],None)
+                                            movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,actor_data,None,entry.rating,None)
                                             #movie_search = movies.search(None, **d)
                                             for movie in movie_search:
                                                 if movie not in movies_list and movie[3] not in last_movie:
@@ -1296,13 +1417,13 @@ class PseudoChannel():
                                 else:
                                     print("ERROR: Kevin Bacon Mode failed to find a match, selecting random movie")
                                     movies_list = []
-                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry[14],entry[15],entry[16],entry[17],entry[18],entry[19])
+                                    movie_search = self.db.get_movies_data("Movies",int(min),int(max),entry.year,entry.genres,entry.actors,entry.collections,entry.rating,entry.studio)
                                     for movie in movie_search:
                                         if movie not in movies_list and movie[3] not in last_movie:
                                             movies_list.append(movie)
                                     if len(movies_list) < 1:
                                         print("ERROR: xtra args not found, getting random movie")
-                                        movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,None,None,entry[19],None)
+                                        movie_search = self.db.get_movies_data("Movies",int(min),int(max),None,None,None,None,entry.rating,None)
                                         try:
                                             for movie in movie_search:
                                                 if movie not in movies_list and movie[3] not in last_movie:
@@ -1341,8 +1462,8 @@ class PseudoChannel():
                                 """Updating movies table in the db with lastPlayedDate entry"""
                                 self.db.update_movies_table_with_last_played_date(the_movie[3])
                         else:
-                            the_movie = self.db.get_movie(entry[3])
-                        if str(entry[3]).lower() == "kevinbacon":
+                            the_movie = self.db.get_movie(entry.title)
+                        if str(entry.title).lower() == "kevinbacon":
                             media_id = 112
                         else:
                             media_id = 1
@@ -1353,7 +1474,7 @@ class PseudoChannel():
                             plex_movie = self.PLEX.fetchItem(the_movie[6])
                             last_data = ""
                             notes_data = ""
-                            if str(entry[3]).lower() == "kevinbacon":
+                            if str(entry.title).lower() == "kevinbacon":
                                 actors_list_old = actors_list
                                 actors_list = {}
                                 actor_match = ""
@@ -1378,13 +1499,13 @@ class PseudoChannel():
                             movie = Movie(
                             section, # section_type
                             the_movie[3], # title
-                            entry[5], # natural_start_time
-                            self.get_end_time_from_duration(entry[5], the_movie[4]), # natural_end_time
+                            entry.startTime, # natural_start_time
+                            self.get_end_time_from_duration(entry.startTime, the_movie[4]), # natural_end_time
                             the_movie[4], # duration
-                            entry[7], # day_of_week
-                            entry[10], # is_strict_time
-                            entry[11], # time_shift
-                            entry[12], # overlap_max
+                            entry.dayOfWeek, # day_of_week
+                            entry.strictTime, # is_strict_time
+                            entry.timeShift, # time_shift
+                            entry.overlapMax, # overlap_max
                             the_movie[6], # plex id
                             the_movie[7], # custom lib name
                             media_id, # media_id
@@ -1392,45 +1513,45 @@ class PseudoChannel():
                             )
                             self.MEDIA.append(movie)
                         else:
-                            print(str("ERROR: Cannot find Movie, {} in the local db".format(entry[3])).encode('UTF-8'))
+                            print(str("ERROR: Cannot find Movie, {} in the local db".format(entry.title)).encode('UTF-8'))
                     elif section == "Music":
-                        the_music = self.db.get_music(entry[3])
+                        the_music = self.db.get_music(entry.title)
                         if the_music != None:
                             music = Music(
                             section, # section_type
                             the_music[3], # title
-                            entry[5], # natural_start_time
-                            self.get_end_time_from_duration(entry[5], the_music[4]), # natural_end_time
+                            entry.startTime, # natural_start_time
+                            self.get_end_time_from_duration(entry.startTime, the_music[4]), # natural_end_time
                             the_music[4], # duration
-                            entry[7], # day_of_week
-                            entry[10], # is_strict_time
-                            entry[11], # time_shift
-                            entry[12], # overlap_max
+                            entry.dayOfWeek, # day_of_week
+                            entry.strictTime, # is_strict_time
+                            entry.timeShift, # time_shift
+                            entry.overlapMax, # overlap_max
                             the_music[6], # plex id
                             the_music[7], # custom lib name
                             )
                             self.MEDIA.append(music)
                         else:
-                            print(str("ERROR: Cannot find Music, {} in the local db".format(entry[3])).encode('UTF-8'))
+                            print(str("ERROR: Cannot find Music, {} in the local db".format(entry.title)).encode('UTF-8'))
                     elif section == "Video":
-                        the_video = self.db.get_video(entry[3])
+                        the_video = self.db.get_video(entry.title)
                         if the_music != None:
                             video = Video(
                             section, # section_type
                             the_video[3], # title
-                            entry[5], # natural_start_time
-                            self.get_end_time_from_duration(entry[5], the_video[4]), # natural_end_time
+                            entry.startTime, # natural_start_time
+                            self.get_end_time_from_duration(entry.startTime, the_video[4]), # natural_end_time
                             the_video[4], # duration
-                            entry[7], # day_of_week
-                            entry[10], # is_strict_time
-                            entry[11], # time_shift
-                            entry[12], # overlap_max
+                            entry.dayOfWeek, # day_of_week
+                            entry.strictTime, # is_strict_time
+                            entry.timeShift, # time_shift
+                            entry.overlapMax, # overlap_max
                             the_video[6], # plex id
                             the_video[7], # custom lib name
                             )
                             self.MEDIA.append(video)
                         else:
-                            print(str("ERROR: Cannot find Video, {} in the local db".format(entry[3])).encode('UTF-8'))
+                            print(str("ERROR: Cannot find Video, {} in the local db".format(entry.title)).encode('UTF-8'))
                     else:
                         pass
             """If we reached the end of the scheduled items for today, add them to the daily schedule
@@ -1599,7 +1720,7 @@ class PseudoChannel():
         print("Daily Pseudo Schedule:")
         daily_schedule = self.db.get_daily_schedule()
         for i , entry in enumerate(daily_schedule):
-            print(str("INFO {} {} {} {} {} {}".format(str(i + 1)+".", entry[8], entry[11], entry[6], " - ", entry[3])).encode(sys.stdout.encoding, errors='replace'))
+            print(str("INFO {} {} {} {} {} {}".format(str(i + 1)+".", entry.startTime, entry.sectionType, entry.showTitle, " - ", entry.title)).encode(sys.stdout.encoding, errors='replace'))
 
     def last_episode(self):
         print("----- Change the 'Last Episode' set for a show. -----")
@@ -1691,7 +1812,7 @@ class PseudoChannel():
     def export_daily_schedule(self):
 
         daily_schedule_table = self.db.get_daily_schedule()
-        json_string = json.dumps(daily_schedule_table)
+        json_string = json.dumps([list(row) for row in daily_schedule_table])
         print("NOTICE: Exporting Daily Schedule ")
         self.write_json_to_file(json_string, "pseudo-daily_schedule.json")
         print("NOTICE: Done.")
@@ -1736,7 +1857,7 @@ class PseudoChannel():
     def save_daily_schedule_as_json(self):
 
         daily_schedule_table = self.db.get_daily_schedule()
-        json_string = json.dumps(daily_schedule_table)
+        json_string = json.dumps([list(row) for row in daily_schedule_table])
         print("NOTICE: Saving Daily Schedule Cache ")
         self.save_file(json_string, 'daily-schedule.json', '../.pseudo-cache/')
 
@@ -1782,7 +1903,6 @@ class PseudoChannel():
 
 if __name__ == '__main__':
 
-    pseudo_channel = PseudoChannel()
     banner = textwrap.dedent('''\
 #   __              __                        
 #  |__)_ _    _| _ /  |_  _  _  _  _|    _    
@@ -1802,6 +1922,9 @@ if __name__ == '__main__':
     parser.add_argument('-u', '--update',
                          action='store_true',
                          help='Update the local database with Plex libraries.')
+    parser.add_argument('-us', '--update_sync',
+                         action='store_true',
+                         help='Update the local database with only what changed in Plex since the last update.')
     parser.add_argument('-um', '--update_movies',
                          action='store_true',
                          help='Update the local database with Plex MOVIE libraries ONLY.')
@@ -1885,10 +2008,25 @@ if __name__ == '__main__':
     parser.add_argument('-ids', '--import_daily_schedule',
                          action='store_true',
                          help='Imports the current Daily Schedule.')
+    '''
+    * 
+    * Work on another database: "python PseudoChannel.py -db pseudo-channel.db.new -u"
+    *
+    '''
+    parser.add_argument('-db', '--database',
+                         default="pseudo-channel.db",
+                         help='The database to use instead of pseudo-channel.db (Global_DatabaseUpdate.py builds the library in a new file).')
     globals().update(vars(parser.parse_args()))
     args = parser.parse_args()
+    pseudo_channel = PseudoChannel(args.database)
+    if pseudo_channel.db.library is not None and (args.update or args.update_sync or args.update_movies or
+            args.update_playlist or args.update_tv or args.update_commercials):
+        print("ERROR: This channel reads its media from the shared library ({}), update it with Global_DatabaseUpdate.py".format(pseudo_channel.db.library))
+        sys.exit(1)
     if args.update:
         pseudo_channel.update_db()
+    if args.update_sync:
+        pseudo_channel.update_db_sync()
     if args.update_movies:
         pseudo_channel.update_db_movies()
     if args.update_playlist:
@@ -1923,115 +2061,23 @@ if __name__ == '__main__':
                 pseudo_channel.generate_daily_schedule()
             except:
                 print("ERROR: Recieved error when running generate_daily_schedule()")
+                # Global_DailySchedule.py reports the channel as failed
+                sys.exit(1)
     if args.make_html:
         pseudo_channel.make_xml_schedule()
     if args.run:
         print(banner)
         print("INFO: To run this in the background:")
         print("screen -d -m bash -c 'python PseudoChannel.py -r; exec sh'")
-        """Every minute on the minute check the DB startTimes of all media to 
-           determine whether or not to play. Also, check the now_time to
-           see if it's midnight (or 23.59), if so then generate a new daily_schedule
-            
+        """Every item of the daily_schedule gets a timer at its startTime; the timer sleeps until
+           the next one is due (no polling) and logs how late each item actually started.
         """
+        timer = PseudoChannelTimer()
         """Every <user specified day> rotate log"""
         dayToRotateLog = pseudo_channel.ROTATE_LOG.lower()
-        schedule.every().friday.at("00:00").do(pseudo_channel.rotate_log)
+        timer.schedule_weekly(4, "00:00", pseudo_channel.rotate_log)
         logging.info("NOTICE: Running PseudoChannel.py -r")
-        def trigger_what_should_be_playing_now():
-
-            def nearest(items, pivot):
-                return min(items, key=lambda x: abs(x - pivot))
-
-            #dates_list = [datetime.datetime.strptime(''.join(str(date[8])), pseudo_channel.APP_TIME_FORMAT_STR) for date in daily_schedule]
-            now = datetime.datetime.now()
-            now = now.replace(year=1900, month=1, day=1)
-            #closest_media = nearest(dates_list, now)
-            #print(closest_media)
-            prevItem = None
-            db = PseudoChannelDatabase("pseudo-channel.db")
-            item = db.get_now_playing()
-            item_time = datetime.datetime.strptime(''.join(str(item[8])), pseudo_channel.APP_TIME_FORMAT_STR)
-            #if item_time == closest_media:
-            #print "Line 1088, Here", item
-            elapsed_time = item_time - now
-            print("INFO: "+str(elapsed_time.total_seconds()))
-            try:
-                endTime = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S.%f')
-            except ValueError:
-                endTime = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S')
-            # we need to play the content and add an offest
-            if elapsed_time.total_seconds() < 0 and \
-               endTime > now:
-                print(str("NOTICE: Queueing up {} to play right away.".format(item[3])).encode('UTF-8'))
-                offset = int(abs(elapsed_time.total_seconds() * 1000))
-                try:
-                    nat_start = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S.%f') - datetime.timedelta(milliseconds=item[7])
-                except:
-                    nat_start = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S') - datetime.timedelta(milliseconds=item[7])
-                schedule_offset = nat_start - datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-                schedule_offset = schedule_offset.total_seconds()
-                print("INFO: Schedule Offset = " + str(schedule_offset))
-                nat_start = nat_start.strftime(pseudo_channel.APP_TIME_FORMAT_STR)
-                print("INFO: Natural Start Time:")
-                print(nat_start)
-                daily_schedule = pseudo_channel.db.get_daily_schedule()
-                if schedule_offset < 0:
-                    schedule_offset_ms = abs(schedule_offset) * 1000
-                    offset_plus = int(offset + abs(schedule_offset_ms))
-                    print("INFO: Updated Offset = " + str(offset_plus))
-                    pseudo_channel.controller.play(item, daily_schedule, offset_plus)
-                else:
-                    print("INFO: No Offset Update")
-                    pseudo_channel.controller.play(item, daily_schedule, offset)
-
-        def job_that_executes_once(item, schedulelist):
-
-            print(str("NOTICE: Readying media: '{}'".format(item[3])).encode('UTF-8'))
-            next_start_time = datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-            now = datetime.datetime.now()
-            #now = now.replace(year=1900, month=1, day=1)
-            time_diff = next_start_time - now
-            nat_start = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S.%f') - datetime.timedelta(milliseconds=item[7])
-            schedule_offset = nat_start - datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-            schedule_offset = schedule_offset.total_seconds()
-            print("INFO: Schedule Offset = " + str(schedule_offset))
-            nat_start = nat_start.strftime(pseudo_channel.APP_TIME_FORMAT_STR)
-            print("INFO: Natural Start Time: " + str(nat_start))
-            daily_schedule = pseudo_channel.db.get_daily_schedule()
-            if time_diff.total_seconds() > 0:
-                nat_start = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S.%f') - datetime.timedelta(milliseconds=item[7])
-                schedule_offset = nat_start - datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-                schedule_offset = schedule_offset.total_seconds()
-                print("INFO: Schedule Offset = " + str(schedule_offset))
-                nat_start = nat_start.strftime(pseudo_channel.APP_TIME_FORMAT_STR)
-                print("INFO: Natural Start Time: " + str(nat_start))
-                print("NOTICE: Sleeping for {} seconds before playing: '{}'".format(time_diff.total_seconds(), item[3]))
-                sleep(int(time_diff.total_seconds()))
-                if pseudo_channel.DEBUG:
-                    print("NOTICE: Woke up!")
-                if schedule_offset < 0: #OFFSET CHECKER
-                    schedule_offset_ms = abs(schedule_offset) * 1000
-                    print("INFO: Updated Offset = " + str(schedule_offset_ms))
-                    pseudo_channel.controller.play(item, daily_schedule, schedule_offset_ms)
-                else:
-                    print("INFO: job_that_executes_once - No offset")
-                    pseudo_channel.controller.play(item, daily_schedule)
-            else:
-                nat_start = datetime.datetime.strptime(item[9], '%Y-%m-%d %H:%M:%S.%f') - datetime.timedelta(milliseconds=item[7])
-                schedule_offset = nat_start - datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-                schedule_offset = schedule_offset.total_seconds()
-                print("INFO: Schedule Offset = " + str(schedule_offset))
-                nat_start = nat_start.strftime(pseudo_channel.APP_TIME_FORMAT_STR)
-                print("INFO: Natural Start Time: " + str(nat_start))
-                if schedule_offset < 0:
-                    schedule_offset_ms = int(abs(schedule_offset) * 1000)
-                    print("INFO: Updated Offset = " + str(schedule_offset_ms))
-                    pseudo_channel.controller.play(item, daily_schedule, schedule_offset_ms)
-                else:
-                    print("INFO: job_that_executes_once - No offset 2")
-                    pseudo_channel.controller.play(item, daily_schedule)
-            return schedule.CancelJob
+        runner = PseudoChannelRunner(pseudo_channel.db, pseudo_channel.controller, timer)
 
         def generate_memory_schedule(schedulelist, isforupdate=False):
 
@@ -2042,37 +2088,19 @@ if __name__ == '__main__':
             prev_end_time_to_watch_for = None
             if pseudo_channel.USE_OVERRIDE_CACHE and isforupdate:
                 for cached_item in pseudo_cache:
-                    prev_start_time = datetime.datetime.strptime(cached_item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-                    try:
-                        prev_end_time = datetime.datetime.strptime(cached_item[9], '%Y-%m-%d %H:%M:%S.%f')
-                    except ValueError:
-                        prev_end_time = datetime.datetime.strptime(cached_item[9], '%Y-%m-%d %H:%M:%S')
+                    cached_item = DailyScheduleRow(*cached_item)
+                    prev_start_time = cached_item.start_time
+                    prev_end_time = cached_item.end_time
                     """If update time is in between the prev media start / stop then there is overlap"""
                     if prev_start_time < now and prev_end_time > now:
                         try:
-                            print("INFO: It looks like there is update schedule overlap", cached_item[3])
+                            print("INFO: It looks like there is update schedule overlap", cached_item.title)
                         except:
                             pass
                         prev_end_time_to_watch_for = prev_end_time
-            for item in schedulelist:
-                try:
-                    trans_time = datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR).strftime("%H:%M:%S")
-                except Exception as e:
-                    print("ERROR: " + str(e))
-                    trans_time = datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR).strftime("%H:%M")
-                new_start_time = datetime.datetime.strptime(item[8], pseudo_channel.APP_TIME_FORMAT_STR)
-                if prev_end_time_to_watch_for == None:
-                    schedule.every().day.at(trans_time).do(job_that_executes_once, item, schedulelist).tag('daily-tasks')
-                else:
-                    """If prev end time is more then the start time of this media, skip it"""
-                    if prev_end_time_to_watch_for > new_start_time:
-                        try:
-                            print("NOTICE: Skipping scheduling item due to cached overlap.", item[3])
-                        except:
-                            pass
-                        continue
-                    else:
-                        schedule.every().day.at(trans_time).do(job_that_executes_once, item, schedulelist).tag('daily-tasks')
+            """If prev end time is more then the start time of a media, it is skipped"""
+            runner.load(schedulelist)
+            runner.schedule_items(prev_end_time_to_watch_for)
             print("NOTICE: Done.")
         generate_memory_schedule(pseudo_channel.db.get_daily_schedule())
         daily_update_time = datetime.datetime.strptime(
@@ -2087,7 +2115,7 @@ if __name__ == '__main__':
             """Saving current daily schedule as cached .json"""
             pseudo_channel.save_daily_schedule_as_json()
 
-            schedule.clear('daily-tasks')
+            timer.cancel(runner.tag)
 
             sleep(1)
 
@@ -2098,24 +2126,15 @@ if __name__ == '__main__':
             generate_memory_schedule(pseudo_channel.db.get_daily_schedule(), True)
 
         """Commenting out below and leaving all updates to be handled by cron task"""
-        """schedule.every().day.at(daily_update_time).do(
-            go_generate_daily_sched
-        ).tag('daily-update')"""
-
-        sleep_before_triggering_play_now = 0.1
+        """timer.schedule_daily(daily_update_time, go_generate_daily_sched, tag='daily-update', repeat=True)"""
 
         '''When the process is killed, stop any currently playing media & cleanup'''
         signal.signal(signal.SIGTERM, pseudo_channel.signal_term_handler)
 
         try:
-            while True:
-                schedule.run_pending()
-                sleep(0.1)
-                if sleep_before_triggering_play_now:
-                    logging.info("NOTICE: Successfully started PseudoChannel.py")
-                    trigger_what_should_be_playing_now()
-                    sleep_before_triggering_play_now = 0
-                    #generate_memory_schedule(pseudo_channel.db.get_daily_schedule())
+            logging.info("NOTICE: Successfully started PseudoChannel.py")
+            runner.play_now()
+            timer.run_forever()
         except KeyboardInterrupt:
             print('ALERT: Manual break by user!')
 
@@ -55,6 +55,9 @@ commercialPadding = 1
 Specify the path to this controller on the network (i.e. 'http://192.168.1.28' - no trailing slash).
 Also specify the desired port to run the simple http webserver. The daily generated
 schedule will be served at "http://<your-ip>:<your-port>/" (i.e. "http://192.168.1.28:8000/"). 
+Every channel next to this one is served from the same port at "/channels/<number>/", with
+"now_playing.json" (the item playing now) and "events" (server-sent events on every item change)
+next to each guide, and "/channels.json" listing them all.
 
 You can also leave the below controllerServerPath empty if you'd like to run your own webserver.
 """
@@ -86,6 +89,53 @@ Set this to false if you don't want your commercials to get cutoff/don't mind th
 """
 useDirtyGapFix = False
 
+"""Don't play any of the last X commercials again while other commercials would fit the gap."""
+commercialNoRepeatWindow = 10
+
+"""Set this to any number / text to make the commercial picks reproducible: generating the schedule
+again on the same day with the same library gives the same commercials. None picks them freshly every time.
+"""
+commercialSeed = None
+
+"""When updating the database, fetch genres / actors / collections / similar for this many
+movies or shows in a single request to the Plex server instead of one request per item.
+Set this to 0 to go back to fetching every item one by one.
+"""
+bulkMetadataPageSize = 100
+
+"""How many requests to the Plex server may run at the same time while updating the database
+(episode lists, playlist items, metadata pages). Set this to 1 to fetch everything one at a time.
+"""
+plexFetchWorkers = 8
+
+"""While an item plays, look up this many of the next items (and the clients) on the Plex server,
+so the next item starts without waiting on those requests. Set this to 0 to look everything up when it plays.
+"""
+prerollItems = 3
+
+"""With several clients, playback is started on all of them at once. Give up waiting on a client
+that has not answered after this many seconds.
+"""
+clientTimeout = 5
+
+"""PseudoChannelDaemon.py (run from the main dir) keeps every channel in memory and controls.py switches
+between them through this socket file (in the main dir) instead of starting a new PseudoChannel.py -r.
+"""
+daemonSocket = "pseudo-channel-daemon.sock"
+
+"""How many channels Global_DailySchedule.py generates at the same time, each in its own process
+(every channel has its own database). 0 runs one per CPU; 1 goes back to one channel after the other.
+"""
+dailyScheduleWorkers = 0
+
+"""The channels read their movies, shows and commercials from this one database (the main dir's,
+kept up to date by Global_DatabaseUpdate.py) and keep only their own schedules and queues in their
+pseudo-channel.db. Relative to the channel dir, which sits in the main dir (whatever it is named, e.g.
+channels/); a config without this setting uses the same default. None keeps the channel on a full
+copy of the library in its own database.
+"""
+libraryDatabase = "../pseudo-channel.db"
+
 """
 ##### Do not edit below this line---------------------------------------------------------------
 
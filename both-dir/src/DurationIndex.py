@@ -0,0 +1,44 @@
+"""Duration sorted lookup used for random picks by duration
+"""
+from bisect import bisect_left, bisect_right
+import random
+
+class DurationIndex():
+
+    """Keeps items sorted by duration so a uniform random pick among the items whose duration
+    lies in [min, max] is two bisects and a random index, instead of ORDER BY RANDOM() over the
+    whole filtered set.
+    """
+
+    def __init__(self, items, duration=lambda item: item[0]):
+
+        items = sorted(items, key=lambda item: int(duration(item) or 0))
+        self.durations = [int(duration(item) or 0) for item in items]
+        self.items = items
+
+    def __len__(self):
+
+        return len(self.items)
+
+    def bounds(self, min=None, max=None):
+
+        lo = 0 if min is None else bisect_left(self.durations, min)
+        hi = len(self.durations) if max is None else bisect_right(self.durations, max)
+        return lo, hi
+
+    def count(self, min=None, max=None):
+
+        lo, hi = self.bounds(min, max)
+        return hi - lo if hi > lo else 0
+
+    def pick(self, min=None, max=None, rng=random):
+
+        """Random item with min <= duration <= max (either bound may be None), or None if there is none."""
+        lo, hi = self.bounds(min, max)
+        if lo >= hi:
+            return None
+        return self.items[rng.randrange(lo, hi)]
+
+    def shortest(self):
+
+        return self.items[0] if self.items else None
@@ -0,0 +1,79 @@
+"""Parameterized SELECT on one media table built from optional filters
+"""
+import json
+
+class MediaQuery():
+
+    """The filters of the schedule's data / xtra slots as one statement. Values are always bound
+    parameters and lists (ratings, tags) go in as a single JSON parameter read with json_each, so
+    the SQL only depends on which filters are used, never on their values: sqlite3's statement
+    cache hands back the already prepared statement, and key() identifies the result set.
+
+        query = MediaQuery('movies').between('duration', min, max).any_of('rating', ['G', 'PG'])
+        cursor.execute(query.sql(), query.params)
+    """
+
+    TAG_TABLES = {'movies' : 'movie_tags', 'shows' : 'show_tags'}
+
+    def __init__(self, table):
+
+        self.table = table
+        self.conditions = []
+        self.params = []
+
+    def where(self, condition, *params):
+
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def between(self, column, low, high):
+
+        return self.where(column+" BETWEEN ? and ?", low, high)
+
+    def like(self, column, value):
+
+        """column matching value case-insensitively; no filter when value is None."""
+        if value is None:
+            return self
+        return self.where(column+" LIKE ?", str(value))
+
+    def starts_with(self, column, prefix):
+
+        if prefix is None:
+            return self
+        return self.where(column+" LIKE ?", str(prefix)+"%")
+
+    def any_of(self, column, values):
+
+        """column equal to one of values (a single value matches case-insensitively); no filter when values is empty."""
+        values = [value for value in values or [] if value is not None]
+        if len(values) == 0:
+            return self
+        if len(values) == 1:
+            return self.like(column, values[0])
+        return self.where(column+" IN (SELECT value FROM json_each(?))", json.dumps(values))
+
+    def tagged(self, kind, tags):
+
+        """Rows carrying every tag in tags (of kind: genre, actor...), matched whole and case-insensitively."""
+        tags = [tag.strip() for tag in tags or [] if tag is not None and tag.strip() != '']
+        if len(tags) == 0:
+            return self
+        tagTable = self.TAG_TABLES[self.table]
+        return self.where("plexMediaID IN (SELECT "+tagTable+".plexMediaID FROM tags JOIN "+tagTable+
+            " ON "+tagTable+".tagID = tags.id WHERE tags.kind = ? AND tags.tag IN (SELECT value FROM json_each(?))"
+            " GROUP BY "+tagTable+".plexMediaID HAVING count(*) = ?)",
+            kind, json.dumps(tags), len(set(tag.lower() for tag in tags)))
+
+    def condition(self):
+
+        return " AND ".join("("+condition+")" for condition in self.conditions) if self.conditions else "1"
+
+    def sql(self, columns="*", order=""):
+
+        return "SELECT "+columns+" FROM "+self.table+" WHERE "+self.condition()+order
+
+    def key(self):
+
+        return (self.table, self.condition(), tuple(self.params))
@@ -6,7 +6,7 @@ import copy
 from datetime import datetime
 from datetime import timedelta
 from src import Commercial
-from src import PseudoChannelDatabase
+from src.PseudoChannelGapPacker import PseudoChannelGapPacker
 
 class PseudoChannelCommercial():
 
@@ -14,26 +14,19 @@ class PseudoChannelCommercial():
     COMMERCIAL_PADDING_IN_SECONDS = 0
     daily_schedule = []
 
-    def __init__(self, commercials, commercialPadding, useDirtyGapFix):
+    def __init__(self, commercials, commercialPadding, useDirtyGapFix, noRepeatWindow=0, seed=None):
 
         self.commercials = commercials
-        self.db = PseudoChannelDatabase("pseudo-channel.db")
         self.COMMERCIAL_PADDING_IN_SECONDS = commercialPadding
+        self.packer = PseudoChannelGapPacker(
+            commercials,
+            commercialPadding * 1000,
+            noRepeatWindow,
+            seed,
+            self.MIN_DURATION_FOR_COMMERCIAL * 1000
+        )
         self.USE_DIRTY_GAP_FIX = useDirtyGapFix
 
-    def get_random_commercial(self):
-
-        random_commercial = random.choice(self.commercials)
-#        random_commercial_dur_seconds = (int(random_commercial[4])/1000)%60
-        random_commercial_dur_seconds = (int(random_commercial[4])/1000)
-        while random_commercial_dur_seconds < self.MIN_DURATION_FOR_COMMERCIAL:
-             random_commercial = random.choice(self.commercials)
-             random_commercial_dur_seconds = (int(random_commercial[4])/1000)
-#             random_commercial_dur_seconds = (int(random_commercial[4])/1000)%60
-        return random_commercial
-
-
-
     def timedelta_milliseconds(self, td):
 
         return td.days*86400000 + td.seconds*1000 + td.microseconds/1000
@@ -90,47 +83,28 @@ class PseudoChannelCommercial():
         print("INFO: Next Item Start Time -  %s" % curr_item_start_time)
         print("INFO: Time to Fill - %s" % time_diff)
         
-        count = 0
+        gap_milli = self.timedelta_milliseconds(curr_item_start_time - prev_item_end_time)
+        packed, left_milli = self.packer.pack(gap_milli)
+        if self.USE_DIRTY_GAP_FIX and left_milli >= 1000 + (self.COMMERCIAL_PADDING_IN_SECONDS * 1000):
+            # squeeze in one last commercial even though it will get cut off
+            overrun = self.packer.pick_overrun(left_milli)
+            if overrun is not None:
+                packed.append(overrun)
+        print("INFO: %s Commercials Fill the Gap, %s Seconds Left Unfilled" % (len(packed), max(left_milli, 0) / 1000))
+
         commercial_list = []
-        commercial_dur_sum = 0
-        time_diff_milli = self.timedelta_milliseconds(time_diff)
         last_commercial = None
-        time_watch = prev_item_end_time 
-        new_commercial_start_time = prev_item_end_time + timedelta(seconds=1)
-        while curr_item_start_time > new_commercial_start_time:
-            print("-------------------------------------------")
-            time_diff = (curr_item_start_time - new_commercial_start_time)
-            time_diff_milli = self.timedelta_milliseconds(time_diff)
-            #random_commercial_without_pad = self.get_random_commercial()
-            random_commercial_without_pad = self.db.get_random_commercial_duration(self.MIN_DURATION_FOR_COMMERCIAL*1000,time_diff_milli-(self.COMMERCIAL_PADDING_IN_SECONDS*1000))
-            """
-            Padding the duration of commercials as per user specified padding.
-            """
-            try:
-                random_commercial = self.pad_the_commercial_dur(random_commercial_without_pad)
-            except Exception as e:
-                print("ERROR: " + str(e))
-                random_commercial_without_pad = self.db.get_random_commercial_duration(1,time_diff_milli-(self.COMMERCIAL_PADDING_IN_SECONDS*1000))
-                try:
-                    random_commercial = self.pad_the_commercial_dur(random_commercial_without_pad)
-                except Exception as e:
-                    print("ERROR: " + str(e))
-                    break
-            raw_commercial_milli = int(random_commercial_without_pad[4])
+        for random_commercial_without_pad in packed:
+            random_commercial = self.pad_the_commercial_dur(random_commercial_without_pad)
             new_commercial_milli = int(random_commercial[4])
-            commercial_dur_sum += new_commercial_milli
             if last_commercial != None:
                 new_commercial_start_time = last_commercial.end_time + timedelta(seconds=1)
-                new_commercial_end_time = new_commercial_start_time + \
-                                          timedelta(milliseconds=int(new_commercial_milli))
             else:
                 new_commercial_start_time = prev_item_end_time
-                new_commercial_end_time = new_commercial_start_time + \
-                                          timedelta(milliseconds=int(new_commercial_milli))
+            new_commercial_end_time = new_commercial_start_time + \
+                                      timedelta(milliseconds=int(new_commercial_milli))
             formatted_time_for_new_commercial = new_commercial_start_time.strftime('%H:%M:%S')
-            print("INFO: Time Left to Fill - " + str(time_diff))
             print("INFO: " + str(formatted_time_for_new_commercial) + " - " + str(random_commercial[3]) + " - " + str(random_commercial[4]/1000)) 
-            print(new_commercial_end_time)
             new_commercial = Commercial(
                 "Commercials",
                 random_commercial[3],
@@ -146,108 +120,6 @@ class PseudoChannelCommercial():
                 "3", #media_id,
                 None #notes
             )
-            
-            if last_commercial != None:
-                new_commercial_start_time = last_commercial.end_time + timedelta(seconds=1)
-                new_commercial_end_time = new_commercial_start_time + \
-                                          timedelta(milliseconds=int(new_commercial_milli))
-            else:
-                new_commercial_start_time = prev_item_end_time
-                new_commercial_end_time = new_commercial_start_time + \
-                                          timedelta(milliseconds=int(new_commercial_milli))
             last_commercial = new_commercial
-            while new_commercial_end_time - timedelta(seconds=self.COMMERCIAL_PADDING_IN_SECONDS)> curr_item_start_time:
-                print("NOTICE: Commercial Runs Too Long. Rerolling")
-                print("-------------------------------------------")
-                print("INFO: New Commercial End Time -  %s" % new_commercial_end_time)
-                print("INFO: Next Item Start Time -  %s" % curr_item_start_time)
-                print("-------------------------------------------")
-                time_diff_milli = time_diff_milli - 250
-                if time_diff_milli <= 100:
-                    break
-                random_commercial = self.db.get_random_commercial_duration(self.MIN_DURATION_FOR_COMMERCIAL*1000,time_diff_milli)
-                if last_commercial != None:
-                    new_commercial_start_time = last_commercial.end_time + timedelta(seconds=1)
-                    new_commercial_end_time = new_commercial_start_time + \
-                                              timedelta(milliseconds=int(new_commercial_milli))
-                else:
-                    new_commercial_start_time = prev_item_end_time
-                    new_commercial_end_time = new_commercial_start_time + \
-                                              timedelta(milliseconds=int(new_commercial_milli))
-                print("INFO: Time Left to Fill - " + str(time_diff))
-                try:
-                    print("INFO: " + str(formatted_time_for_new_commercial) + " - " + str(random_commercial[3]) + " | " + str(random_commercial[4]/1000))
-                except Exception as e:
-                    print("ERROR: " + str(e))
-                    break
-                new_commercial = Commercial(
-                    "Commercials",
-                    random_commercial[3],
-                    formatted_time_for_new_commercial, # natural_start_time
-                    new_commercial_end_time,
-                    random_commercial[4],
-                    "everyday", # day_of_week
-                    "true", # is_strict_time
-                    "1", # time_shift 
-                    "0", # overlap_max
-                    random_commercial[5], # plex_media_id
-                    random_commercial[6], # custom lib name
-                    "3", #media_id,
-                    None #notes
-                )
-                if random_commercial != None:
-                    break
-            
-            new_commercial_start_time = last_commercial.end_time + timedelta(seconds=1)
-            '''if new_commercial_end_time > curr_item_start_time:
-
-                # Fill up gap with commercials even if the last commercial gets cutoff
-                if self.USE_DIRTY_GAP_FIX:
-                    
-                    commercial_list.append(new_commercial)
-                # Find the best fitting final commercial and break
-                else:
-
-                    # If the gap is smaller than the shortest commercial, break.
-                    gapToFill = curr_item_start_time - datetime.strptime(new_commercial.natural_start_time, '%H:%M:%S')
-                    if int(self.commercials[0][4]) > self.timedelta_milliseconds(gapToFill):
-
-                        break
-                    else:
-
-                        print("NOTICE: Finding correct FINAL commercial to add to List.")
-
-                        last_comm = None
-                        #for comm in self.commercials:
-
-                        #if int(comm[4]) >= self.timedelta_milliseconds(gapToFill) and last_comm != None:
-
-                        #random_final_comm = last_comm
-                        random_final_comm = self.db.get_random_commercial_duration(self.timedelta_milliseconds(gapToFill)-1000,self.timedelta_milliseconds(gapToFill))
-
-                        formatted_time_for_final_commercial = datetime.strptime(new_commercial.natural_start_time, '%H:%M:%S').strftime('%H:%M:%S')
-
-                        final_commercial_end_time = datetime.strptime(new_commercial.natural_start_time, '%H:%M:%S') + \
-                                      timedelta(milliseconds=int(random_final_comm[4])) 
-
-                        final_commercial = Commercial(
-                            "Commercials",
-                            random_final_comm[3],
-                            formatted_time_for_final_commercial, # natural_start_time
-                            final_commercial_end_time,
-                            random_final_comm[4],
-                            "everyday", # day_of_week
-                            "true", # is_strict_time
-                            "1", # time_shift 
-                            "0", # overlap_max
-                            random_final_comm[5], # plex_media_id
-                            random_final_comm[6], # custom lib name
-                            "3", #media_id
-                            None #notes
-                        )
-                        commercial_list.append(final_commercial)
-                        #break
-                        #last_comm = comm
-                break'''
             commercial_list.append(new_commercial)
         return commercial_list
@@ -6,24 +6,110 @@ import time
 import random
 import json
 import ast
+import itertools
+import os
+from urllib.parse import quote
+from contextlib import contextmanager
+from src.DurationIndex import DurationIndex
+from src.MediaQuery import MediaQuery
+from src.ScheduleRow import ScheduleRow, DailyScheduleRow, EpisodeRow
 
 class PseudoChannelDatabase():
 
-    def __init__(self, db):
+    TAG_TABLES = MediaQuery.TAG_TABLES
+    TAG_COLUMNS = {
+        'movies' : {'genres' : 'genre', 'actors' : 'actor', 'collections' : 'collection', 'studio' : 'studio'},
+        'shows' : {'genres' : 'genre', 'actors' : 'actor', 'similar' : 'similar', 'studio' : 'studio'},
+    }
+    ART_TABLES = ('movies', 'shows', 'commercials')
+    # the media catalog: with a shared library attached these are temp views over its tables
+    LIBRARY_TABLES = ('movies', 'videos', 'music', 'shows', 'episodes', 'commercials', 'tags', 'movie_tags', 'show_tags', 'show_stats')
+    # per channel state laid over the shared library: view -> (state table in the channel database, column)
+    STATE_COLUMNS = {'shows' : ('show_state', 'lastEpisodeTitle'), 'movies' : ('movie_state', 'lastPlayedDate')}
+    # the plexLibraries kind whose customSectionNames a channel can leave out of each view
+    LIBRARY_SECTIONS = {'movies' : 'Movies', 'shows' : 'TV Shows', 'episodes' : 'TV Shows', 'commercials' : 'Commercials'}
+    # where a channel finds the shared library when its pseudo_config.py doesn't set libraryDatabase
+    LIBRARY_DATABASE = "../pseudo-channel.db"
+    # SELECT * on these tables comes back as typed rows (see row_factory)
+    ROW_CLASSES = dict((rowClass.FIELDS, rowClass) for rowClass in (ScheduleRow, DailyScheduleRow, EpisodeRow))
+
+    def __init__(self, db, library=None):
 
         self.db = db
-        self.conn = sqlite3.connect(self.db, check_same_thread=False)
+        self.library = None
+        self.conn = sqlite3.connect(self.db, check_same_thread=False, uri=True)
+        self.row_class_cache = (None, None)
+        self.conn.row_factory = self.row_factory
         self.cursor = self.conn.cursor()
+        # WAL + NORMAL: readers don't block the writer and a commit no longer waits on an fsync
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        self.batch_depth = 0
+        self.rng = random
+        self.duration_indexes = {}
+        self.filter_cache = {}
+        self.data_version = None
+        if library is not None:
+            self.attach_library(library)
+
+    def commit(self):
+
+        """Commit, unless a batch() is open (the batch commits once when it closes)."""
+        self.duration_indexes.clear()
+        if self.batch_depth == 0:
+            self.conn.commit()
+
+    def row_factory(self, cursor, row):
+
+        """Rows whose columns are exactly those of schedule / daily_schedule / episodes become
+        ScheduleRow / DailyScheduleRow / EpisodeRow, everything else stays a tuple. The class is
+        looked up once per query (the cursor keeps the same description for all of its rows).
+        """
+        description, rowClass = self.row_class_cache
+        if description is not cursor.description:
+            description = cursor.description
+            rowClass = self.ROW_CLASSES.get(tuple(column[0] for column in description))
+            self.row_class_cache = (description, rowClass)
+        return row if rowClass is None else rowClass(*row)
+
+    @contextmanager
+    def batch(self):
+
+        """Group many writes into a single transaction:
+
+            with db.batch():
+                for ...: db.add_movies_to_db(...)
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.conn.rollback()
+            raise
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.duration_indexes.clear()
+            self.filter_cache.clear()
+            self.conn.commit()
 
     """Database functions.
         Utilities, etc.
     """
     def create_tables(self):
 
+        """The media tables (unless they come from a shared library) and the channel's own tables."""
+        if self.library is None:
+            self.create_library_tables()
+        self.create_channel_tables()
+
+    def create_library_tables(self):
+
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'movies(id INTEGER PRIMARY KEY AUTOINCREMENT, '
                   'unix INTEGER, mediaID INTEGER, title TEXT, duration INTEGER, '
-                  'lastPlayedDate TEXT, plexMediaID TEXT, customSectionName Text, rating TEXT, summary TEXT, releaseYear TEXT, genres TEXT, actors TEXT, collections TEXT, studio TEXT)')
+                  'lastPlayedDate TEXT, plexMediaID TEXT, customSectionName Text, rating TEXT, summary TEXT, releaseYear TEXT, genres TEXT, actors TEXT, collections TEXT, studio TEXT, art TEXT)')
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'videos(id INTEGER PRIMARY KEY AUTOINCREMENT, '
                   'unix INTEGER, mediaID INTEGER, title TEXT, duration INTEGER, plexMediaID TEXT, customSectionName Text)')
@@ -33,14 +119,28 @@ class PseudoChannelDatabase():
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'shows(id INTEGER PRIMARY KEY AUTOINCREMENT, '
                   'unix INTEGER, mediaID INTEGER, title TEXT, duration INTEGER, '
-                  'lastEpisodeTitle TEXT, premierDate TEXT, plexMediaID TEXT, customSectionName Text, rating TEXT, genres TEXT, actors TEXT, similar TEXT, studio TEXT)')
+                  'lastEpisodeTitle TEXT, premierDate TEXT, plexMediaID TEXT, customSectionName Text, rating TEXT, genres TEXT, actors TEXT, similar TEXT, studio TEXT, art TEXT)')
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'episodes(id INTEGER PRIMARY KEY AUTOINCREMENT, '
                   'unix INTEGER, mediaID INTEGER, title TEXT, duration INTEGER, '
                   'episodeNumber INTEGER, seasonNumber INTEGER, showTitle TEXT, plexMediaID TEXT, customSectionName Text, rating TEXT, airDate TEXT, summary TEXT)')
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'commercials(id INTEGER PRIMARY KEY AUTOINCREMENT, unix INTEGER, '
-                  'mediaID INTEGER, title TEXT, duration INTEGER, plexMediaID TEXT, customSectionName Text)')
+                  'mediaID INTEGER, title TEXT, duration INTEGER, plexMediaID TEXT, customSectionName Text, art TEXT)')
+        self.create_tag_tables()
+        self.create_show_stats_table()
+        self.create_art_columns()
+        #index
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_plexMediaID ON episodes (plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_movie_plexMediaID ON movies (plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_shows_plexMediaID ON shows (plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_video_plexMediaID ON videos (plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_music_plexMediaID ON music (plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_commercial_plexMediaID ON commercials (plexMediaID);')
+        self.create_indexes()
+
+    def create_channel_tables(self):
+
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'schedule(id INTEGER PRIMARY KEY AUTOINCREMENT, unix INTEGER, '
                   'mediaID INTEGER, title TEXT, duration INTEGER, startTime TEXT, '
@@ -53,14 +153,15 @@ class PseudoChannelDatabase():
                   'dayOfWeek TEXT, sectionType TEXT, plexMediaID TEXT, customSectionName TEXT, notes TEXT)')
         self.cursor.execute('CREATE TABLE IF NOT EXISTS '
                   'app_settings(id INTEGER PRIMARY KEY AUTOINCREMENT, version TEXT)')
-        #index
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_plexMediaID ON episodes (plexMediaID);')
-        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_movie_plexMediaID ON movies (plexMediaID);')
-        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_shows_plexMediaID ON shows (plexMediaID);')
-        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_video_plexMediaID ON videos (plexMediaID);')
-        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_music_plexMediaID ON music (plexMediaID);')
-        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_commercial_plexMediaID ON commercials (plexMediaID);')
         self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_settings_version ON app_settings (version);')
+        if self.library is not None:
+            self.create_state_tables()
+        #named settings (sync marks, etc.) live next to the version row
+        settingsColumns = [column[1] for column in self.cursor.execute('PRAGMA table_info(app_settings)').fetchall()]
+        if 'name' not in settingsColumns:
+            self.cursor.execute('ALTER TABLE app_settings ADD COLUMN name TEXT')
+            self.cursor.execute('ALTER TABLE app_settings ADD COLUMN value TEXT')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_settings_name ON app_settings (name);')
         """Setting Basic Settings
         """
         try:
@@ -74,6 +175,327 @@ class PseudoChannelDatabase():
             self.conn.rollback()
             raise e
 
+    def create_art_columns(self):
+
+        """Databases made before the art column was added get it here (it stays empty until the next update)."""
+        for table in self.ART_TABLES:
+            columns = [column[1] for column in self.cursor.execute('PRAGMA table_info('+table+')').fetchall()]
+            if 'art' not in columns:
+                self.cursor.execute('ALTER TABLE '+table+' ADD COLUMN art TEXT')
+
+    def create_indexes(self):
+
+        """Indexes for the episode queue lookups (next / first / random episode of a show).
+        Safe to run on an existing database, see check_query_plans()."""
+        if self.library is not None:
+            # the shared library is read only here, Global_DatabaseUpdate.py indexes it
+            return
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_showTitle_id ON episodes (showTitle COLLATE NOCASE, id);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_mediaID_season_episode ON episodes (mediaID, seasonNumber, episodeNumber);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_duration ON episodes (duration);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_mediaID_duration ON episodes (mediaID, duration);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_shows_title ON shows (title COLLATE NOCASE);')
+        self.conn.commit()
+
+    '''
+    *
+    * Shared library. The channels used to get a full copy of the main directory's database each
+    * (with their queues written back into it row by row). Now a channel attaches the main
+    * database read only as "library" and sees its media tables through temp views of the same
+    * names, so every query here works unchanged. The views leave out the libraries the channel
+    * doesn't have (library_exclusions) and lay the channel's own queue / play dates
+    * (show_state, movie_state) over the shared rows; updating those columns through a view
+    * writes the state table instead (INSTEAD OF trigger).
+    *
+    '''
+    @staticmethod
+    def find_library(directory, path):
+
+        """The shared library database for the channel in directory (path is relative to it), None when there is none."""
+        if not path:
+            return None
+        path = os.path.abspath(os.path.join(directory, path))
+        if not os.path.isfile(path) or path == os.path.abspath(os.path.join(directory, 'pseudo-channel.db')):
+            return None
+        return path
+
+    def attach_library(self, path):
+
+        self.cursor.execute("ATTACH DATABASE ? AS library", ('file:'+quote(os.path.abspath(path))+'?mode=ro', ))
+        self.library = path
+        self.create_state_tables()
+        self.create_library_views()
+
+    def reattach_library(self, path):
+
+        """Attach path as the shared library again, or no library when path is None (it may have been created or moved since)."""
+        if self.library is not None:
+            for table in self.LIBRARY_TABLES:
+                self.cursor.execute("DROP VIEW IF EXISTS temp."+table)
+            self.cursor.execute("DETACH DATABASE library")
+            self.library = None
+            self.duration_indexes.clear()
+            self.filter_cache.clear()
+            self.data_version = None
+        if path is not None:
+            self.attach_library(path)
+
+    @staticmethod
+    def backup_database(source, target):
+
+        """Consistent copy of the database at source (also while others have it open in WAL mode) in a single file at target."""
+        sourceConn = sqlite3.connect(source)
+        targetConn = sqlite3.connect(target)
+        try:
+            sourceConn.backup(targetConn)
+            targetConn.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            targetConn.close()
+            sourceConn.close()
+
+    @staticmethod
+    def install_database(build, path):
+
+        """Put the database built at build in place of the one at path, then remove build.
+
+        The channels and the daemon keep path ATTACHed, so a database there is overwritten through
+        SQLite's backup API instead of replacing the file: its -wal / -shm files stay its own and
+        the open connections read the new library from their next query on. Only when there is no
+        database at path yet is build renamed into place."""
+        buildConn = sqlite3.connect(build)
+        try:
+            buildConn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            buildConn.execute("PRAGMA journal_mode=DELETE")
+            if os.path.isfile(path):
+                conn = sqlite3.connect(path)
+                try:
+                    buildConn.backup(conn)
+                finally:
+                    conn.close()
+        finally:
+            buildConn.close()
+        if os.path.isfile(path):
+            os.remove(build)
+        else:
+            for suffix in ('-wal', '-shm'):
+                if os.path.isfile(path+suffix):
+                    os.remove(path+suffix)
+            os.replace(build, path)
+
+    def create_state_tables(self):
+
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'show_state(title TEXT PRIMARY KEY COLLATE NOCASE, lastEpisodeTitle TEXT)')
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'movie_state(title TEXT PRIMARY KEY COLLATE NOCASE, lastPlayedDate TEXT)')
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'library_exclusions(section TEXT, customSectionName TEXT, PRIMARY KEY (section, customSectionName))')
+        self.conn.commit()
+
+    def create_library_views(self):
+
+        excluded = set(row[0] for row in self.cursor.execute("SELECT DISTINCT section FROM main.library_exclusions").fetchall())
+        for table in self.LIBRARY_TABLES:
+            self.cursor.execute("DROP VIEW IF EXISTS temp."+table)
+            columns = [column[1] for column in self.cursor.execute('PRAGMA library.table_info('+table+')').fetchall()]
+            if not columns:
+                continue
+            stateTable, stateColumn = self.STATE_COLUMNS.get(table, (None, None))
+            sql = "CREATE TEMP VIEW "+table+" AS SELECT "+", ".join(
+                "COALESCE(state."+column+", media."+column+") AS "+column if column == stateColumn else "media."+column
+                for column in columns)+" FROM library."+table+" AS media"
+            if stateTable is not None:
+                sql = sql + " LEFT JOIN main."+stateTable+" AS state ON state.title = media.title"
+            if self.LIBRARY_SECTIONS.get(table) in excluded:
+                sql = sql + (" WHERE media.customSectionName NOT IN (SELECT customSectionName FROM main.library_exclusions"
+                    " WHERE section = '"+self.LIBRARY_SECTIONS[table]+"')")
+            self.cursor.execute(sql)
+            if stateTable is not None:
+                self.cursor.execute("CREATE TEMP TRIGGER "+stateTable+"_update INSTEAD OF UPDATE OF "+stateColumn+" ON "+table+
+                    " BEGIN INSERT OR REPLACE INTO "+stateTable+" (title, "+stateColumn+") VALUES (NEW.title, NEW."+stateColumn+"); END")
+        self.duration_indexes.clear()
+
+    def set_library_exclusions(self, exclusions):
+
+        """Leave these libraries of the shared library out of this channel: {'Movies' : [customSectionName, ...], ...}"""
+        with self.batch():
+            self.cursor.execute("DELETE FROM library_exclusions")
+            self.cursor.executemany("INSERT OR IGNORE INTO library_exclusions (section, customSectionName) VALUES (?, ?)",
+                [(section, name) for section, names in exclusions.items() for name in names])
+        if self.library is not None:
+            self.create_library_views()
+
+    def import_state_from_copy(self):
+
+        """A channel database from before the shared library still holds its own copy of the media
+        tables: keep its queues and play dates as channel state, then drop the copy. Returns whether
+        there was one."""
+        tables = [row[0] for row in self.cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'").fetchall()]
+        copied = [table for table in self.LIBRARY_TABLES if table in tables]
+        if not copied:
+            return False
+        with self.batch():
+            for table, (stateTable, column) in self.STATE_COLUMNS.items():
+                if table in copied:
+                    self.cursor.execute("INSERT OR REPLACE INTO "+stateTable+" (title, "+column+") SELECT title, "+column+
+                        " FROM main."+table+" WHERE "+column+" IS NOT NULL AND "+column+" != ''")
+            for table in copied:
+                self.cursor.execute("DROP TABLE main."+table)
+        self.cursor.execute("VACUUM main")
+        return True
+
+    QUERY_PLAN_CHECKS = [
+        ("next episode", "SELECT * FROM episodes WHERE ( id > ? AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1",
+            (0, ''), 'idx_episode_showTitle_id'),
+        ("first episode", "SELECT id, MIN(episodeNumber), MIN(seasonNumber) FROM episodes WHERE ( showTitle = ? COLLATE NOCASE)",
+            ('', ), 'idx_episode_showTitle_id'),
+        ("first episode by show id", "SELECT id, MIN(episodeNumber), MIN(seasonNumber) FROM episodes WHERE ( mediaID = ?)",
+            (0, ), 'idx_episode_mediaID_'),
+        ("episode id", "SELECT id FROM episodes WHERE (showTitle = ? COLLATE NOCASE AND plexMediaID = ?)",
+            ('', ''), 'idx_episode_'),
+        ("random episode by data", "SELECT * FROM episodes WHERE mediaID = ? AND duration BETWEEN ? and ? and seasonNumber = ?",
+            (0, 0, 0, 0), 'idx_episode_mediaID_'),
+        ("episodes by duration", "SELECT * FROM episodes WHERE (duration BETWEEN ? and ?)",
+            (0, 0), 'idx_episode_duration'),
+        ("random show with episodes of a length", "SELECT id FROM shows WHERE EXISTS (SELECT 1 FROM episodes WHERE episodes.mediaID = shows.mediaID AND episodes.duration BETWEEN ? and ?)",
+            (0, 0), 'idx_episode_mediaID_duration'),
+        ("show queue", "SELECT lastEpisodeTitle FROM shows WHERE title = ? COLLATE NOCASE",
+            ('', ), 'idx_shows_title'),
+    ]
+
+    def check_query_plans(self):
+
+        """Run EXPLAIN QUERY PLAN on the episode queue lookups.
+        Returns a list of (name, uses expected index, plan detail)."""
+        results = []
+        for name, sql, params, index in self.QUERY_PLAN_CHECKS:
+            plan = self.cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            detail = "; ".join(str(row[-1]) for row in plan)
+            results.append((name, index in detail, detail))
+        return results
+
+    '''
+    *
+    * genres / actors / collections / similar are stored on movies and shows as str(list) blobs.
+    * The tag tables keep the same data normalized (one row per tag per item) so the filters can
+    * match whole tags through an index instead of LIKE-scanning the blobs.
+    *
+    '''
+    def create_tag_tables(self):
+
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'tags(id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, tag TEXT COLLATE NOCASE)')
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'movie_tags(tagID INTEGER, plexMediaID TEXT)')
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'show_tags(tagID INTEGER, plexMediaID TEXT)')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tags_kind_tag ON tags (kind, tag);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_movie_tags_tag ON movie_tags (tagID, plexMediaID);')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_show_tags_tag ON show_tags (tagID, plexMediaID);')
+        self.conn.commit()
+
+    def ensure_tag_tables(self):
+
+        """Create the tag tables and fill them from the movies / shows columns if a database predates them."""
+        if self.library is not None:
+            return
+        self.create_tag_tables()
+        if self.cursor.execute("SELECT 1 FROM tags LIMIT 1").fetchone() is None:
+            if self.cursor.execute("SELECT 1 FROM movies UNION ALL SELECT 1 FROM shows LIMIT 1").fetchone() is not None:
+                print("NOTICE: Building tag tables")
+                self.rebuild_tag_tables()
+
+    def parse_tag_list(self, value):
+
+        if value is None or value == '':
+            return []
+        if value.startswith('['):
+            try:
+                return [str(tag) for tag in ast.literal_eval(value) if tag]
+            except (ValueError, SyntaxError):
+                return []
+        return [value]
+
+    def rebuild_tag_tables(self):
+
+        tagIDs = {}
+        with self.batch():
+            self.cursor.execute("DELETE FROM tags")
+            for table, columns in self.TAG_COLUMNS.items():
+                tagTable = self.TAG_TABLES[table]
+                self.cursor.execute("DELETE FROM "+tagTable)
+                rows = self.cursor.execute("SELECT plexMediaID, "+", ".join(columns)+" FROM "+table).fetchall()
+                links = set()
+                for row in rows:
+                    for kind, value in zip(columns.values(), row[1:]):
+                        for tag in self.parse_tag_list(value):
+                            key = (kind, tag.lower())
+                            if key not in tagIDs:
+                                self.cursor.execute("INSERT INTO tags (kind, tag) VALUES (?, ?)", (kind, tag))
+                                tagIDs[key] = self.cursor.lastrowid
+                            links.add((tagIDs[key], row[0]))
+                self.cursor.executemany("INSERT INTO "+tagTable+" (tagID, plexMediaID) VALUES (?, ?)", links)
+
+    '''
+    *
+    * show_stats: one row per show summing up its episodes (count, shortest / longest / median
+    * duration, first / last air date, seasons), rebuilt after every library update. The random
+    * show pickers check it first, so shows without any episode in the slot's window (or decade)
+    * are left out before their episodes are looked at.
+    *
+    '''
+    def create_show_stats_table(self):
+
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                  'show_stats(mediaID INTEGER, episodes INTEGER, minDuration INTEGER, maxDuration INTEGER, '
+                  'medianDuration INTEGER, firstAirDate TEXT, lastAirDate TEXT, seasons INTEGER)')
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_show_stats_mediaID ON show_stats (mediaID);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_show_stats_duration ON show_stats (maxDuration, minDuration);')
+        self.conn.commit()
+
+    def ensure_show_stats(self):
+
+        """Create and fill show_stats if a database predates it."""
+        if self.library is not None:
+            return
+        self.create_show_stats_table()
+        if self.cursor.execute("SELECT 1 FROM show_stats LIMIT 1").fetchone() is None:
+            if self.cursor.execute("SELECT 1 FROM episodes LIMIT 1").fetchone() is not None:
+                print("NOTICE: Building show stats")
+                self.rebuild_show_stats()
+
+    def rebuild_show_stats(self):
+
+        stats = []
+        self.cursor.execute("SELECT mediaID, duration, airDate, seasonNumber FROM episodes "
+            "WHERE duration IS NOT NULL ORDER BY mediaID, duration")
+        for mediaID, episodes in itertools.groupby(self.cursor.fetchall(), key=lambda episode: episode[0]):
+            episodes = list(episodes)
+            durations = [episode[1] for episode in episodes]
+            airDates = sorted(str(episode[2]) for episode in episodes if episode[2])
+            stats.append((mediaID, len(episodes), durations[0], durations[-1], durations[len(durations) // 2],
+                airDates[0] if airDates else None, airDates[-1] if airDates else None,
+                len(set(episode[3] for episode in episodes))))
+        with self.batch():
+            self.cursor.execute("DELETE FROM show_stats")
+            self.cursor.executemany("INSERT OR REPLACE INTO show_stats "
+                "(mediaID, episodes, minDuration, maxDuration, medianDuration, firstAirDate, lastAirDate, seasons) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", stats)
+
+    def add_show_stats_filter(self, query, min, max, datestring=None):
+
+        """Keep the shows of query (a MediaQuery on shows) that have episodes between min and max ms long
+        (and aired in datestring, a date prefix). Leaves query as it is when show_stats hasn't been built."""
+        try:
+            if self.cursor.execute("SELECT 1 FROM show_stats LIMIT 1").fetchone() is None:
+                return query
+        except sqlite3.OperationalError:
+            return query
+        if datestring != None:
+            return query.where("mediaID IN (SELECT mediaID FROM show_stats WHERE maxDuration >= ? AND minDuration <= ?"
+                " AND lastAirDate >= ? AND firstAirDate < ?)", min, max, str(datestring), str(datestring)+"\uffff")
+        return query.where("mediaID IN (SELECT mediaID FROM show_stats WHERE maxDuration >= ? AND minDuration <= ?)", min, max)
+
     def drop_db(self):
 
         pass
@@ -119,6 +541,79 @@ class PseudoChannelDatabase():
         self.cursor.execute(sql)
         self.conn.commit()
 
+    def get_setting(self, name):
+
+        self.cursor.execute("SELECT value FROM app_settings WHERE name = ?", (name, ))
+        setting = self.cursor.fetchone()
+        return setting[0] if setting is not None else None
+
+    def set_setting(self, name, value):
+
+        try:
+            self.cursor.execute("INSERT OR REPLACE INTO app_settings "
+                      "(name, value) VALUES (?, ?)", 
+                      (name, str(value)))
+            self.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
+    def get_section_row_count(self, table, customSectionName):
+
+        sql = "SELECT COUNT(*) FROM "+table+" WHERE customSectionName = ?"
+        self.cursor.execute(sql, (customSectionName, ))
+        return self.cursor.fetchone()[0]
+
+    def get_section_plexMediaIDs(self, table, customSectionName):
+
+        sql = "SELECT plexMediaID FROM "+table+" WHERE customSectionName = ?"
+        self.cursor.execute(sql, (customSectionName, ))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def remove_media_by_plexMediaID(self, table, plexMediaIDs):
+
+        sql = "DELETE FROM "+table+" WHERE plexMediaID = ?"
+        try:
+            self.cursor.executemany(sql, [(plexMediaID, ) for plexMediaID in plexMediaIDs])
+            self.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
+    def remove_show_episodes(self, showTitle, customSectionName):
+
+        sql = "DELETE FROM episodes WHERE showTitle = ? AND customSectionName = ?"
+        try:
+            self.cursor.execute(sql, (showTitle, customSectionName, ))
+            self.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
+    def remove_shows_for_update(self, plexMediaIDs, customSectionName):
+
+        """Delete shows that are about to be re-added, with their episodes in customSectionName.
+        Returns {plexMediaID: lastEpisodeTitle} to hand to restore_show_queues() once they are back."""
+        queues = {}
+        for plexMediaID in plexMediaIDs:
+            self.cursor.execute("SELECT title, lastEpisodeTitle FROM shows WHERE plexMediaID = ?", (plexMediaID, ))
+            show = self.cursor.fetchone()
+            if show is not None:
+                queues[plexMediaID] = show[1]
+                self.remove_show_episodes(show[0], customSectionName)
+        self.remove_media_by_plexMediaID('shows', plexMediaIDs)
+        return queues
+
+    def restore_show_queues(self, queues):
+
+        sql = "UPDATE shows SET lastEpisodeTitle = ? WHERE plexMediaID = ?"
+        try:
+            self.cursor.executemany(sql, [(lastEpisodeTitle, plexMediaID) for plexMediaID, lastEpisodeTitle in queues.items() if lastEpisodeTitle])
+            self.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
     """Database functions.
         Setters, etc.
     """
@@ -135,14 +630,15 @@ class PseudoChannelDatabase():
         genres,
         actors,
         collections,
-        studio):
+        studio,
+        art=None):
 
         unix = int(time.time())
         try:
             self.cursor.execute("REPLACE INTO movies "
-                      "(unix, mediaID, title, duration, plexMediaID, customSectionName, rating, summary, releaseYear, genres, actors, collections, studio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
-                      (unix, mediaID, title, duration, plexMediaID, customSectionName, rating, summary, releaseYear, genres, actors, collections, studio))
-            self.conn.commit()
+                      "(unix, mediaID, title, duration, plexMediaID, customSectionName, rating, summary, releaseYear, genres, actors, collections, studio, art) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+                      (unix, mediaID, title, duration, plexMediaID, customSectionName, rating, summary, releaseYear, genres, actors, collections, studio, art))
+            self.commit()
         # Catch the exception
         except Exception as e:
             # Roll back any change if something goes wrong
@@ -163,7 +659,7 @@ class PseudoChannelDatabase():
                       "(unix, mediaID, title, duration, plexMediaID, customSectionName) VALUES (?, ?, ?, ?, ?, ?)", 
                       (unix, mediaID, title, duration, plexMediaID, customSectionName))
 
-            self.conn.commit()
+            self.commit()
         # Catch the exception
         except Exception as e:
             # Roll back any change if something goes wrong
@@ -183,14 +679,18 @@ class PseudoChannelDatabase():
         genres,
         actors,
         similar,
-        studio):
+        studio,
+        art=None):
 
         unix = int(time.time())
         try:
             self.cursor.execute("INSERT OR IGNORE INTO shows "
-                      "(unix, mediaID, title, duration, lastEpisodeTitle, premierDate, plexMediaID, customSectionName, rating, genres, actors, similar, studio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
-                      (unix, mediaID, title, duration, lastEpisodeTitle, premierDate, plexMediaID, customSectionName, rating, genres, actors, similar, studio))
-            self.conn.commit()
+                      "(unix, mediaID, title, duration, lastEpisodeTitle, premierDate, plexMediaID, customSectionName, rating, genres, actors, similar, studio, art) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+                      (unix, mediaID, title, duration, lastEpisodeTitle, premierDate, plexMediaID, customSectionName, rating, genres, actors, similar, studio, art))
+            if art is not None:
+                # the row is kept when the show already exists (it holds the episode queue), so refresh its art
+                self.cursor.execute("UPDATE shows SET art = ? WHERE plexMediaID = ?", (art, plexMediaID))
+            self.commit()
         # Catch the exception
         except Exception as e:
             # Roll back any change if something goes wrong
@@ -216,7 +716,7 @@ class PseudoChannelDatabase():
             self.cursor.execute("INSERT INTO episodes "
                 "(unix, mediaID, title, duration, episodeNumber, seasonNumber, showTitle, plexMediaID, customSectionName, rating, airDate, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (unix, mediaID, title, duration, episodeNumber, seasonNumber, showTitle, plexMediaID, customSectionName, rating, airDate, summary))
-            self.conn.commit()
+            self.commit()
         # Catch the exception
         except Exception as e:
             # Roll back any change if something goes wrong
@@ -242,7 +742,22 @@ class PseudoChannelDatabase():
             self.cursor.execute("REPLACE INTO episodes "
                 "(unix, mediaID, title, duration, episodeNumber, seasonNumber, showTitle, plexMediaID, customSectionName, rating, airDate, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
                 (unix, mediaID, title, duration, episodeNumber, seasonNumber, showTitle, plexMediaID, customSectionName, rating, airDate, summary)) 
-            self.conn.commit()
+            self.commit()
+        # Catch the exception
+        except Exception as e:
+            # Roll back any change if something goes wrong
+            self.conn.rollback()
+            raise e
+
+    def add_episodes_to_db_many(self, episodes):
+
+        """Insert many episodes with one executemany(). Each entry holds the add_episodes_to_db() arguments, in order."""
+        unix = int(time.time())
+        try:
+            self.cursor.executemany("REPLACE INTO episodes "
+                "(unix, mediaID, title, duration, episodeNumber, seasonNumber, showTitle, plexMediaID, customSectionName, rating, airDate, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+                [(unix, ) + tuple(episode) for episode in episodes])
+            self.commit()
         # Catch the exception
         except Exception as e:
             # Roll back any change if something goes wrong
@@ -255,14 +770,15 @@ class PseudoChannelDatabase():
         title, 
         duration, 
         plexMediaID, 
-        customSectionName):
+        customSectionName,
+        art=None):
 
         unix = int(time.time())
         try:
             self.cursor.execute("REPLACE INTO commercials "
-                      "(unix, mediaID, title, duration, plexMediaID, customSectionName) VALUES (?, ?, ?, ?, ?, ?)", 
-                      (unix, mediaID, title, duration, plexMediaID, customSectionName))
-            self.conn.commit()
+                      "(unix, mediaID, title, duration, plexMediaID, customSectionName, art) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                      (unix, mediaID, title, duration, plexMediaID, customSectionName, art))
+            self.commit()
         # Catch the exception
         except Exception as e:
             print("ERROR: "+str(plexMediaID))
@@ -509,7 +1025,7 @@ class PseudoChannelDatabase():
         return self.cursor.fetchall()
 
     def get_episode_from_season_episode(self, title, seasonNumber, episodeNumber):
-        sql = "SELECT * FROM episodes WHERE (showTitle LIKE ?) AND (seasonNumber LIKE ?) AND (episodeNumber LIKE ?) LIMIT 1"
+        sql = "SELECT * FROM episodes WHERE (showTitle = ? COLLATE NOCASE) AND (seasonNumber = ?) AND (episodeNumber = ?) LIMIT 1"
         self.cursor.execute(sql, (title, seasonNumber, episodeNumber, ))
         return self.cursor.fetchone()
 
@@ -591,16 +1107,112 @@ class PseudoChannelDatabase():
         media = "episodes"
         return self.get_media(title, media)
 
+    def get_art(self, section, title, duration=None):
+
+        """The art path stored for a movie / show / commercial of a library section (of the entries with
+        that title, the one closest to duration), or None. Uses its own cursor: the player calls this
+        from its worker threads.
+        """
+        sql = ("SELECT art FROM (" +
+               " UNION ALL ".join("SELECT art, duration FROM "+table+" WHERE title = ? COLLATE NOCASE AND customSectionName = ?" for table in self.ART_TABLES) +
+               ") WHERE art IS NOT NULL AND art != '' ORDER BY abs(duration - ?) LIMIT 1")
+        params = []
+        for table in self.ART_TABLES:
+            params.extend([title, section])
+        params.append(int(duration or 0))
+        try:
+            row = self.conn.execute(sql, params).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
     def get_commercials(self):
 
         self.cursor.execute("SELECT * FROM commercials ORDER BY duration ASC")
         datalist = list(self.cursor.fetchall())
         return datalist
         
-    def get_random_commercial_duration(self,min,max):
-        sql = "SELECT * FROM commercials WHERE (duration BETWEEN ? and ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql, (min, max, ))
-        return self.cursor.fetchone()        
+    '''
+    *
+    * Random picks. Instead of ORDER BY RANDOM() (a sort of the whole filtered set per pick) the
+    * (duration, id) pairs of a table are kept sorted in a DurationIndex: a pick is two bisects,
+    * a random index and one lookup by id. The indexes are dropped whenever this connection writes
+    * or another connection changes the database (PRAGMA data_version).
+    *
+    '''
+    RANDOM_PICK_FILTERS = {
+        'commercials' : "",
+        'movies' : "",
+        'episodes' : " WHERE customSectionName NOT LIKE 'playlist'",
+        'shows' : " WHERE customSectionName NOT LIKE 'playlist'",
+    }
+
+    def check_data_version(self):
+
+        """Drop the duration indexes and the filter cache when another connection changed the database."""
+        data_version = self.cursor.execute("PRAGMA data_version").fetchone()[0]
+        if self.library is not None:
+            data_version = (data_version, self.cursor.execute("PRAGMA library.data_version").fetchone()[0])
+        if data_version != self.data_version:
+            self.duration_indexes.clear()
+            self.filter_cache.clear()
+            self.data_version = data_version
+
+    def get_duration_index(self, table):
+
+        self.check_data_version()
+        if table not in self.duration_indexes:
+            self.cursor.execute("SELECT duration, id FROM "+table+self.RANDOM_PICK_FILTERS[table])
+            self.duration_indexes[table] = DurationIndex(self.cursor.fetchall())
+        return self.duration_indexes[table]
+
+    def get_random_by_duration(self, table, min=None, max=None):
+
+        picked = self.get_duration_index(table).pick(min, max, self.rng)
+        if picked is None:
+            return None
+        self.cursor.execute("SELECT * FROM "+table+" WHERE id = ?", (picked[1], ))
+        return self.cursor.fetchone()
+
+    def get_random_row(self, table, where, params=()):
+
+        """Uniform random row matching 'where': the matching ids come from the indexes, one is chosen in Python."""
+        self.cursor.execute("SELECT id FROM "+table+" WHERE "+where, params)
+        ids = self.cursor.fetchall()
+        if not ids:
+            return None
+        self.cursor.execute("SELECT * FROM "+table+" WHERE id = ?", (self.rng.choice(ids)[0], ))
+        return self.cursor.fetchone()
+
+    def get_filtered_ids(self, query):
+
+        """ids of the rows a MediaQuery matches. The filters of a daily schedule's slots repeat, so the
+        ids are kept per statement and parameters until clear_filter_cache() (or a write to the library)."""
+        self.check_data_version()
+        key = query.key()
+        if key not in self.filter_cache:
+            self.cursor.execute(query.sql("id"), query.params)
+            self.filter_cache[key] = [row[0] for row in self.cursor.fetchall()]
+        return self.filter_cache[key]
+
+    def clear_filter_cache(self):
+
+        self.filter_cache.clear()
+
+    def get_filtered_rows(self, query, order=""):
+
+        """The rows a MediaQuery matches (ids from the filter cache, rows read fresh so order sees new play dates)."""
+        ids = self.get_filtered_ids(query)
+        self.cursor.execute("SELECT * FROM "+query.table+" WHERE id IN (SELECT value FROM json_each(?))"+order, (json.dumps(ids), ))
+        return self.cursor.fetchall()
+
+    def get_random_filtered_row(self, query):
+
+        ids = self.get_filtered_ids(query)
+        if not ids:
+            return None
+        self.cursor.execute("SELECT * FROM "+query.table+" WHERE id = ?", (self.rng.choice(ids), ))
+        return self.cursor.fetchone()
 
     def get_movies(self):
 
@@ -612,7 +1224,7 @@ class PseudoChannelDatabase():
         xtraArgs = ['rating','releaseYear','decade','genre','actor','collection','studio']
         xtraDict = {}
         xtraDict['rating']=None
-        xtraDict['release']=None
+        xtraDict['releaseYear']=None
         xtraDict['decade']=None
         xtraDict['genre']=None
         xtraDict['actor']=None
@@ -621,8 +1233,6 @@ class PseudoChannelDatabase():
         print("INFO: xtra = " + str(xtra))
         if xtra != None:
             for x in xtra:
-                x = x.replace("'",r"''")
-                x = x.replace('"',r'""')
                 x = x.split(':')
                 if x[0] in xtraArgs and x[1] != None:
                     xtraDict[x[0]] = []
@@ -632,33 +1242,18 @@ class PseudoChannelDatabase():
                             xtraDict[x[0]].append(eachArg)
                     else:
                         xtraDict[x[0]].append(x[1])
-        cursor_execute = "SELECT * FROM movies WHERE (duration BETWEEN "+str(min)+" and "+str(max)+")"
+        query = MediaQuery('movies').between('duration', min, max)
         if xtraDict['rating'] != None:
-            cursor_execute = cursor_execute + "and rating LIKE \""+xtraDict['rating'][0]+"\""
-        if xtraDict['release'] != None:
-            cursor_execute = cursor_execute + " and releaseYear LIKE "+str(xtraDict['release'][0])+"\""
+            query.like('rating', xtraDict['rating'][0])
+        if xtraDict['releaseYear'] != None:
+            query.starts_with('releaseYear', xtraDict['releaseYear'][0])
         elif xtraDict['decade'] != None:
-            dec = str(xtraDict['decade'][0][0:3])
-            cursor_execute = cursor_execute + "and releaseYear LIKE \""+dec+"%\""
-        if xtraDict['genre'] != None:
-             for g in xtraDict['genre']:
-                if g != '':
-                    cursor_execute = cursor_execute + " and genres LIKE \"%" + g + "%\""
-        if xtraDict['actor'] != None:
-            for a in xtraDict['actor']:
-                if a != '':
-                    cursor_execute = cursor_execute + " and (actors LIKE \"%"+a+"%\")"
-        if xtraDict['collection'] != None:
-            for a in xtraDict['collection']:
-                if a != '':
-                    cursor_execute = cursor_execute + " and (collections LIKE \"%"+a+"%\")"
-        if xtraDict['studio'] != None:
-            cursor_execute = cursor_execute + "and studio LIKE \"%"+xtraDict['studio'][0]+"%\""
-        cursor_execute = cursor_execute + " ORDER BY date(lastPlayedDate) ASC"
-        print("ACTION: " + cursor_execute)
-        self.cursor.execute(cursor_execute)
-        datalist = self.cursor.fetchall()
-        return datalist
+            query.starts_with('releaseYear', str(xtraDict['decade'][0][0:3]))
+        for kind in ['genre','actor','collection','studio']:
+            if xtraDict[kind] != None:
+                query.tagged(kind, xtraDict[kind])
+        print("ACTION: " + query.sql() + " " + str(query.params))
+        return self.get_filtered_rows(query, " ORDER BY date(lastPlayedDate) ASC")
 
     def get_movies_data(self,section,min,max,year,genres,actors,collections,rating,studios):
         print("INFO: " + str(min) + ', ' + str(max) + ', ' + str(year) + ', ' + str(genres) + ', ' + str(actors) + ', ' + str(collections) + ', ' + str(rating) + ', ' + str(studios))
@@ -731,108 +1326,64 @@ class PseudoChannelDatabase():
             release=None
             decade=None
         if genres != None and ',' in genres:
-            genres=genres.replace("'",r"''").replace('"',r'""').split(',')
+            genres=genres.split(',')
             for genre in genres:
                 print("INFO: Genre = " + genre)
                 genresList.append(genre)
         elif genres != None:
-            genres=genres.replace("'",r"''").replace('"',r'""')
             print("INFO: Genre = " + genres)
             genresList.append(genres)
         if actors != None:
             if type(actors) == list:
                 for actor in actors:
                     print("INFO: Actor = " + actor)
-                    actor=actor.replace("'",r"''").replace('"',r'""')
                     actorsList.append(actor)
             else:
                 print("INFO: Actor = " + actors)
-                actors=actors.replace("'",r"''").replace('"',r'""')
                 actorsList.append(actors)
         if collections != None and ',' in collections:
-            collections=collections.replace("'",r"''")
-            collections=collections.replace('"',r'""')
             collections=collections.split(',')
             for collection in collections:
                 print("INFO: Collection = " + collection)
                 collectionsList.append(collection)
         elif collections != None:
-            collections=collections.replace("'",r"''").replace('"',r'""')
             print("INFO: Collection = " + collections)
             collectionsList.append(collections)
         if studios != None and ',' in studios:
-            studios=studios.replace("'",r"''").replace('"',r'""').split(',')
+            studios=studios.split(',')
             for studio in studios:
                 print("INFO: Studio = " + studio)
                 studiosList.append(studio)
         elif studios != None:
-            studios=studio.replace("'",r"''").replace('"',r'""')
             print("INFO: Studio = " + studios)
             studiosList.append(studios)
-        cursor_execute = "SELECT * FROM movies WHERE (duration BETWEEN "+str(min)+" and "+str(max)+")"
+        query = MediaQuery('movies').between('duration', min, max)
         if rating != None:
-            if len(ratingsAllowed) == 1:
-                cursor_execute = cursor_execute + " and rating LIKE \""+rating[1]+"\""
-            elif len(ratingsAllowed) > 0:
-                c = 0
-                for r in ratingsAllowed:
-                    if c == 0:
-                        cursor_execute = cursor_execute + " and (rating IN (\""+r+"\""
-                    else:
-                        cursor_execute = cursor_execute + ", \""+r+"\""
-                    c = c + 1
-                cursor_execute = cursor_execute + "))"
+            query.any_of('rating', ratingsAllowed)
         if release != None:
-            cursor_execute = cursor_execute + " and releaseYear LIKE "+str(release)+"%\""
+            query.starts_with('releaseYear', release)
         elif decade != None:
-            dec = str(decade[0:3])
-            cursor_execute = cursor_execute + " and releaseYear LIKE \""+dec+"%\""
-        if genresList != None:
-             for g in genresList:
-                if g != '':
-                    cursor_execute = cursor_execute + " and genres LIKE \"%" + g + "%\""
-        if actorsList != None:
-            for a in actorsList:
-                if a != '':
-                    cursor_execute = cursor_execute + " and (actors LIKE \"%"+a+"%\")"
-        if collectionsList != None:
-            for c in collectionsList:
-                if c != '':
-                    cursor_execute = cursor_execute + " and (collections LIKE \"%"+c+"%\")"
-        if studiosList != None:
-            for s in studiosList:
-                if s != '':
-                    cursor_execute = cursor_execute + "and studio LIKE \"%"+s+"%\""
-        cursor_execute = cursor_execute + " ORDER BY date(lastPlayedDate) ASC"
-        print("ACTION: " + cursor_execute)
-        self.cursor.execute(cursor_execute)
-        datalist = self.cursor.fetchall()
-        return datalist
+            query.starts_with('releaseYear', str(decade[0:3]))
+        for kind, tagList in [('genre', genresList), ('actor', actorsList), ('collection', collectionsList), ('studio', studiosList)]:
+            query.tagged(kind, tagList)
+        print("ACTION: " + query.sql() + " " + str(query.params))
+        return self.get_filtered_rows(query, " ORDER BY date(lastPlayedDate) ASC")
 
     def get_specific_episode(self, tvshow, season=None, episode=None):
         if season is None and episode is None:
             print("ERROR: Season and Episode Numbers Not Found")
             pass
         elif season is None:
-            episode = str(episode)
-            sql = ("SELECT * FROM episodes WHERE ( showTitle LIKE ? and episodeNumber LIKE ?) ORDER BY RANDOM()")
-            self.cursor.execute(sql, (tvshow, "%"+episode+"&", ))
+            return self.get_random_row('episodes', "showTitle = ? COLLATE NOCASE and episodeNumber = ?", (tvshow, episode, ))
         elif episode is None:
-            season = str(season)
-            sql = ("SELECT * FROM episodes WHERE ( showTitle LIKE ? and seasonNumber LIKE ?) ORDER BY RANDOM()")
-            self.cursor.execute(sql, (tvshow, "%"+season+"%", ))
+            return self.get_random_row('episodes', "showTitle = ? COLLATE NOCASE and seasonNumber = ?", (tvshow, season, ))
         else:
-            episode = str(episode)
-            season = str(season)
-            sql = ("SELECT * FROM episodes WHERE ( showTitle LIKE ? and seasonNumber LIKE ? and episodeNumber LIKE ?) ORDER BY RANDOM()")
-            self.cursor.execute(sql, (tvshow, "%"+season+"%", "%"+episode+"%", ))
-        media_item = self.cursor.fetchone()
-        return media_item
+            return self.get_random_row('episodes', "showTitle = ? COLLATE NOCASE and seasonNumber = ? and episodeNumber = ?", (tvshow, season, episode, ))
 
     def get_first_episode(self, tvshow):
 
         sql = ("SELECT id, unix, mediaID, title, duration, MIN(episodeNumber), MIN(seasonNumber), "
-                "showTitle, plexMediaID, customSectionName FROM episodes WHERE ( showTitle LIKE ?) COLLATE NOCASE")
+                "showTitle, plexMediaID, customSectionName FROM episodes WHERE ( showTitle = ? COLLATE NOCASE)")
         self.cursor.execute(sql, (tvshow, ))
         first_episode = self.cursor.fetchone()
         return first_episode
@@ -840,7 +1391,7 @@ class PseudoChannelDatabase():
     def get_first_episode_by_id(self, tvshow):
 
         sql = ("SELECT id, unix, mediaID, title, duration, MIN(episodeNumber), MIN(seasonNumber), "
-                "showTitle, plexMediaID, customSectionName FROM episodes WHERE ( mediaID LIKE ?) COLLATE NOCASE")
+                "showTitle, plexMediaID, customSectionName FROM episodes WHERE ( mediaID = ?)")
         self.cursor.execute(sql, (tvshow, ))
         first_episode = self.cursor.fetchone()
         return first_episode
@@ -857,14 +1408,14 @@ class PseudoChannelDatabase():
         return episode_id
 
     def get_episode_from_plexMediaID(self,plexMediaID):
-        sql = "SELECT * FROM episodes WHERE (plexMediaID LIKE ?) COLLATE NOCASE"
+        sql = "SELECT * FROM episodes WHERE (plexMediaID = ?)"
         self.cursor.execute(sql, (plexMediaID, ))
         episode = self.cursor.fetchone()
         return episode
 
     ####mutto233 made this one#### UPDATED 5/2/2020
     def get_episode_id_alternate(self,plexMediaID,series):
-        sql = "SELECT id FROM episodes WHERE (showTitle LIKE ? AND plexMediaID LIKE ?) COLLATE NOCASE"
+        sql = "SELECT id FROM episodes WHERE (showTitle = ? COLLATE NOCASE AND plexMediaID = ?)"
         self.cursor.execute(sql, (series,plexMediaID, ))
         episode_id = self.cursor.fetchone()
         return episode_id
@@ -877,68 +1428,48 @@ class PseudoChannelDatabase():
         return self.cursor.fetchone()
 
     def get_episode_id_by_show_id(self,plexMediaID,series):
-        sql = "SELECT id FROM episodes WHERE (mediaID LIKE ? AND plexMediaID LIKE ?) COLLATE NOCASE"
+        sql = "SELECT id FROM episodes WHERE (mediaID = ? AND plexMediaID = ?)"
         self.cursor.execute(sql, (series,plexMediaID, ))
         episode_id = self.cursor.fetchone()
         return episode_id
 
     def get_random_episode(self):
 
-        sql = "SELECT * FROM episodes WHERE id IN (SELECT id FROM episodes ORDER BY RANDOM() LIMIT 1)"
-        self.cursor.execute(sql)
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('episodes')
 
     def get_random_episode_duration(self,min,max):
-        sql = "SELECT * FROM episodes WHERE (customSectionName NOT LIKE 'playlist' AND duration BETWEEN ? and ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql, (min, max, ))
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('episodes', min, max)
 
     ####mutto233 made this one####
     def get_random_episode_alternate(self,series):
 
-        sql = "SELECT * FROM episodes WHERE (showTitle LIKE ? AND id IN (SELECT id FROM episodes ORDER BY RANDOM() LIMIT 1))"
-        self.cursor.execute(sql, (series, ))
-        return self.cursor.fetchone()
+        return self.get_random_row('episodes', "showTitle = ? COLLATE NOCASE", (series, ))
     ####mutto233 made this one####
 
     def get_random_movie(self):
 
-        sql = "SELECT * FROM movies WHERE id IN (SELECT id FROM movies ORDER BY RANDOM() LIMIT 1)"
-        self.cursor.execute(sql)
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('movies')
 
     def get_random_movie_duration(self,min,max):
 
-        sql = "SELECT * FROM movies WHERE (duration BETWEEN ? and ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql, (min, max, ))
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('movies', min, max)
 
     ###added 5/4/2020###
     def get_random_episode_of_show(self,series):
         print(series.upper())
-        sql = "SELECT * FROM episodes WHERE (showTitle LIKE ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql, (series, ))
-        return self.cursor.fetchone()
+        return self.get_random_row('episodes', "showTitle = ? COLLATE NOCASE", (series, ))
 
     def get_random_episode_of_show_alt(self,series):
-        sql = "SELECT * FROM episodes WHERE (showTitle LIKE '%"+series+"%') ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql)
-        return self.cursor.fetchone()
+        return self.get_random_row('episodes', "showTitle LIKE ?", ('%'+series+'%', ))
 
     def get_random_episode_of_show_duration(self,series,min,max):
-        sql = "SELECT * FROM episodes WHERE (showTitle LIKE '%"+series+"%' AND duration BETWEEN ? and ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql (min, max, ))
-        return self.cursor.fetchone()
+        return self.get_random_row('episodes', "showTitle LIKE ? AND duration BETWEEN ? and ?", ('%'+series+'%', min, max, ))
 
     def get_random_show(self):
-        sql = "SELECT * FROM shows WHERE (customSectionName NOT LIKE 'playlist' AND id IN (SELECT id FROM shows ORDER BY RANDOM() LIMIT 1))"
-        self.cursor.execute(sql)
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('shows')
     ###
     def get_random_show_duration(self,min,max):
-        sql = "SELECT * FROM shows WHERE (customSectionName NOT LIKE 'playlist' AND duration BETWEEN ? and ?) ORDER BY RANDOM() LIMIT 1"
-        self.cursor.execute(sql, (min, max, ))
-        return self.cursor.fetchone()
+        return self.get_random_by_duration('shows', min, max)
 
     def get_random_show_data(self,section,min,max,airDate,genres,actors,similar,rating,studios):
         print("INFO: " + str(min) + ', ' + str(max) + ', ' + str(airDate) + ', ' + str(genres) + ', ' + str(actors) + ', ' + str(similar) + ', ' + str(rating) + ', ' + str(studios))
@@ -999,187 +1530,101 @@ class PseudoChannelDatabase():
             except:
                 ratingsAllowed = []
         if genres != None and ',' in genres:
-            genres=genres.replace("'",r"''").replace('"',r'""').split(',')
+            genres=genres.split(',')
             for genre in genres:
                 print("INFO: Genre = " + genre)
                 genresList.append(genre)
         elif genres != None:
-            genres=genres.replace("'",r"''").replace('"',r'""')
             print("INFO: Genre = " + genres)
             genresList.append(genres)
         if actors != None:
             if type(actors) == list:
                 for actor in actors:
                     print("INFO: Actor = " + actor)
-                    actor=actor.replace("'",r"''").replace('"',r'""')
                     actorsList.append(actor)
             else:
                 print("INFO: Actor = " + actors)
-                actors=actors.replace("'",r"''").replace('"',r'""')
                 actorsList.append(actors)
         if similar != None and ',' in similar:
-            similar=similar.replace("'",r"''")
-            similar=similar.replace('"',r'""')
             similar=similar.split(',')
             for s in similar:
                 print("INFO: Similar = " + s)
                 similarList.append(s)
         elif similar != None:
-            similar=similar.replace("'",r"''").replace('"',r'""')
             print("INFO: Similar = " + similar)
             similarList.append(similar)
         if studios != None and ',' in studios:
-            studios=studios.replace("'",r"''").replace('"',r'""').split(',')
+            studios=studios.split(',')
             for studio in studios:
                 print("INFO: Studio = " + studio)
                 studiosList.append(studio)
         elif studios != None:
-            try:
-                studios=studio.replace("'",r"''").replace('"',r'""')
-                print("INFO: Studio = " + studios)
-                studiosList.append(studios)
-            except:
-                pass
-        cursor_execute = "SELECT * FROM shows WHERE (customSectionName LIKE \"TV Shows\")"
-        leading_and = True
-        if rating != None:
-            if len(ratingsAllowed) == 1:
-                cursor_execute = cursor_execute + " and rating LIKE \""+rating[1]+"\""
-                leading_and = True
-            elif len(ratingsAllowed) > 0:
-                c = 0
-                for r in ratingsAllowed:
-                    if c == 0:
-                        cursor_execute = cursor_execute + " and (rating IN (\""+r+"\""
-                    else:
-                        cursor_execute = cursor_execute + ", \""+r+"\""
-                    c = c + 1
-                cursor_execute = cursor_execute + "))"
-        if genresList != None:
-            for g in genresList:
-                if g != '':
-                    cursor_execute = cursor_execute + " and genres LIKE \"%" + g + "%\""
-                    leading_and = True
-        if actorsList != None:
-            for a in actorsList:
-                if a != '':
-                    cursor_execute = cursor_execute + " and (actors LIKE \"%"+a+"%\")"
-                    leading_and = True
-        if similarList != None:
-            for sim in similarList:
-                if sim != '':
-                    cursor_execute = cursor_execute + " and (similar LIKE \"%"+sim+"%\")"
-                    leading_and = True
-        if studiosList != None:
-            for s in studiosList:
-                if s != '':
-                    cursor_execute = cursor_execute + " and studio LIKE \"%"+s+"%\""
-                    leading_and = True
-        cursor_execute = cursor_execute + " ORDER BY mediaID ASC"
-        print("ACTION: " + cursor_execute)
-        self.cursor.execute(cursor_execute)
-        showslist = self.cursor.fetchall()
-        if datestring != None:
-            episode_execute = "SELECT * FROM episodes WHERE (duration BETWEEN "+str(min)+" and "+str(max)+") and airDate LIKE \""+str(datestring)+"%\" ORDER BY mediaID ASC"
-            print("INFO: " + episode_execute)
-            self.cursor.execute(episode_execute)
-            episodelist = self.cursor.fetchall()
-            datalist = []
-        else:
-            episode_execute = "SELECT * FROM episodes WHERE (duration BETWEEN "+str(min)+" and "+str(max)+") ORDER BY mediaID ASC"
-            print("INFO: " + episode_execute)
-            self.cursor.execute(episode_execute)
-            episodelist = self.cursor.fetchall()
-            datalist = []
-        for one_episode in episodelist:
-            for one_show in showslist:
-                if one_episode[2] == one_show[2] and one_show not in datalist:
-                    datalist.append(one_show)
-        print("INFO: " + str(len(showslist)) + " shows found.")
-        if datalist != []:
-            print("INFO: " + str(len(datalist)) + " matching shows found")
-            the_show = random.choice(datalist)
-        else:
+            print("INFO: Studio = " + studios)
+            studiosList.append(studios)
+        if rating == None:
+            ratingsAllowed = []
+        query = MediaQuery('shows').like('customSectionName', section).any_of('rating', ratingsAllowed)
+        for kind, tagList in [('genre', genresList), ('actor', actorsList), ('similar', similarList), ('studio', studiosList)]:
+            query.tagged(kind, tagList)
+        the_show = self.get_random_show_with_episodes(query, min, max, datestring)
+        if the_show is None:
             print("INFO: NO MATCHING SHOWS FOUND, TRYING AGAIN WITHOUT SOME METADATA")
-            #get shows list with only length, rating and date filters
-            cursor_execute = "SELECT * FROM shows WHERE (customSectionName LIKE \"TV Shows\")"
-            if rating != None:
-                if len(ratingsAllowed) == 1:
-                    cursor_execute = cursor_execute + " and rating LIKE \""+rating[1]+"\""
-                    leading_and = True
-                elif len(ratingsAllowed) > 0:
-                    c = 0
-                    for r in ratingsAllowed:
-                        if c == 0:
-                            cursor_execute = cursor_execute + " and (rating IN (\""+r+"\""
-                        else:
-                            cursor_execute = cursor_execute + ", \""+r+"\""
-                        c = c + 1
-                    cursor_execute = cursor_execute + "))"
-            cursor_execute = cursor_execute + " ORDER BY mediaID ASC"
-            print("ACTION: " + cursor_execute)
-            self.cursor.execute(cursor_execute)
-            showslist = self.cursor.fetchall()
-            episode_execute = "SELECT * FROM episodes WHERE (duration BETWEEN "+str(min)+" and "+str(max)+") ORDER BY mediaID ASC"
-            print("INFO: " + episode_execute)
-            self.cursor.execute(episode_execute)
-            episodelist = self.cursor.fetchall()
-            datalist = []
-            for one_episode in episodelist:
-                for one_show in showslist:
-                    if one_episode[2] == one_show[2] and one_show not in datalist:
-                        datalist.append(one_show)
-            print("INFO: " + str(len(showslist)) + " shows found.")
-            if datalist != []:
-                print("INFO: " + str(len(datalist)) + " matching shows found")
-                the_show = random.choice(datalist)
-        #print(str(the_show))
+            #get shows list with only length and rating filters
+            query = MediaQuery('shows').like('customSectionName', section).any_of('rating', ratingsAllowed)
+            the_show = self.get_random_show_with_episodes(query, min, max)
         return the_show
 
+    def get_random_show_with_episodes(self, query, min, max, datestring=None):
+
+        """Random show matching query (a MediaQuery on shows) with at least one episode between min and
+        max ms long (aired in datestring, a date prefix, if given). Shows that show_stats rules out are
+        skipped, the episodes of the others are checked through idx_episode_mediaID_duration; no episode
+        is read into Python."""
+        self.add_show_stats_filter(query, min, max, datestring)
+        exists = "EXISTS (SELECT 1 FROM episodes WHERE episodes.mediaID = shows.mediaID AND episodes.duration BETWEEN ? and ?"
+        params = [min, max]
+        if datestring != None:
+            exists = exists + " AND episodes.airDate LIKE ?"
+            params.append(str(datestring)+"%")
+        query.where(exists + ")", *params)
+        print("ACTION: " + query.sql() + " " + str(query.params))
+        return self.get_random_filtered_row(query)
+
     def get_random_episode_of_show_by_data(self, seriesID, min, max, date, season=None, episode=None):
         print("INFO: "+ str(seriesID) + ', ' + str(min) + ', ' + str(max) + ', ' + str(date) + ', Season: ' + str(season) + ', Episode: ' + str(episode))
-        cursor_execute = "SELECT * FROM episodes WHERE mediaID LIKE \""+str(seriesID)+"\" AND duration BETWEEN \""+str(min)+"\" and \""+str(max)+"\""
+        query = MediaQuery('episodes').where("mediaID = ?", seriesID).between('duration', min, max)
         if season != None:
-            cursor_execute = cursor_execute + " and seasonNumber LIKE \""+str(season)+"\""
+            query.where("seasonNumber = ?", season)
         if episode != None:
-            cursor_execute = cursor_execute + " and episodeNumber LIKE \""+str(episode)+"\""
-        if date != None:
-            try:
-                if str(date)[3] == '*':
-                    date = str(date)[0:3]
-                cursor_execute = cursor_execute + " and airDate LIKE \""+str(date)+"%\""
-            except:
-                pass
-        cursor_execute = cursor_execute + " ORDER BY RANDOM() LIMIT 1"
-        print("INFO: " + cursor_execute)
-        self.cursor.execute(cursor_execute)
-        return self.cursor.fetchone()
+            query.where("episodeNumber = ?", episode)
+        if date != None and len(str(date)) > 3 and str(date)[3] == '*':
+            date = str(date)[0:3]
+        query.starts_with('airDate', date)
+        print("INFO: " + query.condition() + " " + str(query.params))
+        return self.get_random_filtered_row(query)
 
     def get_random_episode_of_show_by_data_alt(self, series, min, max, date, season=None, episode=None):
         print("INFO: "+ str(series) + ', ' + str(min) + ', ' + str(max) + ', ' + str(date) + ', Season: ' + str(season) + ', Episode: ' + str(episode))
-        cursor_execute = "SELECT * FROM episodes WHERE showTitle LIKE \""+series+"\" AND duration BETWEEN \""+str(min)+"\" and \""+str(max)+"\""
+        query = MediaQuery('episodes').where("showTitle = ? COLLATE NOCASE", series).between('duration', min, max)
         if season != None:
-            cursor_execute = cursor_execute + " and seasonNumber LIKE \""+str(season)+"\""
+            query.where("seasonNumber = ?", season)
         if episode != None:
-            cursor_execute = cursor_execute + " and episodeNumber LIKE \""+str(episode)+"\""
-        if date != None:
-            cursor_execute = cursor_execute + " and airDate LIKE \""+date+"%\""
-        cursor_execute = cursor_execute + " ORDER BY RANDOM() LIMIT 1"
-        print("INFO: " + cursor_execute)
-        self.cursor.execute(cursor_execute)
-        random_episode = self.cursor.fetchone()
+            query.where("episodeNumber = ?", episode)
+        query.starts_with('airDate', date)
+        print("INFO: " + query.condition() + " " + str(query.params))
+        random_episode = self.get_random_filtered_row(query)
         print("INFO: "+str(random_episode))
         return random_episode
 
     ####mutto233 made this one####
-    def get_next_episode(self, series, entry):
+    def get_next_episode(self, series, entry, scheduled=None):
         '''
         *
         * As a way of storing a "queue", I am storing the *next episode title in the "shows" table so I can 
         * determine what has been previously scheduled for each show
         *
         '''
-        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE title LIKE ? COLLATE NOCASE", (series, ))
+        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE title = ? COLLATE NOCASE", (series, ))
         last_title_list = self.cursor.fetchone()
         '''
         *
@@ -1217,12 +1662,12 @@ class PseudoChannelDatabase():
             try:
                 print("NOTICE: Getting next episode of "+series.upper()+ " by matching ID and series or playlist name")
                 sql = ("SELECT * FROM episodes WHERE ( id > "+str(self.get_episode_id_alternate(last_title_list[0],series)[0])+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
             except TypeError:
                 try:
                     print("NOTICE: Getting next episode by matching title")
                     sql = ("SELECT * FROM episodes WHERE ( id > "+str(self.get_episode_id(last_title_list[0])[0])+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
                     print("NOTICE: We have an old school last episode title. Using old method, then converting to new method")
                 except TypeError:
                     sql = ""
@@ -1251,31 +1696,9 @@ class PseudoChannelDatabase():
                 return next_episode
             else:
                 print("NOTICE: Series must be over.")
-                first_episode = self.get_first_episode(series)
-                if 22 <= int(entry[2]) <= 24:
-                    print("INFO: MediaID = " + str(entry[2]))
-                    print("ACTION: Checking for Similar Show")
-                    showData = self.get_shows(series)
-                    similar = self.get_similar(series,showData[4])
-                    if similar != None:
-                        first_episode = self.get_first_episode(similar)
-                        self.update_schedule_entry_with_new_show(similar, entry[0])
-                    else:
-                        if int(entry[2]) == 24 or int(entry[2]) == 23:
-                            sameRating = self.get_by_rating(series,showData[4],showData[9])
-                            if sameRating != None:
-                                first_episode = self.get_first_episode(sameRating)
-                                self.update_schedule_entry_with_new_show(sameRating, entry[0])
-                            else:
-                                if int(entry[2]) == 24:
-                                    newShow = self.get_any(series,showData[4])
-                                    first_episode = self.get_first_episode(newShow)
-                                    self.update_schedule_entry_with_new_show(newShow, entry[0])
-                        else:
-                            print("ACTION: Restarting from First Episode")
-                return first_episode
+                return self.get_first_episode_or_replacement(series, entry, scheduled)
 
-    def get_next_episode_alt(self, series, ID, entry):
+    def get_next_episode_alt(self, series, ID, entry, scheduled=None):
         '''
         *
         * As a way of storing a "queue", I am storing the *next episode title in the "shows" table so I can 
@@ -1315,12 +1738,12 @@ class PseudoChannelDatabase():
             try:
                 print("NOTICE: Getting next episode of "+series.upper()+ " by matching ID and series or playlist name")
                 sql = ("SELECT * FROM episodes WHERE ( id > "+str(ID)+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
             except TypeError:
                 try:
                     print("NOTICE: Getting next episode by matching ID and series or playlist name")
                     sql = ("SELECT * FROM episodes WHERE ( id > "+str(ID)+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
                     print("NOTICE: We have an old school last episode title. Using old method, then converting to new method")
                 except TypeError:
                     sql = ""
@@ -1342,123 +1765,91 @@ class PseudoChannelDatabase():
                 return next_episode
             else:
                 print("NOTICE: Series must be over.")
-                first_episode = self.get_first_episode(series)
-                if 22 <= int(entry[2]) <= 24:
-                    print("INFO: MediaID = " + str(entry[2]))
-                    print("ACTION: Checking for Similar Show")
-                    showData = self.get_shows(series)
-                    similar = self.get_similar(series,showData[4])
-                    if similar != None:
-                        first_episode = self.get_first_episode(similar)
-                        self.update_schedule_entry_with_new_show(similar, entry[0])
-                    else:
-                        if int(entry[2]) == 24 or int(entry[2]) == 23:
-                            sameRating = self.get_by_rating(series,showData[4],showData[9])
-                            if sameRating != None:
-                                first_episode = self.get_first_episode(sameRating)
-                                self.update_schedule_entry_with_new_show(sameRating, entry[0])
-                            else:
-                                if int(entry[2]) == 24:
-                                    newShow = self.get_any(series,showData[4])
-                                    first_episode = self.get_first_episode(newShow)
-                                    self.update_schedule_entry_with_new_show(newShow, entry[0])
-                        else:
-                            print("ACTION: Restarting from First Episode")
-                return first_episode
+                return self.get_first_episode_or_replacement(series, entry, scheduled)
+
+    def get_first_episode_or_replacement(self, series, entry, scheduled=None):
+
+        """series has no episodes left: its first episode, or the first episode of a show replacing it
+        in the schedule entry when its mediaID asks for one (22: a similar show, 23: or one with the
+        same rating, 24: or any show of about the same length)."""
+        first_episode = self.get_first_episode(series)
+        if 22 <= int(entry[2]) <= 24:
+            print("INFO: MediaID = " + str(entry[2]))
+            print("ACTION: Checking for Similar Show")
+            if scheduled is None:
+                scheduled = self.get_scheduled_show_titles()
+            showData = self.get_shows(series)
+            newShow = self.get_similar(series,showData[4],scheduled)
+            if newShow == None and int(entry[2]) >= 23:
+                newShow = self.get_by_rating(series,showData[4],showData[9],scheduled)
+            if newShow == None and int(entry[2]) == 24:
+                newShow = self.get_any(series,showData[4],scheduled)
+            if newShow != None:
+                first_episode = self.get_first_episode(newShow)
+                self.update_schedule_entry_with_new_show(newShow, entry[0])
+                scheduled.add(newShow)
+                self.cursor.execute("SELECT 1 FROM schedule WHERE section = 'TV Shows' AND title = ? LIMIT 1", (series, ))
+                if self.cursor.fetchone() is None:
+                    # that was its only slot: it can take the place of another ended show now
+                    scheduled.discard(series)
+            else:
+                print("ACTION: Restarting from First Episode")
+        return first_episode
+
+    def get_scheduled_show_titles(self):
+
+        """Titles of the shows in the channel schedule. Worked out once per daily schedule generation
+        and handed to get_next_episode (shows taking the place of ended ones are added to it)."""
+        self.cursor.execute("SELECT title FROM schedule WHERE section = 'TV Shows'")
+        return set(row[0] for row in self.cursor.fetchall())
 
-    def get_any(self,series,duration):
+    def get_replacement_show(self, duration, scheduled, query=None):
+
+        """Random title of a show not in scheduled, lasting within 5 minutes of duration and matching query
+        (skipping shows whose show_stats say none of their episodes is that long)."""
+        durationMin = int(duration) - 300000
+        durationMax = int(duration) + 300000
+        query = query if query is not None else MediaQuery('shows')
+        query.where("duration > ? AND duration < ?", durationMin, durationMax)
+        self.add_show_stats_filter(query, durationMin, durationMax)
+        self.cursor.execute(query.sql("title"), query.params)
+        titles = sorted(set(row[0] for row in self.cursor.fetchall()) - scheduled)
+        if len(titles) == 0:
+            return None
+        new_show = self.rng.choice(titles)
+        print("INFO: New show is",new_show)
+        return new_show
+
+    def get_any(self,series,duration,scheduled=None):
         print("ACTION: Checking for New Show")
-        showsList = []
-        showsTitles = self.get_shows_titles()
-        for show_title in showsTitles:
-            show_scheduled = self.check_if_show_scheduled(show_title[0])
-            if show_scheduled == False:
-                newShowData = self.get_shows(show_title[0])
-                if duration-300000 < newShowData[4] < duration+300000:
-                    showsList.append(show_title[0])
-        if len(showsList) > 0:
-            new_show = random.choice(showsList)
-            print("INFO: New show is",new_show)
-        else:
-            print("ERROR: SIMILAR SHOW WITHIN LIMITATIONS NOT FOUND")
-            print("ACTION: Restarting from First Episode")
+        new_show = self.get_replacement_show(duration, scheduled if scheduled is not None else self.get_scheduled_show_titles())
+        if new_show == None:
+            print("ERROR: SHOW WITHIN LIMITATIONS NOT FOUND")
         return new_show
 
-    def get_by_rating(self,series,duration,rating):
+    def get_by_rating(self,series,duration,rating,scheduled=None):
         print("ACTION: Checking for Show with Rating: "+series)
-        showsList = []
-        shows = self.get_shows_table()
-        seriesData = self.get_shows(series)
-        for show in shows:
-            if show[9] == seriesData[9] and duration-300000 < show[4] < duration+300000:
-                show_scheduled = self.check_if_show_scheduled(show[3])
-                if show_scheduled == False:
-                    newShowData = self.get_shows(show[3])
-                    showsList.append(show[3])
-        if len(showsList) > 0:
-            new_show = random.choice(showsList)
-            print("INFO: New show is",new_show)
-        else:
-            new_show = None
+        new_show = self.get_replacement_show(duration, scheduled if scheduled is not None else self.get_scheduled_show_titles(),
+            MediaQuery('shows').where("rating = ?", rating))
+        if new_show == None:
             print("ERROR: SHOW WITHIN RATINGS LIMITATIONS NOT FOUND")
-            print("ACTION: Restarting from First Episode")
         return new_show
-                                
-    def get_similar(self,series,duration):
+
+    def get_similar(self,series,duration,scheduled=None):
         #get similar show from database and return if not already scheduled
         print("NOTICE: Getting similar show to "+series.upper()+ " by series name")
         sql = ("SELECT similar FROM shows WHERE title LIKE ? ORDER BY id LIMIT 1 COLLATE NOCASE")
-        durationMin = int(duration) - 300000
-        durationMax = int(duration) + 300000
         self.cursor.execute(sql, (series, ))
         result = self.cursor.fetchone()
-        #print(result[0])
-        similar_shows = ast.literal_eval(result[0])
-        similar_unscheduled = []
-        for similarShow in similar_shows:
-            show_in_db = self.check_if_show_in_db(similarShow)
-            if show_in_db == True:
-                showScheduled = self.check_if_show_scheduled(similarShow)
-            else:
-                showScheduled = False
-            if showScheduled == False and show_in_db == True:
-                showData = self.get_shows(similarShow)
-                if durationMin < showData[4] < durationMax:
-                    similar_unscheduled.append(similarShow)
-        if len(similar_unscheduled) > 0:
-            new_show = random.choice(similar_unscheduled)
-            print("INFO: New show is",new_show)
-        else:
-            new_show = None
+        similar_shows = self.parse_tag_list(result[0]) if result is not None else []
+        new_show = None
+        if len(similar_shows) > 0:
+            new_show = self.get_replacement_show(duration, scheduled if scheduled is not None else self.get_scheduled_show_titles(),
+                MediaQuery('shows').where("title IN (SELECT value FROM json_each(?))", json.dumps(similar_shows)))
+        if new_show == None:
             print("ERROR: SIMILAR SHOW WITHIN LIMITATIONS NOT FOUND")
         return new_show
         
-    def check_if_show_scheduled(self,series):
-        #check if a show is already in the schedule
-        print("ACTION: CHECKING IF "+series.upper()+" EXISTS IN CHANNEL SCHEDULE")
-        show_in_schedule = False
-        schedule = self.get_schedule()
-        for s in schedule:
-            if s[9] == "TV Shows" and s[3] == series:
-                show_in_schedule = True
-                print("INFO: "+series+" found in schedule!")
-        if show_in_schedule == False:
-            print("INFO: "+series+" NOT found in schedule!")
-        return show_in_schedule
-        
-    def check_if_show_in_db(self,series):
-        #check if a show is in the database
-        print("ACTION: CHECKING IF "+series.upper()+" EXISTS IN LOCAL DATABASE")
-        show_exists = False
-        showsTitles = self.get_shows_titles()
-        for show_title in showsTitles:
-            if show_title[0] == series:
-                show_exists = True
-                print("INFO: "+series+" found in database!")
-        if show_exists == False:
-            print("INFO: "+series+" not found in database!")
-        return show_exists
-
     def get_last_episode(self, series):
         '''
         *
@@ -1466,7 +1857,7 @@ class PseudoChannelDatabase():
         * determine what has been previously scheduled for each show
         *
         '''
-        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE mediaID LIKE ? COLLATE NOCASE", (series, ))
+        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE mediaID = ?", (series, ))
         last_title_list = self.cursor.fetchone()
         '''
         *
@@ -1503,13 +1894,13 @@ class PseudoChannelDatabase():
             try:
                 print("NOTICE: Getting last episode of "+str(series)+ " by matching ID and series or playlist ID")
                 sql = ("SELECT * FROM episodes WHERE ( id = "+str(self.get_episode_id_by_show_id(last_title_list[0],series)[0])+
-                       " AND mediaID LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND mediaID = ? ) ORDER BY id LIMIT 1")
             except TypeError as e:
                 print("ERROR: " + str(e))
                 try:
                     print("NOTICE: Getting last episode by matching title")
                     sql = ("SELECT * FROM episodes WHERE ( id = "+str(self.get_episode_id(last_title_list[0])[0])+
-                       " AND mediaID LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND mediaID = ? ) ORDER BY id LIMIT 1")
                     print("NOTICE: We have an old school last episode title. Using old method, then converting to new method")
                 except TypeError:
                     sql = ""
@@ -1534,7 +1925,7 @@ class PseudoChannelDatabase():
         * determine what has been previously scheduled for each show
         *
         '''
-        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE title LIKE ? COLLATE NOCASE", (series, ))
+        self.cursor.execute("SELECT lastEpisodeTitle FROM shows WHERE title = ? COLLATE NOCASE", (series, ))
         last_title_list = self.cursor.fetchone()
         '''
         *
@@ -1571,13 +1962,13 @@ class PseudoChannelDatabase():
             try:
                 print("NOTICE: Getting last episode of "+str(series)+ " by matching ID and series or playlist name")
                 sql = ("SELECT * FROM episodes WHERE ( id = "+str(self.get_episode_id_alternate(last_title_list[0],series)[0])+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
             except TypeError as e:
                 print("ERROR: " + str(e))
                 try:
                     print("NOTICE: Getting last episode by matching title")
                     sql = ("SELECT * FROM episodes WHERE ( id = "+str(self.get_episode_id(last_title_list[0])[0])+
-                       " AND showTitle LIKE ? ) ORDER BY id LIMIT 1 COLLATE NOCASE")
+                       " AND showTitle = ? COLLATE NOCASE ) ORDER BY id LIMIT 1")
                     print("NOTICE: We have an old school last episode title. Using old method, then converting to new method")
                 except TypeError:
                     sql = ""
@@ -1620,6 +2011,6 @@ class PseudoChannelDatabase():
         print("NOTICE: Getting Now Playing Item from Daily Schedule DB.")
         sql = "SELECT * FROM daily_schedule WHERE (time(endTime) >= time('now','localtime') AND time(startTime) <= time('now','localtime')) ORDER BY time(startTime) ASC"
         self.cursor.execute(sql)
-        datalist = list(self.cursor.fetchone())
+        datalist = self.cursor.fetchone()
         print("NOTICE: Done.")
         return datalist
@@ -0,0 +1,117 @@
+"""Commercial gap packing
+"""
+from collections import deque
+import random
+
+from src.DurationIndex import DurationIndex
+
+class PseudoChannelGapPacker():
+
+    """Chooses the commercials that fill a gap between two media items.
+
+    Commercials play back to back: each one takes its duration plus the user padding, and
+    consecutive commercials are SPACING_MS apart. Most of a long gap is filled with random
+    picks; the last EXACT_FILL_SECONDS are solved as a subset-sum over the (shuffled)
+    candidates, in units of WEIGHT_MS, so the run ends as close to the next item as the pool
+    allows, in one pass.
+    The last no_repeat_window commercials are not picked again while there are alternatives.
+    """
+
+    SPACING_MS = 1000
+    WEIGHT_MS = 10
+    EXACT_FILL_SECONDS = 600
+    MAX_EXACT_CANDIDATES = 250
+    NO_REPEAT_TRIES = 8
+
+    def __init__(self, commercials, padding_ms, no_repeat_window=0, seed=None, min_duration_ms=1000):
+
+        self.padding_ms = int(padding_ms)
+        self.rng = random.Random(seed)
+        self.recent = deque(maxlen=no_repeat_window if no_repeat_window > 0 else 0)
+        usable = [commercial for commercial in commercials if int(commercial[4] or 0) >= min_duration_ms]
+        self.index = DurationIndex(usable, duration=self.cost)
+
+    def cost(self, commercial):
+
+        """Time (ms) a commercial takes up in a run of commercials."""
+        return int(commercial[4]) + self.padding_ms + self.SPACING_MS
+
+    def remember(self, commercial):
+
+        if self.recent.maxlen:
+            self.recent.append(commercial[5])
+
+    def pick(self, max_cost):
+
+        commercial = None
+        for i in range(self.NO_REPEAT_TRIES):
+            commercial = self.index.pick(None, max_cost, self.rng)
+            if commercial is None or commercial[5] not in self.recent:
+                break
+        if commercial is not None:
+            self.remember(commercial)
+        return commercial
+
+    def fill_exactly(self, capacity_ms):
+
+        """Subset of the candidates with the largest total cost <= capacity_ms (costs rounded up to WEIGHT_MS)."""
+        capacity = int(capacity_ms // self.WEIGHT_MS)
+        if capacity < 0:
+            return []
+        lo, hi = self.index.bounds(None, capacity * self.WEIGHT_MS)
+        positions = list(range(lo, hi))
+        fresh = [position for position in positions if self.index.items[position][5] not in self.recent]
+        if fresh:
+            positions = fresh
+        if len(positions) > self.MAX_EXACT_CANDIDATES:
+            positions = self.rng.sample(positions, self.MAX_EXACT_CANDIDATES)
+        else:
+            self.rng.shuffle(positions)
+        # bit t of reachable is set when some subset of the candidates so far costs t units;
+        # steps keeps the set before each candidate to walk back from the best total
+        full = (1 << (capacity + 1)) - 1
+        reachable = 1
+        steps = []
+        for position in positions:
+            commercial = self.index.items[position]
+            weight = -(-self.cost(commercial) // self.WEIGHT_MS)
+            steps.append((reachable, weight, commercial))
+            reachable |= (reachable << weight) & full
+            if reachable >> capacity & 1:
+                break
+        best = reachable.bit_length() - 1
+        chosen = []
+        for before, weight, commercial in reversed(steps):
+            if not before >> best & 1:
+                best -= weight
+                chosen.append(commercial)
+                self.remember(commercial)
+        return chosen
+
+    def pack(self, gap_ms):
+
+        """Commercials (unpadded database rows) to play back to back in a gap of gap_ms, and the ms left unfilled."""
+        # the last commercial needs neither its padding nor the spacing after it to fit
+        capacity = int(gap_ms) + self.padding_ms + self.SPACING_MS
+        if capacity <= 0:
+            # the previous item runs past the next one's start: nothing to place
+            return [], int(gap_ms)
+        packed = []
+        tail = self.EXACT_FILL_SECONDS * 1000
+        while capacity > tail:
+            commercial = self.pick(capacity - tail)
+            if commercial is None:
+                commercial = self.pick(capacity)
+            if commercial is None:
+                break
+            packed.append(commercial)
+            capacity -= self.cost(commercial)
+        packed.extend(self.fill_exactly(capacity))
+        self.rng.shuffle(packed)
+        left = int(gap_ms) + self.padding_ms + self.SPACING_MS - sum(self.cost(commercial) for commercial in packed)
+        return packed, left
+
+    def pick_overrun(self, min_cost):
+
+        """A commercial longer than min_cost, for the "dirty gap fix" (it will get cut off)."""
+        return self.index.pick(min_cost, None, self.rng) or self.index.pick(None, None, self.rng)
@@ -0,0 +1,121 @@
+"""Plays a channel's daily schedule on a PseudoChannelTimer
+"""
+import datetime
+import threading
+
+from src.ScheduleIndex import ScheduleIndex
+from src.ScheduleTime import ScheduleTime
+
+class PseudoChannelRunner():
+
+    """One channel's daily schedule held in memory and played through its controller: every item
+    gets a timer job at its start time (tagged with tag, so stop() drops just this channel's jobs)
+    and play_now() starts whatever should be on right now at the right offset into it. Used by
+    "PseudoChannel.py -r" for its one channel and by PseudoChannelDaemon.py for all of them.
+    """
+
+    def __init__(self, db, controller, timer, tag='daily-tasks'):
+
+        self.db = db
+        self.controller = controller
+        self.timer = timer
+        self.tag = tag
+        self.schedule = []
+        self.index = ScheduleIndex([])
+        self.running = True
+        self.lock = threading.Lock()
+
+    def load(self, schedule=None):
+
+        """Keep schedule (by default the channel's daily_schedule table) in memory, indexed by time of day."""
+        self.schedule = list(schedule if schedule is not None else self.db.get_daily_schedule())
+        self.index = ScheduleIndex(self.schedule)
+        return self.schedule
+
+    @staticmethod
+    def now_ms(now=None):
+
+        now = now if now is not None else datetime.datetime.now()
+        return ScheduleTime.to_seconds(now) * 1000 + now.microsecond // 1000
+
+    def get_now_playing(self, now=None):
+
+        """The item on at now (items running past midnight count for the early hours too), or None."""
+        return self.index.lookup(self.now_ms(now))[0]
+
+    def upcoming(self, count, now=None):
+
+        """The item on at now (or the next one) and the ones after it, count in all."""
+        return self.index.upcoming(self.now_ms(now), count)
+
+    def get_offset(self, item, elapsedMs):
+
+        """ms into item to start playing it elapsedMs after its scheduled start: that, plus the part of
+        it that was cut off at the front when it was scheduled to start later than its natural start."""
+        scheduleOffset = (item.end_ms - int(item.duration)) - item.start_ms
+        print("INFO: Schedule Offset = " + str(scheduleOffset / 1000))
+        print("INFO: Natural Start Time: " + ScheduleTime.to_string(((item.end_ms - int(item.duration)) // 1000) % ScheduleTime.DAY_SECONDS))
+        return elapsedMs + (abs(scheduleOffset) if scheduleOffset < 0 else 0)
+
+    def play_now(self, now=None):
+
+        """Play the item that should be on at now; returns it (None when nothing is)."""
+        item, elapsedMs = self.index.lookup(self.now_ms(now))
+        if item is None:
+            print("NOTICE: Nothing is scheduled to play right now.")
+            return None
+        print(str("NOTICE: Queueing up {} to play right away.".format(item.title)).encode('UTF-8'))
+        offset = self.get_offset(item, elapsedMs)
+        print("INFO: Offset = " + str(offset))
+        self.controller.play(item, self.schedule, offset)
+        return item
+
+    def play_item(self, item):
+
+        """Timer job: item's start time has come."""
+        with self.lock:
+            if not self.running:
+                return
+            print(str("NOTICE: Readying media: '{}'".format(item.title)).encode('UTF-8'))
+            # the natural start (end - duration) vs the scheduled start, from the pre-parsed offsets
+            scheduleOffset = item.end_ms - int(item.duration) - item.start_ms
+            print("INFO: Schedule Offset = " + str(scheduleOffset / 1000))
+            if scheduleOffset < 0:
+                print("INFO: Updated Offset = " + str(abs(scheduleOffset)))
+                self.controller.play(item, self.schedule, abs(scheduleOffset))
+            else:
+                print("INFO: No offset")
+                self.controller.play(item, self.schedule)
+        stats = self.timer.drift_stats()
+        print("INFO: Playback drift over the last {} items: mean {:.0f} ms, max {} ms".format(stats['count'], stats['mean_ms'], stats['max_ms']))
+
+    def schedule_items(self, skipUntil=None):
+
+        """A timer job for every item in memory; with skipUntil (a 1900-01-01 based datetime) the
+        items starting before it are left out."""
+        for item in self.schedule:
+            if item.start_ms is None:
+                continue
+            if skipUntil is not None and skipUntil > item.start_time:
+                try:
+                    print("NOTICE: Skipping scheduling item due to cached overlap.", item.title)
+                except:
+                    pass
+                continue
+            self.timer.schedule_daily(ScheduleTime.to_string(item.start_ms // 1000), self.play_item, item,
+                label=item.title, tag=self.tag)
+
+    def start(self):
+
+        """Play what is on now, then schedule the items (so the switch doesn't wait on the timer jobs)."""
+        with self.lock:
+            self.running = True
+        item = self.play_now()
+        self.schedule_items()
+        return item
+
+    def stop(self):
+
+        with self.lock:
+            self.running = False
+        self.timer.cancel(self.tag)
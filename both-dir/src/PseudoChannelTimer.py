@@ -0,0 +1,165 @@
+"""Timer scheduler for the -r playback loop
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
+class TimerJob():
+
+    __slots__ = ('deadline', 'seq', 'when', 'job', 'args', 'label', 'tag', 'repeat')
+
+    def __init__(self, deadline, seq, when, job, args, label, tag, repeat):
+
+        self.deadline = deadline
+        self.seq = seq
+        self.when = when
+        self.job = job
+        self.args = args
+        self.label = label
+        self.tag = tag
+        self.repeat = repeat
+
+    def __lt__(self, other):
+
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+class PseudoChannelTimer():
+
+    """Runs jobs at wall-clock times without polling.
+
+    Jobs sit in a heap keyed on their deadline on the monotonic clock (a wall-clock time is turned
+    into a deadline when it is scheduled, so clock adjustments don't move it). run_forever() sleeps
+    on a condition until the earliest deadline - or until a new / cancelled job changes it - and
+    hands due jobs to a single worker thread, so a slow job delays the jobs queued after it but
+    never the timer itself. For every job the drift (when it actually started minus when it was
+    due) is kept, see drift_stats().
+    """
+
+    DRIFT_HISTORY = 1000
+
+    def __init__(self, clock=time.monotonic, wallClock=datetime.datetime.now, executor=None):
+
+        self.clock = clock
+        self.wall_clock = wallClock
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        # (label, scheduled wall-clock time, drift in ms)
+        self.drift = deque(maxlen=self.DRIFT_HISTORY)
+
+    def schedule_at(self, when, job, *args, label=None, tag=None, repeat=None):
+
+        """Run job(*args) at the datetime when; with repeat (a timedelta) run it again every repeat after that."""
+        deadline = self.clock() + (when - self.wall_clock()).total_seconds()
+        entry = TimerJob(deadline, next(self.counter), when, job, args, label, tag, repeat)
+        with self.condition:
+            heapq.heappush(self.heap, entry)
+            self.condition.notify()
+        return entry
+
+    def next_occurrence(self, timeOfDay, weekday=None):
+
+        """The next wall-clock time (from now) at "%H:%M[:%S]", on the given weekday (0 = monday) if set."""
+        parts = [int(part) for part in timeOfDay.split(":")] + [0]
+        now = self.wall_clock()
+        when = now.replace(hour=parts[0], minute=parts[1], second=parts[2], microsecond=0)
+        if weekday is not None:
+            when += datetime.timedelta(days=(weekday - when.weekday()) % 7)
+        if when <= now:
+            when += datetime.timedelta(days=1 if weekday is None else 7)
+        return when
+
+    def schedule_daily(self, timeOfDay, job, *args, label=None, tag=None, repeat=False):
+
+        """Run job(*args) at the next timeOfDay (today if it is still ahead, else tomorrow)."""
+        return self.schedule_at(self.next_occurrence(timeOfDay), job, *args, label=label, tag=tag,
+            repeat=datetime.timedelta(days=1) if repeat else None)
+
+    def schedule_weekly(self, weekday, timeOfDay, job, *args, label=None, tag=None):
+
+        return self.schedule_at(self.next_occurrence(timeOfDay, weekday), job, *args, label=label, tag=tag,
+            repeat=datetime.timedelta(days=7))
+
+    def cancel(self, tag):
+
+        with self.condition:
+            self.heap = [entry for entry in self.heap if entry.tag != tag]
+            heapq.heapify(self.heap)
+            self.condition.notify()
+
+    def pending(self, tag=None):
+
+        with self.condition:
+            return sorted(entry for entry in self.heap if tag is None or entry.tag == tag)
+
+    def pop_due(self):
+
+        due = []
+        with self.condition:
+            now = self.clock()
+            while self.heap and self.heap[0].deadline <= now:
+                due.append(heapq.heappop(self.heap))
+        return due
+
+    def dispatch(self, entry):
+
+        if entry.repeat is not None:
+            when = entry.when + entry.repeat
+            repeated = TimerJob(entry.deadline + entry.repeat.total_seconds(), next(self.counter), when,
+                entry.job, entry.args, entry.label, entry.tag, entry.repeat)
+            with self.condition:
+                heapq.heappush(self.heap, repeated)
+        self.executor.submit(self.run_job, entry)
+
+    def run_job(self, entry):
+
+        drift_ms = int(round((self.clock() - entry.deadline) * 1000))
+        self.drift.append((entry.label, entry.when, drift_ms))
+        if entry.label is not None:
+            print("INFO: Timer drift for '{}': {:+d} ms".format(entry.label, drift_ms))
+        try:
+            entry.job(*entry.args)
+        except Exception as e:
+            print("ERROR: Timer job '{}' failed: {}".format(entry.label, e))
+
+    def run_pending(self):
+
+        """Dispatch everything that is due now; returns how many jobs were dispatched."""
+        due = self.pop_due()
+        for entry in due:
+            self.dispatch(entry)
+        return len(due)
+
+    def run_forever(self):
+
+        self.running = True
+        while self.running:
+            with self.condition:
+                while self.running and (not self.heap or self.heap[0].deadline > self.clock()):
+                    self.condition.wait(max(0.0, self.heap[0].deadline - self.clock()) if self.heap else None)
+            self.run_pending()
+
+    def stop(self):
+
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def drift_stats(self):
+
+        """Count, mean / max absolute and last drift (ms) over the recent jobs."""
+        drifts = [abs(drift) for label, when, drift in self.drift]
+        if not drifts:
+            return {'count' : 0, 'mean_ms' : 0, 'max_ms' : 0, 'last_ms' : 0}
+        return {
+            'count' : len(drifts),
+            'mean_ms' : sum(drifts) / len(drifts),
+            'max_ms' : max(drifts),
+            'last_ms' : self.drift[-1][2],
+        }
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import os, sys
+import json
 import socket
 import logging
 import logging.handlers
@@ -10,13 +11,23 @@ from datetime import timedelta
 from datetime import tzinfo
 import pytz
 import sqlite3
-import _thread,socketserver,http.server
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import perf_counter
+from html import escape
 from plexapi.server import PlexServer
+from requests.exceptions import ConnectionError as ClientConnectionError
 from yattag import Doc
 from yattag import indent
 import pseudo_config as config
+from src.PseudoGuide import GuideTemplate
+from src.PseudoGuideServer import PseudoGuideServer, GuideChannel
 class PseudoDailyScheduleController():
 
+    MEDIA_CACHE_SIZE = 50
+    ARTWORK_CACHE_SIZE = 256
+
     def __init__(self, 
                  server, 
                  token, 
@@ -24,10 +35,15 @@ class PseudoDailyScheduleController():
                  controllerServerPath = '', 
                  controllerServerPort = '8000', 
                  debugMode = False,
-                 htmlPseudoTitle = "Daily PseudoChannel"
+                 htmlPseudoTitle = "Daily PseudoChannel",
+                 artworkLookup = None,
+                 schedulesDir = None,
+                 channelName = None,
+                 plex = None
                  ):
 
-        self.PLEX = PlexServer(server, token)
+        # channels run by one process share its Plex connection
+        self.PLEX = plex if plex is not None else PlexServer(server, token)
         self.BASE_URL = server
         self.TOKEN = token
         self.PLEX_CLIENTS = clients
@@ -35,7 +51,29 @@ class PseudoDailyScheduleController():
         self.CONTROLLER_SERVER_PORT = controllerServerPort if controllerServerPort != '' else '80'
         self.DEBUG = debugMode
         self.webserverStarted = False
+        # the guide is written to / served from here; by default ./schedules of the channel dir
+        if schedulesDir is None:
+            schedulesDir = os.getcwd() if os.path.basename(os.getcwd()) == "schedules" else os.path.join(os.getcwd(), "schedules")
+        self.SCHEDULES_DIR = os.path.abspath(schedulesDir)
+        self.CHANNEL_NAME = channelName if channelName is not None else GuideChannel.name_for(os.path.dirname(self.SCHEDULES_DIR))
+        self.guide_server = None
         self.HTML_PSEUDO_TITLE = htmlPseudoTitle
+        self.PREROLL_ITEMS = int(getattr(config, 'prerollItems', 3))
+        self.preroll_lock = threading.Lock()
+        self.preroll_executor = ThreadPoolExecutor(max_workers=1)
+        self.media_cache = OrderedDict()
+        # (section, title, duration) -> art path; PseudoChannelDatabase.get_art
+        self.artworkLookup = artworkLookup
+        self.artwork_cache = OrderedDict()
+        # (day, schedule) the guide templates were rendered for, and the (html, xml) templates
+        self.guide_key = None
+        self.guide = None
+        self.client_handles = {}
+        self.dispatch_latency = deque(maxlen=100)
+        self.CLIENT_TIMEOUT = float(getattr(config, 'clientTimeout', 5))
+        self.client_executor = ThreadPoolExecutor(max_workers=max(4, len(clients)))
+        # (command, ms between the first and the last client starting it)
+        self.client_skew = deque(maxlen=100)
         try: 
             self.my_logger = logging.getLogger('MyLogger')
             self.my_logger.setLevel(logging.DEBUG)
@@ -46,12 +84,36 @@ class PseudoDailyScheduleController():
 
     '''
     *
-    * Get the full image url (including plex token) from the local db.
+    * Get the full image url (including plex token) of a movie / show / commercial.
+    * Served from an LRU keyed on (section, title, duration), then from the art paths update_db stored
+    * in the local db. Only when neither has it is Plex searched: on the pre-roll worker (this call
+    * returns '' and the next one gets the url) unless search is set.
     * @param seriesTitle: case-unsensitive string of the series title
     * @return string: full path of to the show image
     *
     '''
-    def get_show_photo(self, section, showtitle, durationAmount):
+    def get_show_photo(self, section, showtitle, durationAmount, search=False):
+
+        key = (section, showtitle, durationAmount)
+        with self.preroll_lock:
+            if key in self.artwork_cache:
+                self.artwork_cache.move_to_end(key)
+                return self.artwork_cache[key]
+        art = self.artworkLookup(section, showtitle, durationAmount) if self.artworkLookup is not None else None
+        if art:
+            backgroundImgURL = self.BASE_URL+art+"?X-Plex-Token="+self.TOKEN
+        elif search:
+            backgroundImgURL = self.search_show_photo(section, showtitle, durationAmount)
+        else:
+            self.preroll_executor.submit(self.get_show_photo, section, showtitle, durationAmount, True)
+            return ''
+        with self.preroll_lock:
+            self.artwork_cache[key] = backgroundImgURL
+            while len(self.artwork_cache) > self.ARTWORK_CACHE_SIZE:
+                self.artwork_cache.popitem(last=False)
+        return backgroundImgURL
+
+    def search_show_photo(self, section, showtitle, durationAmount):
 
         backgroundImagePath = None
         backgroundImgURL = ''
@@ -76,37 +138,24 @@ class PseudoDailyScheduleController():
             backgroundImgURL = self.BASE_URL+backgroundImagePath.art+"?X-Plex-Token="+self.TOKEN
         return backgroundImgURL
 
+    '''
+    *
+    * Start (or join, when another channel of this process already did) the built-in guide server
+    * and register this channel's guide with it, plus the guides of the other channel dirs next to it.
+    *
+    '''
     def start_server(self):
 
         if self.webserverStarted == False and self.CONTROLLER_SERVER_PATH != '':
-            """Changing dir to the schedules dir."""
-            web_dir = os.path.abspath(os.path.join(os.path.dirname( __file__ ), '..', 'schedules'))
-            os.chdir(web_dir)
-            PORT = int(self.CONTROLLER_SERVER_PORT)
-            class MyHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
-
-                def log_message(self, format, *args):
-                    return
-
-            global httpd
             try:
-                # create the httpd handler for the simplehttpserver
-                # we set the allow_reuse_address incase something hangs can still bind to port
-                class ReusableTCPServer(SocketServer.TCPServer): allow_reuse_address=True
-                # specify the httpd service on 0.0.0.0 (all interfaces) on port 80
-                httpd = ReusableTCPServer(("0.0.0.0", PORT),MyHandler)
-                # thread this mofo
-                thread.start_new_thread(httpd.serve_forever,())
-            # handle keyboard interrupts
-            except KeyboardInterrupt:
-                core.print_info("Exiting the SET web server...")
-                httpd.socket.close()
-            except socket.error as exc:
-                print("ERROR: Caught exception socket.error : %s" % exc)
-            # handle the rest
+                self.guide_server = PseudoGuideServer.get(int(self.CONTROLLER_SERVER_PORT))
+                self.guide_server.add_channel(self.CHANNEL_NAME, self.SCHEDULES_DIR)
+                self.guide_server.add_sibling_channels(os.path.dirname(os.path.dirname(self.SCHEDULES_DIR)))
+            except OSError as exc:
+                print("ERROR: Could not start the guide server on port {}: {}".format(self.CONTROLLER_SERVER_PORT, exc))
             self.webserverStarted = True
 
-    def get_xml_from_daily_schedule(self, currentTime, bgImageURL, datalist):
+    def get_xml_from_daily_schedule(self, datalist):
 
         now = datetime.now()
         new_day = now + timedelta(days=1)
@@ -116,29 +165,17 @@ class PseudoDailyScheduleController():
 
         ).ttl()
         doc.asis('<?xml version="1.0" encoding="UTF-8"?>')
-        with tag('schedule', currently_playing_bg_image=bgImageURL if bgImageURL != None else ''):
+        with tag('schedule', currently_playing_bg_image=GuideTemplate.field('bg')):
             previous_row = None
             for row in datalist:
-                try:
-                    start_time = datetime.strptime(row[8],'%I:%M:%S %p')
-                except:
-                    start_time = datetime.strptime(row[8],'%H:%M:%S')
+                start_time = row.start_time
                 if start_time > update_time: #checking for after midnight but before reset (from config)
-                    try:
-                        current_start_time = datetime.strptime(row[8],'%I:%M:%S %p').replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d')))
-                    except:
-                        current_start_time = datetime.strptime(row[8],'%H:%M:%S').replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d')))
+                    current_start_time = start_time.replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d')))
                 else:
-                    try:
-                        current_start_time = datetime.strptime(row[8],'%I:%M:%S %p').replace(year=int(new_day.strftime('%Y')),month=int(new_day.strftime('%m')),day=int(new_day.strftime('%d')))
-                    except:
-                        current_start_time = datetime.strptime(row[8],'%H:%M:%S').replace(year=int(new_day.strftime('%Y')),month=int(new_day.strftime('%m')),day=int(new_day.strftime('%d')))
+                    current_start_time = start_time.replace(year=int(new_day.strftime('%Y')),month=int(new_day.strftime('%m')),day=int(new_day.strftime('%d')))
                 current_start_time_unix = (current_start_time - datetime(1970,1,1)).total_seconds()
                 current_start_time_string = current_start_time.strftime('%H:%M:%S')
-                try:
-                    if_end_time = datetime.strptime(row[9],'%Y-%m-%d %H:%M:%S.%f')
-                except ValueError:
-                    if_end_time = datetime.strptime(row[9],'%Y-%m-%d %H:%M:%S')
+                if_end_time = row.end_time
                 if if_end_time.replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d'))) > update_time: #checking for after midnight but before reset (from config)
                     current_end_time = if_end_time.replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d')))
                 else:
@@ -147,10 +184,7 @@ class PseudoDailyScheduleController():
                 current_end_time_string = current_end_time.strftime('%H:%M:%S')
                 if previous_row != None:
                     #compare previous end time to current start time
-                    try:
-                        previous_end_time = datetime.strptime(previous_row[9], '%Y-%m-%d %H:%M:%S.%f')
-                    except ValueError:
-                        previous_end_time = datetime.strptime(previous_row[9], '%Y-%m-%d %H:%M:%S')
+                    previous_end_time = previous_row.end_time
                     if previous_end_time > update_time: #checking for after midnight but before reset (from config)
                         previous_end_time = previous_end_time.replace(year=int(now.strftime('%Y')),month=int(now.strftime('%m')),day=int(now.strftime('%d')))
                     else:
@@ -162,145 +196,57 @@ class PseudoDailyScheduleController():
                     previous_end_time_unix = (previous_end_time - datetime(1970,1,1)).total_seconds()
                     #convert start and end times to the same readable format
                     previous_end_time_string = previous_end_time.strftime('%H:%M:%S')
-                    if str(previous_row[11]) == "Commercials" and self.DEBUG == False:
+                    if str(previous_row.sectionType) == "Commercials" and self.DEBUG == False:
                         continue
-                    try:
-                        timeB = datetime.strptime(previous_row[8], '%I:%M:%S %p')
-                    except:
-                        timeB = datetime.strptime(previous_row[8], '%H:%M:%S')
-                    if currentTime == None:
-                        with tag('time',
-                                ('key', str(previous_row[12])),
-                                ('current', 'false'),
-                                ('type', str(previous_row[11])),
-                                ('show-title', str(previous_row[6])),
-                                ('show-season', str(previous_row[5])),
-                                ('show-episode', str(previous_row[4])),
-                                ('title', str(previous_row[3])),
-                                ('duration', str(previous_row[7])),
-                                ('time-start', str(previous_start_time_string)),
-                                ('time-end', str(previous_end_time.strftime('%H:%M:%S'))),
-                                ('time-start-unix', str(previous_start_time_unix)),
-                                ('time-end-unix', str(previous_end_time_unix)),
-                                ('library', str(previous_row[13])),
-                            ):
-                            text(previous_row[8])
-                    elif currentTime.hour == timeB.hour and currentTime.minute == timeB.minute:
-                        with tag('time',
-                                ('key', str(previous_row[12])),
-                                ('current', 'true'),
-                                ('type', str(previous_row[11])),
-                                ('show-title', str(previous_row[6])),
-                                ('show-season', str(previous_row[5])),
-                                ('show-episode', str(previous_row[4])),
-                                ('title', str(previous_row[3])),
-                                ('duration', str(previous_row[7])),
-                                ('time-start', str(previous_start_time_string)),
-                                ('time-end', str(previous_end_time.strftime('%H:%M:%S'))),
-                                ('time-start-unix', str(previous_start_time_unix)),
-                                ('time-end-unix', str(previous_end_time_unix)),
-                                ('library', str(previous_row[13])),
-                            ):
-                            text(previous_row[8])
-                    else:
-                        with tag('time',
-                                ('key', str(previous_row[12])),
-                                ('current', 'false'),
-                                ('type', str(previous_row[11])),
-                                ('show-title', str(previous_row[6])),
-                                ('show-season', str(previous_row[5])),
-                                ('show-episode', str(previous_row[4])),
-                                ('title', str(previous_row[3])),
-                                ('duration', str(previous_row[7])),
-                                ('time-start', str(previous_start_time_string)),
-                                ('time-end', str(previous_end_time.strftime('%H:%M:%S'))),
-                                ('time-start-unix', str(previous_start_time_unix)),
-                                ('time-end-unix', str(previous_end_time_unix)),
-                                ('library', str(previous_row[13])),
-                            ):
-                            text(previous_row[8])
+                    with tag('time',
+                            ('key', str(previous_row.plexMediaID)),
+                            ('current', GuideTemplate.row(previous_row.id)),
+                            ('type', str(previous_row.sectionType)),
+                            ('show-title', str(previous_row.showTitle)),
+                            ('show-season', str(previous_row.seasonNumber)),
+                            ('show-episode', str(previous_row.episodeNumber)),
+                            ('title', str(previous_row.title)),
+                            ('duration', str(previous_row.duration)),
+                            ('time-start', str(previous_start_time_string)),
+                            ('time-end', str(previous_end_time.strftime('%H:%M:%S'))),
+                            ('time-start-unix', str(previous_start_time_unix)),
+                            ('time-end-unix', str(previous_end_time_unix)),
+                            ('library', str(previous_row.customSectionName)),
+                        ):
+                        text(previous_row.startTime)
                 previous_start_time = current_start_time
                 previous_start_time_unix = current_start_time_unix
                 previous_start_time_string = current_start_time_string
                 previous_row = row
-#            if str(row[11]) == "Commercials" and self.DEBUG == False:
+#            if str(row.sectionType) == "Commercials" and self.DEBUG == False:
 #                continue
-            try:
-                timeB = datetime.strptime(row[8], '%I:%M:%S %p')
-            except:
-                timeB = datetime.strptime(row[8], '%H:%M:%S')
-            if currentTime == None:
-                with tag('time',
-                        ('key', str(row[12])),
-                        ('current', 'false'),
-                        ('type', str(row[11])),
-                        ('show-title', str(row[6])),
-			('show-season', str(row[5])),
-			('show-episode', str(row[4])),
-                        ('title', str(row[3])),
-			('duration', str(row[7])),
-                        ('time-start', str(current_start_time_string)),
-			('time-end', str(current_end_time_string)),
-                        ('time-start-unix', str(current_start_time_unix)),
-                        ('time-end-unix', str(current_end_time_unix)),
-			('library', str(row[13])),
-                    ):
-                    text(row[8])
-            elif currentTime.hour == timeB.hour and currentTime.minute == timeB.minute:
-                with tag('time',
-                        ('key', str(row[12])),
-                        ('current', 'true'),
-                        ('type', str(row[11])),
-	                ('show-title', str(row[6])),
-                        ('show-season', str(row[5])),
-                        ('show-episode', str(row[4])),
-                        ('title', str(row[3])),
-                        ('duration', str(row[7])),
-                        ('time-start', str(current_start_time_string)),
-                        ('time-end', str(current_end_time_string)),
-                        ('time-start-unix', str(current_start_time_unix)),
-                        ('time-end-unix', str(current_end_time_unix)),
-                        ('library', str(row[13])),
-                    ):
-                    text(row[8])
-            else:
-                with tag('time',
-                        ('key', str(row[12])),
-                        ('current', 'false'),
-                        ('type', str(row[11])),
-                        ('show-title', str(row[6])),
-                        ('show-season', str(row[5])),
-                        ('show-episode', str(row[4])),
-                        ('title', str(row[3])),
-                        ('duration', str(row[7])),
-                        ('time-start', str(current_start_time_string)),
-                        ('time-end', str(current_end_time_string)),
-                        ('time-start-unix', str(current_start_time_unix)),
-                        ('time-end-unix', str(current_end_time_unix)),
-                        ('library', str(row[13])),
-                    ):
-                    text(row[8])
+            with tag('time',
+                    ('key', str(row.plexMediaID)),
+                    ('current', GuideTemplate.row(row.id)),
+                    ('type', str(row.sectionType)),
+                    ('show-title', str(row.showTitle)),
+                    ('show-season', str(row.seasonNumber)),
+                    ('show-episode', str(row.episodeNumber)),
+                    ('title', str(row.title)),
+                    ('duration', str(row.duration)),
+                    ('time-start', str(current_start_time_string)),
+                    ('time-end', str(current_end_time_string)),
+                    ('time-start-unix', str(current_start_time_unix)),
+                    ('time-end-unix', str(current_end_time_unix)),
+                    ('library', str(row.customSectionName)),
+                ):
+                text(row.startTime)
         return indent(doc.getvalue())
 
     '''
     *
     * Get the generated html for the .html file that is the schedule. 
-    * ...This is used whenever a show starts or stops in order to add and remove various styles.
-    * @param currentTime: datetime object 
-    * @param bgImageURL: str of the image used for the background
+    * ...Rendered once per schedule; the now playing row / title / background are slots (see write_guide).
     * @return string: the generated html content
     *
     '''
-    def get_html_from_daily_schedule(self, currentTime, bgImageURL, datalist, nowPlayingTitle):
+    def get_html_from_daily_schedule(self, datalist):
 
-        now = datetime.now()
-        #now = now.replace(year=1900, month=1, day=1)
-        midnight = now.replace(hour=23, minute=59, second=59)
-        #mutto233 put this here, because to be honest, isn't the current time always now?
-        if currentTime != None:
-            currentTime=now
-            
-            
         time = datetime.now().strftime("%B %d, %Y")
         doc, tag, text, line = Doc(
 
@@ -316,46 +262,25 @@ class PseudoDailyScheduleController():
         <script>
         $(function(){
 
-            var refreshFlag = '';
             """
-            +"""var controllerServerPath ='"""+self.CONTROLLER_SERVER_PATH+":"+self.CONTROLLER_SERVER_PORT+"""';
-
-            if(controllerServerPath != ''){
-
-                console.log("here");
-
-                window.setInterval(function(){
-
-                $.ajax({
-                        url: controllerServerPath+"/pseudo_refresh.txt",
-                        async: true,   // asynchronous request? (synchronous requests are discouraged...)
-                        cache: false,   // with this, you can force the browser to not make cache of the retrieved data
-                        dataType: "text",  // jQuery will infer this, but you can set explicitly
-                        success: function( data, textStatus, jqXHR ) {
-                            newFlag = data; 
-
-                            if(refreshFlag != ''){
-                            
-                                if (refreshFlag != newFlag){
-
-                                    location.reload();
+            +"""var controllerServerPath ='"""+(self.CONTROLLER_SERVER_PATH+":"+self.CONTROLLER_SERVER_PORT if self.CONTROLLER_SERVER_PATH != '' else '')+"""';
+            var channelName = """+json.dumps(self.CHANNEL_NAME)+""";
 
-                                } else {
+            if(controllerServerPath != '' && window.EventSource){
 
-                                    //do nothing
-                                    console.log("skip");
+                // the guide server sends a "now_playing" event on connect and whenever the item changes
+                var nowPlayingVersion = null;
+                var events = new EventSource(controllerServerPath+"/channels/"+encodeURIComponent(channelName)+"/events");
+                events.addEventListener('now_playing', function(e){
 
-                                }
+                    if(nowPlayingVersion !== null && nowPlayingVersion != e.lastEventId){
 
-                            } else {
+                        location.reload();
 
-                                refreshFlag = newFlag;
+                    }
+                    nowPlayingVersion = e.lastEventId;
 
-                            }
-
-                        }
-                    });
-                }, 1000);
+                });
 
             } else {
 
@@ -366,8 +291,7 @@ class PseudoDailyScheduleController():
         });
         </script>
                             """)
-                if bgImageURL != None:
-                    doc.asis('<style>body{ background:transparent!important; } html { background: url('+bgImageURL+') no-repeat center center fixed; -webkit-background-size: cover;-moz-background-size: cover;-o-background-size: cover;background-size: cover;}.make-white { padding: 24px; background:rgba(255,255,255, 0.9); }</style>')
+                doc.asis(GuideTemplate.field('style'))
             with tag('body'):
                 with tag('div', klass='container mt-3'):
                     with tag('div', klass='row make-white'):
@@ -377,7 +301,7 @@ class PseudoDailyScheduleController():
                             with tag('div'):
                                 line('h3', time, klass='col-12 pl-1')
                                 line('h3', 
-                                     "Now Playing: "+nowPlayingTitle, 
+                                     "Now Playing: "+GuideTemplate.field('title'), 
                                      klass='col-12 pl-1',
                                      style="color:red;")
                         with tag('table', klass='col-12 table table-bordered table-hover'):
@@ -395,70 +319,70 @@ class PseudoDailyScheduleController():
                                         text('Start Time')
                             numberIncrease = 0
                             for row in datalist:
-                                if str(row[11]) == "Commercials" and self.DEBUG == False:
+                                if str(row.sectionType) == "Commercials" and self.DEBUG == False:
                                     continue
                                 numberIncrease += 1
                                 with tag('tbody'):
-                                    #if currentTime != None:
-                                        #currentTime = currentTime.replace(year=1900, month=1, day=1)
-                                    try:
-                                        timeBStart = datetime.strptime(row[8], '%I:%M:%S %p')
-                                    except:
-                                        timeBStart = datetime.strptime(row[8], '%H:%M:%S')
-                                    #timeBStart = timeBStart.replace(year=1900, month=1, day=1)
-                                    try:
-                                        timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S.%f')
-                                        #timeBEnd = timeBEnd.replace(day=1)
-                                    except:
-                                        timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S')
-                                        #timeBEnd = timeBEnd.replace(day=1)
-                                    if currentTime == None:
-                                        with tag('tr'):
-                                            with tag('th', scope='row'):
-                                                text(numberIncrease)
-                                            with tag('td'):
-                                                text(row[11])
-                                            with tag('td'):
-                                                text(row[6])
-                                            with tag('td'):
-                                                text(row[3])
-                                            with tag('td'):
-                                                text(row[8])
-                                    elif ((currentTime - timeBStart).total_seconds() >= 0 and \
-                                         (timeBEnd - currentTime).total_seconds() >= 0) or \
-                                         ((timeBStart - timeBEnd).total_seconds() >= 0 and \
-                                         (((currentTime-midnight.replace(hour=0,minute=0,second=0)).total_seconds() >= 0 and \
-                                          (timeBEnd-currentTime).total_seconds() >= 0) or
-                                         ((currentTime-timeBStart).total_seconds() >= 0 and \
-                                          (midnight-currentTime).total_seconds() >= 0))):          
-                                        
-                                            print("INFO: Currently Playing:", row[3])
-
-                                            with tag('tr', klass='bg-info'):
-                                                with tag('th', scope='row'):
-                                                    text(numberIncrease)
-                                                with tag('td'):
-                                                    text(row[11])
-                                                with tag('td'):
-                                                    text(row[6])
-                                                with tag('td'):
-                                                    text(row[3])
-                                                with tag('td'):
-                                                    text(row[8])
-                                    else:
-                                        with tag('tr'):
-                                            with tag('th', scope='row'):
-                                                text(numberIncrease)
-                                            with tag('td'):
-                                                text(row[11])
-                                            with tag('td'):
-                                                text(row[6])
-                                            with tag('td'):
-                                                text(row[3])
-                                            with tag('td'):
-                                                text(row[8])
+                                    with tag('tr', klass=GuideTemplate.row(row.id)):
+                                        with tag('th', scope='row'):
+                                            text(numberIncrease)
+                                        with tag('td'):
+                                            text(row.sectionType)
+                                        with tag('td'):
+                                            text(row.showTitle)
+                                        with tag('td'):
+                                            text(row.title)
+                                        with tag('td'):
+                                            text(row.startTime)
         return indent(doc.getvalue())
 
+    BG_IMAGE_STYLE = ('<style>body{ background:transparent!important; } html { background: url(%s) no-repeat center center fixed; -webkit-background-size: cover;-moz-background-size: cover;-o-background-size: cover;background-size: cover;}.make-white { padding: 24px; background:rgba(255,255,255, 0.9); }</style>')
+
+    '''
+    *
+    * Write the guide (index.html / pseudo_schedule.xml) and now_playing.json, then flip the refresh flag.
+    * The guide templates are rendered once per daily schedule (and day); per item only the now
+    * playing row, title and background are filled in.
+    * @param row: the daily schedule row playing now, None when nothing is
+    * @return null
+    *
+    '''
+    def write_guide(self, datalist, row=None, bgImageURL=None, nowPlayingTitle=''):
+
+        now = datetime.now()
+        htmlTemplate, xmlTemplate = self.get_guide(datalist, now)
+        currentID = row.id if row is not None else None
+        if row is not None and (str(row.sectionType) != "Commercials" or self.DEBUG):
+            print("INFO: Currently Playing:", row.title)
+        self.write_schedule_to_file(htmlTemplate.render(
+            currentID,
+            style='' if bgImageURL is None else self.BG_IMAGE_STYLE % escape(bgImageURL),
+            title=escape(nowPlayingTitle if nowPlayingTitle is not None else '', quote=False)
+        ))
+        self.write_xml_to_file(xmlTemplate.render(currentID, bg=escape(bgImageURL if bgImageURL is not None else '')))
+        self.write_now_playing_to_file(row, bgImageURL, now)
+        if self.guide_server is None:
+            self.write_refresh_bool_to_file()
+
+    def get_guide(self, datalist, now=None):
+
+        """The (html, xml) guide templates of datalist, rendered when the schedule or the day changed."""
+        now = now if now is not None else datetime.now()
+        key = (now.date(), tuple(datalist))
+        if self.guide is None or self.guide_key != key:
+            self.guide = (
+                GuideTemplate(self.get_html_from_daily_schedule(datalist), 'bg-info', ''),
+                GuideTemplate(self.get_xml_from_daily_schedule(datalist), 'true', 'false'),
+            )
+            self.guide_key = key
+        return self.guide
+
+    def get_schedules_path(self):
+
+        if not os.path.exists(self.SCHEDULES_DIR):
+            os.makedirs(self.SCHEDULES_DIR)
+        return self.SCHEDULES_DIR + os.sep
+
     '''
     *
     * Create 'schedules' dir & write the generated html to .html file.
@@ -468,16 +392,7 @@ class PseudoDailyScheduleController():
     '''
     def write_schedule_to_file(self, data):
 
-        now = datetime.now()
-        fileName = "index.html"
-        writepath = './' if os.path.basename(os.getcwd()) == "schedules" else "./schedules/"
-        if not os.path.exists(writepath):
-            os.makedirs(writepath)
-        if os.path.exists(writepath+fileName):
-            os.remove(writepath+fileName)
-        mode = 'a' if os.path.exists(writepath) else 'w'
-        with open(writepath+fileName, mode) as f:
-            f.write(data)
+        GuideTemplate.write_atomic(self.get_schedules_path()+"index.html", data)
         self.start_server()
 
     '''
@@ -489,47 +404,57 @@ class PseudoDailyScheduleController():
     '''
     def write_xml_to_file(self, data):
 
-        now = datetime.now()
-        fileName = "pseudo_schedule.xml"
-        writepath = './' if os.path.basename(os.getcwd()) == "schedules" else "./schedules/"
-        if not os.path.exists(writepath):
-            os.makedirs(writepath)
-        if os.path.exists(writepath+fileName):
-            os.remove(writepath+fileName)
-        mode = 'a' if os.path.exists(writepath) else 'w'
-        with open(writepath+fileName, mode) as f:
-            f.write(data)
+        GuideTemplate.write_atomic(self.get_schedules_path()+"pseudo_schedule.xml", data)
+
+    '''
+    *
+    * Write the item playing now to now_playing.json (an empty "item" when nothing is), for pages
+    * and scripts that only need the current item and not the whole guide, and push it to the pages
+    * following the channel on the guide server.
+    *
+    '''
+    def write_now_playing_to_file(self, row, bgImageURL, now):
+
+        item = {}
+        if row is not None:
+            item = {
+                'id' : row.id,
+                'type' : row.sectionType,
+                'title' : row.title,
+                'showTitle' : row.showTitle,
+                'season' : row.seasonNumber,
+                'episode' : row.episodeNumber,
+                'displayTitle' : row.display_title,
+                'duration' : row.duration,
+                'startTime' : row.startTime,
+                'endTime' : row.endTime,
+                'library' : row.customSectionName,
+                'key' : row.plexMediaID,
+                'background' : bgImageURL if bgImageURL is not None else '',
+            }
+        data = {'updated' : now.strftime('%Y-%m-%d %H:%M:%S'), 'item' : item}
+        GuideTemplate.write_atomic(self.get_schedules_path()+"now_playing.json", json.dumps(data))
+        if self.guide_server is not None:
+            self.guide_server.publish(self.CHANNEL_NAME, data)
 
     '''
     *
-    * Write 0 or 1 to file for the ajax in the schedule.html to know when to refresh
+    * Write 0 or 1 to file for pages served by another webserver to know when to refresh
+    * (the built-in guide server pushes the change instead)
     * @param data: xml string
     * @return null
     *
     '''
     def write_refresh_bool_to_file(self):
 
-        fileName = "pseudo_refresh.txt"
-        writepath = './' if os.path.basename(os.getcwd()) == "schedules" else "./schedules/"
+        fileName = self.get_schedules_path()+"pseudo_refresh.txt"
         first_line = ''
-        if not os.path.exists(writepath):
-            os.makedirs(writepath)
-        if not os.path.exists(writepath+fileName):
-            open(writepath+fileName, 'w').close()
-        mode = 'r+'
-        with open(writepath+fileName, mode) as f:
-            f.seek(0)
-            first_line = f.read()  
-            if self.DEBUG:
-                print("INFO: Html refresh flag: {}".format(first_line))
-            if first_line == '' or first_line == "0":
-                f.seek(0)
-                f.truncate()
-                f.write("1")
-            else:
-                f.seek(0)
-                f.truncate()
-                f.write("0")
+        if os.path.exists(fileName):
+            with open(fileName, 'r') as f:
+                first_line = f.read()
+        if self.DEBUG:
+            print("INFO: Html refresh flag: {}".format(first_line))
+        GuideTemplate.write_atomic(fileName, "1" if first_line == '' or first_line == "0" else "0")
 
     '''
     *
@@ -540,6 +465,195 @@ class PseudoDailyScheduleController():
     * @return null
     *
     '''
+    '''
+    *
+    * Find the Plex item for a daily_schedule entry: by its media id, falling back to a search.
+    * @return plexapi item or None
+    *
+    '''
+    def resolve_media(self, mediaType, mediaParentTitle, mediaTitle, customSectionName, durationAmount, mediaID):
+
+        if customSectionName == "Playlists":
+            try:
+                print("NOTICE: Fetching PLAYLIST ITEM from MEDIA ID")
+                return self.PLEX.fetchItem(mediaID)
+            except:
+                print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
+                mediaItems = self.PLEX.playlist(mediaParentTitle).items()
+                print("NOTICE: Checking Key for a Match: ")
+                for item in mediaItems:
+                    if item.key == mediaID:
+                        print("NOTICE: MATCH ID FOUND IN %s" % item)
+                        return item
+        elif mediaType == "TV Shows":
+            try:
+                print("NOTICE: Fetching TV Show from MEDIA ID")
+                return self.PLEX.fetchItem(mediaID)
+            except:
+                print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
+                mediaItems = self.PLEX.library.section(customSectionName).get(mediaParentTitle).episodes()
+                for item in mediaItems:
+                    if item.title == mediaTitle and item.duration == durationAmount:
+                        print("NOTICE: MATCH FOUND in %s" % item)
+                        return item
+                    elif item.key == mediaID:
+                        print("NOTICE: MATCHID FOUND IN %s" % item)
+                        return item
+        elif mediaType == "Movies":
+            idNum = mediaID.lstrip('/library/metadata/')
+            print("INFO: Plex ID Number: "+idNum)
+            try:
+                print("NOTICE: Fetching MOVIE from MEDIA ID")
+                return self.PLEX.fetchItem(mediaID)
+            except:
+                print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
+                movies = self.PLEX.library.section(customSectionName).search(title=mediaTitle) #movie selection
+                print("NOTICE: Checking ID for a Match: ")
+                for item in movies:
+                    if item.key == mediaID:
+                        print("NOTICE: ID MATCH FOUND IN %s" % item.title.upper())
+                        return item
+        elif mediaType == "Commercials":
+            # This one is a bit more complicated, since we have the dirty gap fix possible
+            # Basically, we are going to just assume it isn't a dirty gap fix, and if it is,
+            # We will just play the first value
+            COMMERCIAL_PADDING = config.commercialPadding
+            try:
+                print("NOTICE: Fetching COMMERCIAL from MEDIA ID")
+                return self.PLEX.fetchItem(mediaID)
+            except:
+                print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
+                movies = self.PLEX.library.section(customSectionName).search(title=mediaTitle)
+                print("NOTICE: Checking for a Match: ")
+                for item in movies:
+                    if item.key == mediaID:
+                        print("NOTICE: ID MATCH FOUND in %s" % item)
+                        return item
+                    elif (item.duration+1000*COMMERCIAL_PADDING) == durationAmount or item.duration == durationAmount:
+                        print("NOTICE: DURATION MATCH FOUND in %s" % item)
+                        return item
+            print("ERROR: Commercial is NOT FOUND, my guess is this is the dirty gap.  Picking first one")
+            return self.PLEX.library.section(customSectionName).search(title=mediaTitle)[0]
+        else:
+            print("NOTICE: Not sure how to play {}".format(customSectionName))
+        return None
+
+    '''
+    *
+    * Pre-roll: the Plex items of the next few entries and the client handles are looked up ahead
+    * of time and kept here, so at an item boundary playing it is just the playMedia calls.
+    *
+    '''
+    def get_media_item(self, mediaType, mediaParentTitle, mediaTitle, customSectionName, durationAmount, mediaID):
+
+        """(item, True) when the item was pre-rolled, else (freshly resolved item or None, False)."""
+        with self.preroll_lock:
+            item = self.media_cache.get(mediaID)
+            if item is not None:
+                self.media_cache.move_to_end(mediaID)
+                return item, True
+        item = self.resolve_media(mediaType, mediaParentTitle, mediaTitle, customSectionName, durationAmount, mediaID)
+        if item is not None:
+            with self.preroll_lock:
+                self.media_cache[mediaID] = item
+                while len(self.media_cache) > self.MEDIA_CACHE_SIZE:
+                    self.media_cache.popitem(last=False)
+        return item, False
+
+    def get_client(self, name):
+
+        with self.preroll_lock:
+            clientItem = self.client_handles.get(name)
+        if clientItem is None:
+            clientItem = self.PLEX.client(name)
+            with self.preroll_lock:
+                self.client_handles[name] = clientItem
+        return clientItem
+
+    '''
+    *
+    * Send the same command to every client at once instead of one after the other, so with several
+    * TVs on a channel they all start together. Waits at most CLIENT_TIMEOUT seconds for the clients.
+    * @return dict: client -> ms after the fan-out started that it finished, for the clients that did
+    *
+    '''
+    def fan_out(self, action, label):
+
+        started = perf_counter()
+
+        def run(client):
+            with self.preroll_lock:
+                cached = client in self.client_handles
+            try:
+                action(self.get_client(client))
+            except ClientConnectionError as e:
+                # a cached handle may be stale (client restarted / changed address): look it up again.
+                # Only when no connection could be made - a timeout or error reply may have reached the
+                # client already and the command must not be sent twice
+                if not cached:
+                    raise
+                print("NOTICE: Client '{}' did not respond, looking it up again: {}".format(client, e))
+                with self.preroll_lock:
+                    self.client_handles.pop(client, None)
+                action(self.get_client(client))
+            return perf_counter()
+
+        futures = dict((self.client_executor.submit(run, client), client) for client in self.PLEX_CLIENTS)
+        done, not_done = wait(futures, timeout=self.CLIENT_TIMEOUT)
+        finished = {}
+        for future in done:
+            try:
+                finished[futures[future]] = int((future.result() - started) * 1000)
+            except Exception as e:
+                print("ERROR: {} failed on client '{}': {}".format(label, futures[future], e))
+        for future in not_done:
+            print("ERROR: {} timed out on client '{}' after {} seconds".format(label, futures[future], self.CLIENT_TIMEOUT))
+        if len(finished) > 1:
+            first = min(finished.values())
+            skew = max(finished.values()) - first
+            self.client_skew.append((label, skew))
+            print("INFO: {} started on {} of {} clients, skew {} ms ({})".format(
+                label,
+                len(finished),
+                len(futures),
+                skew,
+                ", ".join("%s +%d ms" % (client, ms - first) for client, ms in sorted(finished.items(), key=lambda pair: pair[1]))
+            ))
+        return finished
+
+    def play_on_clients(self, item, offset):
+
+        return self.fan_out(lambda clientItem: clientItem.playMedia(item, offset=offset), "playMedia")
+
+    def preroll(self, rows):
+
+        for client in self.PLEX_CLIENTS:
+            try:
+                self.get_client(client)
+            except Exception as e:
+                print("ERROR: Pre-roll could not find client '{}': {}".format(client, e))
+        for row in rows:
+            try:
+                self.get_media_item(row.sectionType, row.showTitle, row.title, row.customSectionName, row.duration, row.plexMediaID)
+            except Exception as e:
+                print("ERROR: Pre-roll of '{}' failed: {}".format(row.title, e))
+            self.get_show_photo(row.customSectionName, row.photo_title, row.duration, search=True)
+
+    def upcoming_rows(self, row, datalist, count):
+
+        """The count entries after row in the daily schedule (wrapping around past the last one)."""
+        ids = [entry.id for entry in datalist]
+        if row.id not in ids or count <= 0:
+            return []
+        position = ids.index(row.id)
+        return [datalist[(position + i) % len(datalist)] for i in range(1, min(count, len(datalist) - 1) + 1)]
+
+    def schedule_preroll(self, row, datalist):
+
+        rows = self.upcoming_rows(row, datalist, self.PREROLL_ITEMS)
+        if rows:
+            self.preroll_executor.submit(self.preroll, rows)
+
     def play_media(self, mediaType, mediaParentTitle, mediaTitle, offset, customSectionName, durationAmount, mediaID):
          # Check for necessary client override, if we have a folder of "channels_<NAME>"
         cwd = os.getcwd()
@@ -549,107 +663,26 @@ class PseudoDailyScheduleController():
             self.PLEX_CLIENTS = [head]
             print("NOTICE: CLIENT OVERRIDE: %s" % self.PLEX_CLIENTS)
         try:
-            if customSectionName == "Playlists":
-                try:
-                    print("NOTICE: Fetching PLAYLIST ITEM from MEDIA ID")
-                    item = self.PLEX.fetchItem(mediaID)
-                    for client in self.PLEX_CLIENTS:
-                        clientItem = self.PLEX.client(client)
-                        clientItem.playMedia(item, offset=offset)
-                except:
-                    print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
-                    mediaItems = self.PLEX.playlist(mediaParentTitle).items()
-                    print("NOTICE: Checking Key for a Match: ")
-                    for item in mediaItems:
-                        if item.key == mediaID:
-                            print("NOTICE: MATCH ID FOUND IN %s" % item)
-                            for client in self.PLEX_CLIENTS:
-                                clientItem = self.PLEX.client(client)
-                                clientItem.playMedia(item, offset=offset)
-                            break
-            elif mediaType == "TV Shows" and customSectionName != "Playlists":
-#                print "Here, Trying to play custom type: ", customSectionName
-                try:
-                    print("NOTICE: Fetching TV Show from MEDIA ID")
-                    item = self.PLEX.fetchItem(mediaID)
-                    for client in self.PLEX_CLIENTS:
-                        clientItem = self.PLEX.client(client)
-                        clientItem.playMedia(item, offset=offset)
-                except:
-                    print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
-                    mediaItems = self.PLEX.library.section(customSectionName).get(mediaParentTitle).episodes()
-                    for item in mediaItems:
-#                        print item.duration
-                        if item.title == mediaTitle and item.duration == durationAmount:
-                            print("NOTICE: MATCH FOUND in %s" % item)
-                            for client in self.PLEX_CLIENTS:
-                                clientItem = self.PLEX.client(client)
-                                clientItem.playMedia(item, offset=offset)
-                            break
-                        elif item.key == mediaID:
-                            print("NOTICE: MATCHID FOUND IN %s" % item)
-                            for client in self.PLEX_CLIENTS:
-                                clientItem = self.PLEX.client(client)
-                                clientItem.playMedia(item, offset=offset)
-                            break
-            elif mediaType == "Movies":
-                idNum = mediaID.lstrip('/library/metadata/')
-                print("INFO: Plex ID Number: "+idNum)
-                try:
-                    print("NOTICE: Fetching MOVIE from MEDIA ID")
-                    movie = self.PLEX.fetchItem(mediaID)
-#                    movies = self.PLEX.library.section(customSectionName).get(mediaTitle)
-                except:
-                    print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
-                    movies = self.PLEX.library.section(customSectionName).search(title=mediaTitle) #movie selection
-                    print("NOTICE: Checking ID for a Match: ")
-                    for item in movies:
-                        if item.key == mediaID:
-                            print("NOTICE: ID MATCH FOUND IN %s" % item.title.upper())
-                            movie = item
-                            break
-                for client in self.PLEX_CLIENTS:
-                        clientItem = self.PLEX.client(client)
-                        print("INFO: Playing "+movie.title.upper())
-                        clientItem.playMedia(movie, offset=offset)
-            elif mediaType == "Commercials":
-                # This one is a bit more complicated, since we have the dirty gap fix possible
-                # Basically, we are going to just assume it isn't a dirty gap fix, and if it is,
-                # We will just play the first value
-                COMMERCIAL_PADDING = config.commercialPadding
-                try:
-                    print("NOTICE: Fetching COMMERCIAL from MEDIA ID")
-                    movie = self.PLEX.fetchItem(mediaID)
-#                    movies = self.PLEX.library.section(customSectionName).get(mediaTitle)
-                except:
-                    print("ERROR: MEDIA ID FETCH FAILED - Falling Back")
-                    movies = self.PLEX.library.section(customSectionName).search(title=mediaTitle)
-                    print("NOTICE: Checking for a Match: ")
-                    for item in movies:
-                        if item.key == mediaID:
-                            print("NOTICE: ID MATCH FOUND in %s" % item)
-                            movie = item
-                            break
-                        elif (item.duration+1000*COMMERCIAL_PADDING) == durationAmount or item.duration == durationAmount:
-                            print("NOTICE: DURATION MATCH FOUND in %s" % item)
-                            movie = item
-                            break
-                try:
-                    movie
-                except:
-                    print("ERROR: Commercial is NOT FOUND, my guess is this is the dirty gap.  Picking first one")
-                    movies = self.PLEX.library.section(customSectionName).search(title=mediaTitle)
-                    movie = movies[0]
-                    
-                for client in self.PLEX_CLIENTS:
-                        clientItem = self.PLEX.client(client)
-                        clientItem.playMedia(movie, offset=offset)
-            else:
-                print("NOTICE: Not sure how to play {}".format(customSectionName))
+            started = perf_counter()
+            item, prerolled = self.get_media_item(mediaType, mediaParentTitle, mediaTitle, customSectionName, durationAmount, mediaID)
+            if item is None:
+                print("ERROR: Could not find '{}' on the Plex server.".format(mediaTitle))
+                return
+            resolved = perf_counter()
+            if mediaType == "Movies":
+                print("INFO: Playing "+item.title.upper())
+            self.play_on_clients(item, offset)
+            latency = int((perf_counter() - started) * 1000)
+            self.dispatch_latency.append((mediaTitle, latency))
+            print("INFO: Dispatch latency for '{}': {} ms ({})".format(
+                mediaTitle,
+                latency,
+                "pre-rolled" if prerolled else "looked up in %d ms" % int((resolved - started) * 1000)
+            ))
             print("NOTICE: Done.")
         except Exception as e:
             print(e.__doc__)
-            print(e.message)
+            print(e)
             print("ERROR: There was an error trying to play the media.")
             pass
         
@@ -657,10 +690,8 @@ class PseudoDailyScheduleController():
 
         try:
             self.my_logger.debug('Trying to stop media.')
-            for client in self.PLEX_CLIENTS:
-                clientItem = self.PLEX.client(client)
-                clientItem.stop(mtype='video')
-                self.my_logger.debug('Done.')
+            self.fan_out(lambda clientItem: clientItem.stop(mtype='video'), "stop")
+            self.my_logger.debug('Done.')
         except Exception as e:
             self.my_logger.debug('stop_media - except.', e)
             pass
@@ -679,60 +710,31 @@ class PseudoDailyScheduleController():
         datalist = list(c.fetchall())
         """
         for row in datalist:
-            try:
-                endTime = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S.%f')
-            except ValueError:
-                endTime = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S')
+            endTime = row.end_time
             if currentTime.hour == endTime.hour:
                 if currentTime.minute == endTime.minute:
                     if currentTime.second == endTime.second:
                         if self.DEBUG:
                             print("INFO: Ok end time found")
-                        self.write_schedule_to_file(self.get_html_from_daily_schedule(None, None, datalist))
-                        self.write_xml_to_file(self.get_xml_from_daily_schedule(None, None, datalist))
-                        self.write_refresh_bool_to_file()
+                        self.write_guide(datalist)
                         break
 
     def play(self, row, datalist, offset=0):
 
-        print(str("NOTICE: Starting Media: '{}'".format(row[3])).encode('UTF-8'))
+        print(str("NOTICE: Starting Media: '{}'".format(row.title)).encode('UTF-8'))
         print(str("NOTICE: Media Offset: '{}' seconds.".format(int(offset / 1000))).encode('UTF-8'))
         if self.DEBUG:
             print(str(row).encode('UTF-8'))
+        print("INFO: Library:", row.customSectionName)
+
+        self.play_media(row.sectionType, row.showTitle, row.title, offset, row.customSectionName, row.duration, row.plexMediaID)
+        """Look up the next items while this one plays"""
+        self.schedule_preroll(row, datalist)
+        """Mark the item in the guide (HTML / XML / now_playing.json)"""
+        bgImageURL = self.get_show_photo(row.customSectionName, row.photo_title, row.duration)
+        self.write_guide(datalist, row, bgImageURL, row.display_title)
         try:
-            timeB = datetime.strptime(row[8], '%I:%M:%S %p')
-        except:
-            timeB = datetime.strptime(row[8], '%H:%M:%S')
-
-        print("INFO: Here, row[13]", row[13])
-
-        self.play_media(row[11], row[6], row[3], offset, row[13], row[7], row[12])
-        self.write_schedule_to_file(
-            self.get_html_from_daily_schedule(
-                timeB,
-                self.get_show_photo(
-                    row[13], 
-                    row[6] if row[11] == "TV Shows" else row[3], row[7]
-                ),
-                datalist,
-                row[6] + " - " + row[3] if row[11] == "TV Shows" else row[3]
-            )
-        )
-        self.write_refresh_bool_to_file()
-        """Generate / write XML to file
-        """
-        self.write_xml_to_file(
-            self.get_xml_from_daily_schedule(
-                timeB,
-                self.get_show_photo(
-                    row[13], 
-                    row[6] if row[11] == "TV Shows" else row[3], row[7]
-                ),
-                datalist
-            )
-        )
-        try:
-            self.my_logger.debug('INFO: Trying to play: ' + row[3])
+            self.my_logger.debug('INFO: Trying to play: ' + row.title)
         except:
             pass
 
@@ -754,42 +756,17 @@ class PseudoDailyScheduleController():
         except:
             pass
         for row in datalist:
-            try:
-                timeB = datetime.strptime(row[8], '%I:%M:%S %p')
-            except:
-                timeB = datetime.strptime(row[8], '%H:%M:%S')
+            timeB = row.start_time
             if currentTime.hour == timeB.hour:
                 if currentTime.minute == timeB.minute:
                     if currentTime.second == timeB.second:
-                        print("NOTICE: Starting Media: " + row[3])
+                        print("NOTICE: Starting Media: " + row.title)
                         print(row)
-                        self.play_media(row[11], row[6], row[3], row[13], row[7], row[12])
-                        self.write_schedule_to_file(
-                            self.get_html_from_daily_schedule(
-                                timeB,
-                                self.get_show_photo(
-                                    row[13], 
-                                    row[6] if row[11] == "TV Shows" else row[3], row[7]
-                                ),
-                                datalist,
-                                row[6] + " - " + row[3] if row[11] == "TV Shows" else row[3]
-                            )
-                        )
-                        self.write_refresh_bool_to_file()
-                        """Generate / write XML to file
-                        """
-                        self.write_xml_to_file(
-                            self.get_xml_from_daily_schedule(
-                                timeB,
-                                self.get_show_photo(
-                                    row[13], 
-                                    row[6] if row[11] == "TV Shows" else row[3], row[7]
-                                ),
-                                datalist
-                            )
-                        )
+                        self.play_media(row.sectionType, row.showTitle, row.title, row.customSectionName, row.duration, row.plexMediaID)
+                        bgImageURL = self.get_show_photo(row.customSectionName, row.photo_title, row.duration)
+                        self.write_guide(datalist, row, bgImageURL, row.display_title)
                         try:
-                            self.my_logger.debug('Trying to play: ' + row[3])
+                            self.my_logger.debug('Trying to play: ' + row.title)
                         except:
                             pass
                         break
@@ -804,21 +781,13 @@ class PseudoDailyScheduleController():
         increase_var = 0
 
         for row in datalist:
-            #print row[8]
-            #print row[9]
-            if str(row[11]) == "Commercials" and self.DEBUG == False:
+            #print row.startTime
+            #print row.endTime
+            if str(row.sectionType) == "Commercials" and self.DEBUG == False:
                 continue
-            try:
-                timeBStart = datetime.strptime(row[8], '%I:%M:%S %p')
-            except:
-                timeBStart = datetime.strptime(row[8], '%H:%M:%S')
+            timeBStart = row.start_time
             #timeBStart = timeBStart.replace(year=1900, month=1, day=1)
-            try:
-                timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S.%f')
-                #timeBEnd = timeBEnd.replace(day=1)
-            except:
-                timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S')
-                #timeBEnd = timeBEnd.replace(day=1)
+            timeBEnd = row.end_time
             if ((currentTime - timeBStart).total_seconds() >= 0 and \
                  (timeBEnd - currentTime).total_seconds() >= 0) or \
                  ((timeBStart - timeBEnd).total_seconds() >= 0 and \
@@ -827,11 +796,11 @@ class PseudoDailyScheduleController():
                  ((currentTime-timeBStart).total_seconds() >= 0 and \
                   (midnight-currentTime).total_seconds() >= 0))): 
 
-                print("INFO: Made the conditional & found item: {}".format(row[6]))
+                print("INFO: Made the conditional & found item: {}".format(row.showTitle))
 
                 return self.get_show_photo(
-                    row[13], 
-                    row[6] if row[11] == "TV Shows" else row[3], row[7]
+                    row.customSectionName, 
+                    row.photo_title, row.duration
                 )
             
             else:
@@ -852,19 +821,11 @@ class PseudoDailyScheduleController():
         increase_var = 0
 
         for row in datalist:
-            """if str(row[11]) == "Commercials" and self.DEBUG == False:
+            """if str(row.sectionType) == "Commercials" and self.DEBUG == False:
                 continue"""
-            try:
-                timeBStart = datetime.strptime(row[8], '%I:%M:%S %p')
-            except:
-                timeBStart = datetime.strptime(row[8], '%H:%M:%S')
+            timeBStart = row.start_time
             #timeBStart = timeBStart.replace(year=1900, month=1, day=1)
-            try:
-                timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S.%f')
-                timeBEnd = timeBEnd.replace(day=1)
-            except:
-                timeBEnd = datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S')
-                timeBEnd = timeBEnd.replace(day=1)
+            timeBEnd = row.end_time.replace(day=1)
             if ((currentTime - timeBStart).total_seconds() >= 0 and \
                  (timeBEnd - currentTime).total_seconds() >= 0) or \
                  ((timeBStart - timeBEnd).total_seconds() >= 0 and \
@@ -873,9 +834,9 @@ class PseudoDailyScheduleController():
                  ((currentTime-timeBStart).total_seconds() >= 0 and \
                   (midnight-currentTime).total_seconds() >= 0))):          
 
-                print("NOTICE: Made the conditional & found item: {}".format(row[6]))
+                print("NOTICE: Made the conditional & found item: {}".format(row.showTitle))
 
-                return row[6] + " - " + row[3] if row[11] == "TV Shows" else row[3]
+                return row.display_title
 
             else:
 
@@ -900,6 +861,4 @@ class PseudoDailyScheduleController():
 
         print("NOTICE: The path to the bgImage: {}".format(bgImage))
 
-        self.write_refresh_bool_to_file()
-        self.write_schedule_to_file(self.get_html_from_daily_schedule(now, bgImage, datalist, itemTitle))
-        self.write_xml_to_file(self.get_xml_from_daily_schedule(None, None, datalist))
+        self.write_guide(datalist, None, bgImage, itemTitle)
@@ -0,0 +1,71 @@
+"""Pre-rendered guide (index.html / pseudo_schedule.xml) with slots for the now playing item
+"""
+import os
+import re
+import tempfile
+
+class GuideTemplate():
+
+    """A guide rendered once per daily schedule with slots left in it: field(name) for values that
+    change per item (title, background) and row(id) on every schedule entry, filled with current
+    for the playing entry and other for the rest. render() only joins the pre-split parts, so
+    marking a new item costs a string join instead of rebuilding the whole document.
+    """
+
+    SLOT = re.compile(r'@@pc:(\w+)(?::(-?\d+))?@@')
+
+    def __init__(self, text, current, other):
+
+        self.current = current
+        self.other = other
+        # literal strings, with (name, row id) tuples for the slots between them
+        self.parts = []
+        position = 0
+        for match in self.SLOT.finditer(text):
+            self.parts.append(text[position:match.start()])
+            self.parts.append((match.group(1), match.group(2)))
+            position = match.end()
+        self.parts.append(text[position:])
+
+    @staticmethod
+    def field(name):
+
+        return '@@pc:' + name + '@@'
+
+    @staticmethod
+    def row(rowID):
+
+        return '@@pc:row:' + str(rowID) + '@@'
+
+    def render(self, currentID=None, **fields):
+
+        """The guide with currentID's entry marked and the fields filled in (values go in as is, escape them first)."""
+        currentKey = None if currentID is None else str(currentID)
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] == 'row':
+                out.append(self.current if part[1] == currentKey else self.other)
+            else:
+                out.append(fields.get(part[0], ''))
+        return ''.join(out)
+
+    @staticmethod
+    def write_atomic(path, data):
+
+        """Write data to a temp file next to path and rename it over path, so readers (the web
+        server, the browser refresh) never see a missing or half written file."""
+        directory = os.path.dirname(path) or '.'
+        fd, tmpPath = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.chmod(tmpPath, 0o644)
+            os.replace(tmpPath, path)
+        except BaseException:
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
+            raise
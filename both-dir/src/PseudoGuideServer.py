@@ -0,0 +1,245 @@
+"""Built-in guide / now playing HTTP server
+"""
+from collections import OrderedDict
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+from urllib.parse import unquote, urlsplit
+
+class GuideChannel():
+
+    """One channel's guide: its schedules dir and the item playing now. A channel run by another
+    process (live False) is followed through the now_playing.json that process writes."""
+
+    CHANNEL_DIR_PREFIX = 'pseudo-channel_'
+
+    def __init__(self, name, directory, live):
+
+        self.name = name
+        self.directory = directory
+        self.live = live
+        self.version = 0
+        self.now_playing = {}
+        self.mtime = None
+
+    @classmethod
+    def name_for(cls, channelDir):
+
+        """"pseudo-channel_01" -> "01", any other dir keeps its name."""
+        name = os.path.basename(os.path.normpath(channelDir))
+        return name[len(cls.CHANNEL_DIR_PREFIX):] if name.startswith(cls.CHANNEL_DIR_PREFIX) else name
+
+    def refresh(self):
+
+        """Pick up a new now_playing.json written by the process running the channel; True if it changed."""
+        if self.live:
+            return False
+        path = os.path.join(self.directory, 'now_playing.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            with open(path, encoding='utf-8') as f:
+                self.now_playing = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.mtime = mtime
+        self.version += 1
+        return True
+
+class GuideRequestHandler(SimpleHTTPRequestHandler):
+
+    """/                         the default (first registered) channel's guide
+    /channels/<name>/...        any channel's guide
+    .../now_playing.json        the item playing now
+    .../events                  server-sent events, one "now_playing" event per item change
+    /channels.json              every channel with its item playing now
+    """
+
+    def route(self):
+
+        """(channel, path inside the channel's schedules dir as a list of parts) of the request."""
+        parts = unquote(urlsplit(self.path).path).strip('/').split('/')
+        if parts[0] == 'channels' and len(parts) > 1:
+            return self.server.guide.get_channel(parts[1]), parts[2:]
+        return self.server.guide.get_channel(None), parts
+
+    def do_GET(self):
+
+        guide = self.server.guide
+        if self.path.split('?')[0] == '/channels.json':
+            return self.send_json([dict(name=channel.name, url='/channels/' + channel.name + '/', now_playing=guide.get_now_playing(channel.name))
+                for channel in guide.get_channels()])
+        channel, rest = self.route()
+        if channel is None:
+            return self.send_error(404, "No such channel")
+        if rest == ['events']:
+            return self.send_events(channel)
+        if rest == ['now_playing.json']:
+            return self.send_json(guide.get_now_playing(channel.name))
+        self.directory = channel.directory
+        self.path = '/' + '/'.join(rest)
+        return super().do_GET()
+
+    def do_HEAD(self):
+
+        channel, rest = self.route()
+        if channel is None:
+            return self.send_error(404, "No such channel")
+        self.directory = channel.directory
+        self.path = '/' + '/'.join(rest)
+        return super().do_HEAD()
+
+    def end_headers(self):
+
+        self.send_header('Access-Control-Allow-Origin', '*')
+        super().end_headers()
+
+    def send_json(self, data):
+
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self, channel):
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        guide = self.server.guide
+        version = None
+        try:
+            while not guide.closed:
+                newVersion, nowPlaying = guide.wait_for_change(channel.name, version, guide.KEEPALIVE)
+                if newVersion == version:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    version = newVersion
+                    self.wfile.write(('id: %d\nevent: now_playing\ndata: %s\n\n' % (version, json.dumps(nowPlaying))).encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+
+        return
+
+class GuideHTTPServer(ThreadingHTTPServer):
+
+    # rebind straight away after a restart, and don't let open event streams hold up exiting
+    allow_reuse_address = True
+    daemon_threads = True
+
+class PseudoGuideServer():
+
+    """Serves the guide of every channel from one process on a threaded http.server, with the
+    now playing item pushed to the pages over server-sent events instead of them polling a flag
+    file. There is one server per port; get() hands the running one to every controller of the
+    process, which then add_channel()s itself and publish()es each item change.
+    """
+
+    KEEPALIVE = 15
+    FILE_POLL = 1
+    servers = {}
+    servers_lock = threading.Lock()
+
+    def __init__(self, port, host='0.0.0.0'):
+
+        self.channels = OrderedDict()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.httpd = GuideHTTPServer((host, port), GuideRequestHandler)
+        self.httpd.guide = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='guide-server', daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls, port, host='0.0.0.0'):
+
+        """The server running on port, started on first use (raises OSError when the port is taken)."""
+        with cls.servers_lock:
+            server = cls.servers.get(port)
+            if server is None:
+                server = cls.servers[port] = cls(port, host)
+                print("NOTICE: Guide server listening on port {}".format(server.port))
+            return server
+
+    def add_channel(self, name, directory, live=True):
+
+        with self.condition:
+            channel = self.channels.get(name)
+            if channel is None or (live and not channel.live):
+                channel = self.channels[name] = GuideChannel(name, os.path.abspath(directory), live)
+            channel.refresh()
+            return channel
+
+    def add_sibling_channels(self, parentDir):
+
+        """Serve the guides of the other "pseudo-channel_*" dirs next to this one too (followed through their files)."""
+        try:
+            names = sorted(os.listdir(parentDir))
+        except OSError:
+            return
+        for dirName in names:
+            directory = os.path.join(parentDir, dirName, 'schedules')
+            if dirName.startswith(GuideChannel.CHANNEL_DIR_PREFIX) and os.path.isdir(directory):
+                name = GuideChannel.name_for(dirName)
+                if name not in self.channels:
+                    self.add_channel(name, directory, live=False)
+
+    def get_channel(self, name):
+
+        with self.condition:
+            if name is None:
+                return next(iter(self.channels.values()), None)
+            return self.channels.get(name)
+
+    def get_channels(self):
+
+        with self.condition:
+            return list(self.channels.values())
+
+    def get_now_playing(self, name):
+
+        with self.condition:
+            channel = self.channels[name]
+            channel.refresh()
+            return channel.now_playing
+
+    def publish(self, name, nowPlaying):
+
+        with self.condition:
+            channel = self.channels[name]
+            channel.now_playing = nowPlaying
+            channel.version += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, name, version, timeout):
+
+        """Block until the channel's item is newer than version (or timeout); returns (version, now playing)."""
+        with self.condition:
+            channel = self.channels[name]
+            step = timeout if channel.live else min(timeout, self.FILE_POLL)
+            waited = 0
+            while not self.closed and not channel.refresh() and channel.version == version and waited < timeout:
+                self.condition.wait(step)
+                waited += step
+            return channel.version, channel.now_playing
+
+    def shutdown(self):
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        with self.servers_lock:
+            if self.servers.get(self.port) is self:
+                del self.servers[self.port]
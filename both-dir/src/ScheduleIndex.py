@@ -0,0 +1,77 @@
+"""Start time sorted lookup of the item on at a time of day
+"""
+from bisect import bisect_right
+
+from src.ScheduleTime import ScheduleTime
+
+class ScheduleIndex():
+
+    """The daily schedule as intervals on the day, [start, end) in ms since midnight, sorted by
+    start. An item running past midnight is split into its evening part and its early morning
+    part. "What is on at t" is a bisect for the last interval starting at or before t; when that
+    one has already ended, the longest running interval before it (kept as a running maximum of
+    the ends) still covers t if anything does.
+    """
+
+    DAY_MS = ScheduleTime.DAY_SECONDS * 1000
+
+    def __init__(self, schedule):
+
+        intervals = []
+        for position, item in enumerate(schedule):
+            if item.start_ms is None or item.end_ms is None:
+                continue
+            if item.end_ms > self.DAY_MS:
+                intervals.append((item.start_ms, self.DAY_MS, position, 0))
+                intervals.append((0, item.end_ms - self.DAY_MS, position, self.DAY_MS - item.start_ms))
+            else:
+                intervals.append((item.start_ms, item.end_ms, position, 0))
+        intervals.sort()
+        self.schedule = list(schedule)
+        self.starts = [interval[0] for interval in intervals]
+        self.intervals = intervals
+        # index of the interval with the latest end among intervals[:i + 1]
+        self.longest = []
+        for i, interval in enumerate(intervals):
+            self.longest.append(i if not self.longest or interval[1] > intervals[self.longest[-1]][1] else self.longest[-1])
+
+    def __len__(self):
+
+        return len(self.intervals)
+
+    def find(self, nowMs):
+
+        """Index of the interval covering nowMs (ms since midnight), None if there is none."""
+        i = bisect_right(self.starts, nowMs % self.DAY_MS) - 1
+        if i < 0:
+            return None
+        if self.intervals[i][1] > nowMs % self.DAY_MS:
+            return i
+        i = self.longest[i]
+        return i if self.intervals[i][1] > nowMs % self.DAY_MS else None
+
+    def lookup(self, nowMs):
+
+        """(item on at nowMs, ms since it started), (None, 0) when nothing is on."""
+        i = self.find(nowMs)
+        if i is None:
+            return None, 0
+        start, end, position, before = self.intervals[i]
+        return self.schedule[position], before + nowMs % self.DAY_MS - start
+
+    def upcoming(self, nowMs, count):
+
+        """The item on at nowMs (or the next one to start) and the ones after it, count in all."""
+        if not self.intervals or count <= 0:
+            return []
+        i = self.find(nowMs)
+        if i is None:
+            i = bisect_right(self.starts, nowMs % self.DAY_MS)
+        items = []
+        for step in range(len(self.intervals)):
+            item = self.schedule[self.intervals[(i + step) % len(self.intervals)][2]]
+            if item not in items:
+                items.append(item)
+                if len(items) == count:
+                    break
+        return items
@@ -0,0 +1,154 @@
+"""Typed rows for the schedule / daily_schedule / episodes tables
+"""
+import datetime
+
+from src.ScheduleTime import ScheduleTime
+
+class TableRow():
+
+    """A database row with named fields (__slots__, no per row dict) that still reads like the
+    tuple it replaces: row[3], slicing, len(), unpacking, json.dumps(list(row)) and == against a
+    tuple all work, so code can move to the names one call site at a time. Subclasses list the
+    table's columns in FIELDS and pre-parse what they need in parse().
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, *values):
+
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+        self.parse()
+
+    @classmethod
+    def factory(cls, cursor, row):
+
+        """sqlite3 row_factory signature."""
+        return cls(*row)
+
+    def parse(self):
+
+        pass
+
+    @staticmethod
+    def parse_clock(value):
+
+        """Seconds since the start of the day for a "%H:%M:%S" (or "%I:%M:%S %p") start time, None if unreadable."""
+
+        try:
+            return ScheduleTime.to_seconds(value)
+        except (ValueError, AttributeError):
+            pass
+        try:
+            return ScheduleTime.to_seconds(datetime.datetime.strptime(value, '%I:%M:%S %p'))
+        except (ValueError, TypeError):
+            return None
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self.FIELDS[index])
+
+    def __len__(self):
+
+        return len(self.FIELDS)
+
+    def __iter__(self):
+
+        for name in self.FIELDS:
+            yield getattr(self, name)
+
+    def __eq__(self, other):
+
+        if isinstance(other, (TableRow, tuple, list)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+
+        return hash(tuple(self))
+
+    def __repr__(self):
+
+        return "%s%r" % (type(self).__name__, tuple(self))
+
+class ScheduleRow(TableRow):
+
+    """A row of the (weekly) schedule table; start is startTime in seconds since the start of the day."""
+
+    FIELDS = ('id', 'unix', 'mediaID', 'title', 'duration', 'startTime', 'endTime', 'dayOfWeek',
+              'startTimeUnix', 'section', 'strictTime', 'timeShift', 'overlapMax', 'xtra', 'rerun',
+              'year', 'genres', 'actors', 'collections', 'rating', 'studio', 'seasonEpisode')
+    __slots__ = FIELDS + ('start',)
+
+    def parse(self):
+
+        self.start = self.parse_clock(self.startTime)
+
+class DailyScheduleRow(TableRow):
+
+    """A row of the daily_schedule table, with the start / end pre-parsed once:
+
+        start_ms - startTime in ms since the start of the day
+        end_ms   - endTime in ms since 1900-01-01 00:00:00 (items running past midnight end on 1900-01-02)
+
+    start_time / end_time give the same datetimes strptime used to, without parsing again.
+    """
+
+    FIELDS = ('id', 'unix', 'mediaID', 'title', 'episodeNumber', 'seasonNumber', 'showTitle',
+              'duration', 'startTime', 'endTime', 'dayOfWeek', 'sectionType', 'plexMediaID',
+              'customSectionName', 'notes')
+    __slots__ = FIELDS + ('start_ms', 'end_ms')
+
+    DAY_ZERO = datetime.datetime(1900, 1, 1)
+
+    def parse(self):
+
+        start = self.parse_clock(self.startTime)
+        self.start_ms = None if start is None else start * 1000
+        self.end_ms = self.parse_end(self.endTime)
+
+    @classmethod
+    def parse_end(cls, value):
+
+        """"%Y-%m-%d %H:%M:%S[.%f]" as ms since 1900-01-01."""
+        try:
+            value = str(value)
+            day = datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+            seconds = ScheduleTime.to_seconds(value[11:19])
+            fraction = value[20:23] if value[19:20] == '.' else ''
+            ms = int(fraction.ljust(3, '0')) if fraction else 0
+        except ValueError:
+            return None
+        return ((day - cls.DAY_ZERO.date()).days * 86400 + seconds) * 1000 + ms
+
+    @property
+    def start_time(self):
+
+        return None if self.start_ms is None else self.DAY_ZERO + datetime.timedelta(milliseconds=self.start_ms)
+
+    @property
+    def end_time(self):
+
+        return None if self.end_ms is None else self.DAY_ZERO + datetime.timedelta(milliseconds=self.end_ms)
+
+    @property
+    def display_title(self):
+
+        """"Show - Episode" for TV, the title for everything else."""
+        return self.showTitle + " - " + self.title if self.sectionType == "TV Shows" else self.title
+
+    @property
+    def photo_title(self):
+
+        return self.showTitle if self.sectionType == "TV Shows" else self.title
+
+class EpisodeRow(TableRow):
+
+    """A row of the episodes table."""
+
+    FIELDS = ('id', 'unix', 'mediaID', 'title', 'duration', 'episodeNumber', 'seasonNumber',
+              'showTitle', 'plexMediaID', 'customSectionName', 'rating', 'airDate', 'summary')
+    __slots__ = FIELDS
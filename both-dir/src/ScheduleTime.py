@@ -0,0 +1,72 @@
+"""Schedule time arithmetic on integer seconds since the start of the day
+"""
+
+class ScheduleTime():
+
+    """Time-of-day math for the scheduler, done on whole seconds since 00:00:00.
+
+    A TimeGrid of N minutes holds the slots h:00, h:N, h:2N, ... (< 60) of every hour, the same
+    slots the scheduler used to list out as strings, but the next slot at or after a time is
+    worked out arithmetically instead of by scanning the whole day.
+    """
+
+    DAY_SECONDS = 24 * 3600
+
+    @staticmethod
+    def to_seconds(value):
+
+        """Seconds since the start of the day for a "%H:%M:%S" string or a time / datetime."""
+        if isinstance(value, str):
+            hours, minutes, seconds = value.strip().split(":")
+            hours, minutes, seconds = int(hours), int(minutes), int(float(seconds))
+            if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+                raise ValueError("time data '{}' is not a valid time of day".format(value))
+            return hours * 3600 + minutes * 60 + seconds
+        return value.hour * 3600 + value.minute * 60 + value.second
+
+    @staticmethod
+    def to_string(seconds):
+
+        seconds = int(seconds) % ScheduleTime.DAY_SECONDS
+        return "%02d:%02d:%02d" % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+    @staticmethod
+    def diff_minutes(time1, time2):
+
+        """Whole minutes from time1 to time2 (truncated towards zero, negative if time2 is earlier)."""
+        delta = ScheduleTime.to_seconds(time2) - ScheduleTime.to_seconds(time1)
+        return int(delta / 60)
+
+class TimeGrid():
+
+    """The per-hour time-shift grid; built once per step and reused."""
+
+    grids = {}
+
+    def __init__(self, step_minutes):
+
+        step_minutes = int(step_minutes)
+        if step_minutes <= 0:
+            raise ValueError("time grid step must be a positive number of minutes, got {}".format(step_minutes))
+        self.step = step_minutes * 60
+        # the last slot inside an hour, e.g. :56 for a 7 minute grid
+        self.last_in_hour = (59 // step_minutes) * self.step
+        self.first = 0
+        self.last = 23 * 3600 + self.last_in_hour
+
+    @classmethod
+    def get(cls, step_minutes):
+
+        step_minutes = int(step_minutes)
+        if step_minutes not in cls.grids:
+            cls.grids[step_minutes] = cls(step_minutes)
+        return cls.grids[step_minutes]
+
+    def ceil(self, seconds):
+
+        """First slot at or after seconds (seconds must not be past self.last)."""
+        hour_start = seconds - seconds % 3600
+        slot = -(-(seconds - hour_start) // self.step) * self.step
+        if slot > self.last_in_hour:
+            return hour_start + 3600
+        return hour_start + slot
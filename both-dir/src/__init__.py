@@ -1,3 +1,5 @@
+from .DurationIndex import DurationIndex
+from .MediaQuery import MediaQuery
 from .PseudoChannelDatabase import PseudoChannelDatabase
 from .Commercial import Commercial
 from .Episode import Episode
@@ -7,4 +9,10 @@ from .Music import Music
 from .Video import Video
 from .PseudoDailyScheduleController import PseudoDailyScheduleController
 from .PseudoChannelCommercial import PseudoChannelCommercial
-from .PseudoChannelRandomMovie import PseudoChannelRandomMovie
\ No newline at end of file
+from .PseudoChannelRandomMovie import PseudoChannelRandomMovie
+from .ScheduleTime import ScheduleTime, TimeGrid
+from .ScheduleRow import TableRow, ScheduleRow, DailyScheduleRow, EpisodeRow
+from .PseudoChannelTimer import PseudoChannelTimer
+from .PseudoChannelRunner import PseudoChannelRunner
+from .PseudoGuide import GuideTemplate
+from .PseudoGuideServer import PseudoGuideServer, GuideChannel
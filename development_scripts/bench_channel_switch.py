@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Channel up / down latency: the time from the keypress (the switch command) to playMedia.
+
+    python development_scripts/bench_channel_switch.py
+        switches between synthetic channels in process: what the daemon does for a switch (stop
+        the old channel, find what is on and at which offset, schedule the new channel) up to the
+        point it calls play on the controller. Also times the "what is on now" lookup on its own,
+        the bisect index against scanning the schedule.
+
+    python development_scripts/bench_channel_switch.py --socket ../pseudo-channel-daemon.sock
+        sends up / down to a running PseudoChannelDaemon.py and times the round trip, which
+        includes the real playMedia calls.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import types
+from time import perf_counter
+
+BOTH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'both-dir')
+# import single modules of src without running src/__init__.py (and importing plexapi), as the tests do
+if 'src' not in sys.modules:
+    src = types.ModuleType('src')
+    src.__path__ = [os.path.join(BOTH_DIR, 'src')]
+    sys.modules['src'] = src
+
+from src.PseudoChannelRunner import PseudoChannelRunner
+from src.PseudoChannelTimer import PseudoChannelTimer
+from src.ScheduleIndex import ScheduleIndex
+from src.ScheduleRow import DailyScheduleRow
+from src.ScheduleTime import ScheduleTime
+
+class TimingController():
+
+    """Stands in for PseudoDailyScheduleController: notes when play is called."""
+
+    def __init__(self):
+
+        self.played_at = None
+
+    def play(self, row, datalist, offset=0):
+
+        self.played_at = perf_counter()
+
+def make_schedule(items, rng):
+
+    """items back to back from 00:00, the last ones running past midnight."""
+    durationMs = ScheduleTime.DAY_SECONDS * 1000 // items
+    schedule = []
+    start = 0
+    for i in range(items):
+        duration = rng.randint(durationMs // 2, durationMs * 3 // 2)
+        end = start + duration
+        schedule.append(DailyScheduleRow(i + 1, 0, 0, "Item "+str(i), None, None, "", duration,
+            ScheduleTime.to_string(start // 1000 % ScheduleTime.DAY_SECONDS),
+            "1900-01-0{} {}".format(1 + end // (ScheduleTime.DAY_SECONDS * 1000), ScheduleTime.to_string(end // 1000 % ScheduleTime.DAY_SECONDS)),
+            "everyday", "Movies", "/library/metadata/"+str(i), "Movies", ""))
+        start = end
+        if start >= ScheduleTime.DAY_SECONDS * 1000:
+            break
+    return schedule
+
+def scan(schedule, nowMs):
+
+    """The lookup before the index: every item checked in turn."""
+    for item in schedule:
+        if item.start_ms <= nowMs < item.end_ms or nowMs + ScheduleTime.DAY_SECONDS * 1000 < item.end_ms:
+            return item
+    return None
+
+def percentiles(samples):
+
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))]
+    return "min {:.3f}  median {:.3f}  p95 {:.3f}  max {:.3f}".format(samples[0], pick(0.5), pick(0.95), samples[-1])
+
+def bench_in_process(channels, items, switches, seed):
+
+    rng = random.Random(seed)
+    timer = PseudoChannelTimer()
+    runners = []
+    for number in range(channels):
+        runner = PseudoChannelRunner(None, TimingController(), timer, tag='channel-'+str(number))
+        runner.load(make_schedule(items, rng))
+        runner.running = False
+        runners.append(runner)
+    # keep the bench quiet: the runner logs every switch
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        latencies = []
+        active = None
+        position = 0
+        for i in range(switches):
+            position = (position + rng.choice([1, -1])) % channels
+            target = runners[position]
+            keypress = perf_counter()
+            if active is not None:
+                active.stop()
+            active = target
+            target.start()
+            latencies.append((target.controller.played_at - keypress) * 1000)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print("{} channels x {} items, {} switches".format(channels, items, switches))
+    print("  keypress -> play (ms):       " + percentiles(latencies))
+
+    schedule = runners[0].schedule
+    index = ScheduleIndex(schedule)
+    probes = [rng.randrange(0, ScheduleTime.DAY_SECONDS * 1000) for i in range(2000)]
+    for name, lookup in (("scan", lambda nowMs: scan(schedule, nowMs)), ("index", lambda nowMs: index.lookup(nowMs)[0])):
+        samples = []
+        for nowMs in probes:
+            started = perf_counter()
+            lookup(nowMs)
+            samples.append((perf_counter() - started) * 1000000)
+        print("  what is on now, {:5} (us): ".format(name) + percentiles(samples))
+
+def send(socketPath, command):
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(30)
+        s.connect(socketPath)
+        s.sendall((command+"\n").encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode('utf-8'))
+
+def bench_daemon(socketPath, switches):
+
+    latencies = []
+    daemonLatencies = []
+    for i in range(switches):
+        started = perf_counter()
+        reply = send(socketPath, "up" if i % 2 == 0 else "down")
+        latencies.append((perf_counter() - started) * 1000)
+        if not reply.get('ok'):
+            print("ERROR: " + str(reply.get('message')))
+            return
+        daemonLatencies.append(send(socketPath, "status")['switch_ms'])
+    print("{} switches through {}".format(switches, socketPath))
+    print("  keypress -> reply (ms):      " + percentiles(latencies))
+    print("  switch inside daemon (ms):   " + percentiles(daemonLatencies))
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Channel switch latency')
+    parser.add_argument('--channels', type=int, default=30)
+    parser.add_argument('--items', type=int, default=400, help='items per daily schedule')
+    parser.add_argument('--switches', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--socket', help='control socket of a running PseudoChannelDaemon.py')
+    args = parser.parse_args()
+    if args.socket:
+        bench_daemon(args.socket, args.switches)
+    else:
+        bench_in_process(args.channels, args.items, args.switches, args.seed)
@@ -0,0 +1,15 @@
+import os
+import sys
+import types
+
+"""
+The tests import single modules from both-dir/src. Importing the "src" package normally runs
+src/__init__.py, which pulls in every module (and plexapi with them), so register the package
+without running it; each test then imports only the module it needs.
+"""
+BOTH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'both-dir')
+
+if 'src' not in sys.modules:
+    src = types.ModuleType('src')
+    src.__path__ = [os.path.join(BOTH_DIR, 'src')]
+    sys.modules['src'] = src
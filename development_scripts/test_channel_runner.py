@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+
+from src.PseudoChannelRunner import PseudoChannelRunner
+from src.PseudoChannelTimer import PseudoChannelTimer
+from src.ScheduleRow import DailyScheduleRow
+
+class FakeController():
+
+    def __init__(self):
+
+        self.played = []
+
+    def play(self, row, datalist, offset=0):
+
+        self.played.append((row.title, offset))
+
+class InlineExecutor():
+
+    def submit(self, fn, *args):
+
+        fn(*args)
+
+def row(id, title, startTime, endTime, duration):
+
+    return DailyScheduleRow(id, 0, 0, title, None, None, "", duration, startTime, endTime, "everyday",
+        "Movies", "/library/metadata/" + str(id), "Movies", "")
+
+SCHEDULE = [
+    row(1, "Morning", "08:00:00", "1900-01-01 09:30:00", 5400000),
+    # scheduled 5 minutes after its natural start: the first 5 minutes are cut off
+    row(2, "Late", "09:35:00", "1900-01-01 10:00:00", 1800000),
+    row(3, "Overnight", "23:30:00", "1900-01-02 01:00:00", 5400000),
+]
+
+@pytest.fixture
+def runner():
+
+    wall = [datetime.datetime(2020, 6, 3, 12, 0, 0)]
+    timer = PseudoChannelTimer(lambda: 0.0, lambda: wall[0], InlineExecutor())
+    runner = PseudoChannelRunner(None, FakeController(), timer, tag='channel-01')
+    runner.load(SCHEDULE)
+    return runner
+
+@pytest.mark.parametrize("now, expected", [
+    (datetime.datetime(2020, 6, 3, 8, 10, 0), ("Morning", 600000)),
+    (datetime.datetime(2020, 6, 3, 9, 40, 0), ("Late", 600000)),
+    (datetime.datetime(2020, 6, 3, 23, 45, 0), ("Overnight", 900000)),
+    (datetime.datetime(2020, 6, 4, 0, 30, 0), ("Overnight", 3600000)),
+    (datetime.datetime(2020, 6, 3, 12, 0, 0), None),
+])
+def test_play_now_starts_at_the_offset_into_the_item(runner, now, expected):
+
+    item = runner.play_now(now)
+
+    if expected is None:
+        assert item is None and runner.controller.played == []
+    else:
+        assert runner.controller.played == [expected]
+
+def test_every_item_gets_a_job_and_stop_drops_them(runner):
+
+    runner.schedule_items()
+    assert [job.label for job in runner.timer.pending('channel-01')] == ["Overnight", "Morning", "Late"]
+
+    runner.stop()
+    assert runner.timer.pending('channel-01') == []
+
+def test_stopped_runner_ignores_jobs_already_due(runner):
+
+    runner.play_item(SCHEDULE[1])
+    runner.stop()
+    runner.play_item(SCHEDULE[0])
+
+    assert runner.controller.played == [("Late", 300000)]
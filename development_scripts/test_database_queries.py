@@ -0,0 +1,335 @@
+import pytest
+
+from src.MediaQuery import MediaQuery
+from src.PseudoChannelDatabase import PseudoChannelDatabase
+
+@pytest.fixture
+def db():
+
+    db = PseudoChannelDatabase(":memory:")
+    db.create_tables()
+    db.add_movies_to_db(1, "Drama Movie", 5400000, "/library/metadata/1", "Movies", "PG", "", "1994-01-01",
+        str(['Drama']), str(['Some Actor']), str([]), "Studio A")
+    db.add_movies_to_db(2, "Melodrama Movie", 5400000, "/library/metadata/2", "Movies", "PG", "", "1994-01-01",
+        str(['Melodrama', 'Comedy']), str(['Other Actor']), str(['Box Set']), "Studio B")
+    db.add_shows_to_db(3, "A Show", 1800000, '', "1990-01-01", "/library/metadata/3", "TV Shows", "TV-PG",
+        str(['Drama']), str(['Some Actor']), str(['Other Show']), "Studio A")
+    db.rebuild_tag_tables()
+    return db
+
+@pytest.mark.parametrize("genres, actors, collections, expected", [
+    ("Drama", None, None, ["Drama Movie"]),
+    ("drama", None, None, ["Drama Movie"]),
+    ("Melodrama,Comedy", None, None, ["Melodrama Movie"]),
+    ("Drama,Comedy", None, None, []),
+    (None, "Other Actor", None, ["Melodrama Movie"]),
+    (None, None, "Box Set", ["Melodrama Movie"]),
+    (None, None, None, ["Drama Movie", "Melodrama Movie"]),
+])
+def test_movie_tag_filters_match_whole_tags(db, genres, actors, collections, expected):
+
+    movies = db.get_movies_data("Movies", 0, 9999999, None, genres, actors, collections, None, None)
+
+    assert sorted(movie[3] for movie in movies) == expected
+
+def test_movie_xtra_filters_use_tags(db):
+
+    movies = db.get_movies_xtra(0, 9999999, ["genre:Comedy", "studio:Studio B"])
+
+    assert [movie[3] for movie in movies] == ["Melodrama Movie"]
+
+def test_tag_filter_uses_index(db):
+
+    query = MediaQuery('movies').tagged('genre', ['Drama'])
+    plan = db.cursor.execute("EXPLAIN QUERY PLAN " + query.sql(), query.params).fetchall()
+
+    assert any('idx_movie_tags_tag' in row[-1] for row in plan)
+    assert any('idx_tags_kind_tag' in row[-1] for row in plan)
+
+def test_episode_queue_lookups_use_indexes(db):
+
+    for name, uses_index, detail in db.check_query_plans():
+        assert uses_index, name + ": " + detail
+
+def test_next_episode_is_matched_case_insensitively(db):
+
+    for number in range(1, 4):
+        db.add_episodes_to_db(3, "Episode " + str(number), 1800000, number, 1, "A Show",
+            "/library/metadata/1" + str(number), "TV Shows", "TV-PG", "1990-01-01", "")
+    db.update_shows_table_with_last_episode_alt("A Show", "/library/metadata/11")
+
+    next_episode = db.get_next_episode("a show", [1, 0, 0])
+
+    assert next_episode[3] == "Episode 2"
+
+def test_resynced_show_keeps_its_queue(db):
+
+    db.add_episodes_to_db(3, "Episode 1", 1800000, 1, 1, "A Show", "/library/metadata/11", "TV Shows", "TV-PG", "1990-01-01", "")
+    db.update_shows_table_with_last_episode_alt("A Show", "/library/metadata/11")
+
+    queues = db.remove_shows_for_update(["/library/metadata/3"], "TV Shows")
+    assert db.get_shows("A Show") is None
+    db.add_shows_to_db(3, "A Show", 1800000, '', "1990-01-01", "/library/metadata/3", "TV Shows", "TV-PG",
+        str(['Drama']), str(['Some Actor']), str(['Other Show']), "Studio A")
+    for number in range(1, 3):
+        db.add_episodes_to_db(3, "Episode " + str(number), 1800000, number, 1, "A Show",
+            "/library/metadata/1" + str(number), "TV Shows", "TV-PG", "1990-01-01", "")
+    db.restore_show_queues(queues)
+
+    assert db.get_next_episode("A Show", [1, 0, 0])[3] == "Episode 2"
+
+@pytest.mark.parametrize("section, title, duration, expected", [
+    ("Movies", "drama movie", 5400000, "/library/metadata/1/art/1"),
+    ("TV Shows", "A Show", 1320000, "/library/metadata/3/art/2"),
+    ("Commercials", "Ad", 30000, "/library/metadata/5/art/1"),
+    ("Commercials", "Ad", 14000, "/library/metadata/4/art/1"),
+    ("Movies", "Melodrama Movie", 5400000, None),
+    ("TV Shows", "Drama Movie", 5400000, None),
+])
+def test_art_is_looked_up_locally(db, section, title, duration, expected):
+
+    db.cursor.execute("UPDATE movies SET art = '/library/metadata/1/art/1' WHERE mediaID = 1")
+    db.add_shows_to_db(3, "A Show", 1800000, '', "1990-01-01", "/library/metadata/3", "TV Shows", "TV-PG",
+        "", "", "", "Studio A", "/library/metadata/3/art/2")
+    db.add_commercials_to_db(3, "Ad", 15000, "/library/metadata/4", "Commercials", "/library/metadata/4/art/1")
+    db.add_commercials_to_db(3, "Ad", 30000, "/library/metadata/5", "Commercials", "/library/metadata/5/art/1")
+
+    assert db.get_art(section, title, duration) == expected
+
+def test_art_column_is_added_to_old_databases():
+
+    db = PseudoChannelDatabase(":memory:")
+    db.cursor.execute("CREATE TABLE commercials(id INTEGER PRIMARY KEY AUTOINCREMENT, unix INTEGER, "
+        "mediaID INTEGER, title TEXT, duration INTEGER, plexMediaID TEXT, customSectionName Text)")
+    db.create_tables()
+    db.add_commercials_to_db(3, "Ad", 15000, "/library/metadata/4", "Commercials", "/library/metadata/4/art/1")
+
+    assert db.get_art("Commercials", "Ad") == "/library/metadata/4/art/1"
+
+def make_library(path):
+
+    library = PseudoChannelDatabase(str(path))
+    library.create_tables()
+    library.add_movies_to_db(1, "Drama Movie", 5400000, "/library/metadata/1", "Movies", "PG", "", "1994-01-01",
+        str(['Drama']), str(['Some Actor']), str([]), "Studio A")
+    library.add_movies_to_db(2, "Kids Movie", 5400000, "/library/metadata/2", "Kids Movies", "G", "", "1994-01-01",
+        str(['Comedy']), str([]), str([]), "Studio B")
+    library.add_shows_to_db(3, "A Show", 1800000, '', "1990-01-01", "/library/metadata/3", "TV Shows", "TV-PG",
+        str(['Drama']), str([]), str([]), "Studio A")
+    library.rebuild_tag_tables()
+    return library
+
+@pytest.fixture
+def shared(tmp_path):
+
+    library = make_library(tmp_path / "library.db")
+    channels = []
+    for number in (1, 2):
+        channel = PseudoChannelDatabase(str(tmp_path / ("channel_" + str(number) + ".db")), str(tmp_path / "library.db"))
+        channel.create_tables()
+        channels.append(channel)
+    return library, channels
+
+def test_shared_library_keeps_queues_per_channel(shared):
+
+    library, (first, second) = shared
+    first.update_shows_table_with_last_episode("a show", "/library/metadata/31")
+    first.update_movies_table_with_last_played_date("Drama Movie")
+
+    assert first.get_shows("A Show")[5] == "/library/metadata/31"
+    assert first.get_movie("Drama Movie")[5] is not None
+    assert second.get_shows("A Show")[5] == ''
+    assert second.get_movie("Drama Movie")[5] is None
+    assert library.get_shows("A Show")[5] == ''
+
+@pytest.mark.parametrize("exclusions, expected", [
+    ({}, ["Drama Movie", "Kids Movie"]),
+    ({'Movies' : ["Kids Movies"]}, ["Drama Movie"]),
+    ({'Movies' : ["Kids Movies", "Movies"], 'TV Shows' : ["TV Shows"]}, []),
+])
+def test_library_exclusions_hide_sections(shared, exclusions, expected):
+
+    library, (first, second) = shared
+    first.set_library_exclusions(exclusions)
+
+    assert sorted(movie[3] for movie in first.get_movies()) == expected
+    assert len(second.get_movies()) == 2
+
+def test_shared_library_views_use_library_indexes(shared):
+
+    library, (first, second) = shared
+    first.set_library_exclusions({'TV Shows' : ["Kids Shows"]})
+
+    for name, uses_index, detail in first.check_query_plans():
+        assert uses_index, name + ": " + detail
+
+def test_rebuilt_library_is_installed_under_open_channels(shared, tmp_path):
+
+    library, (first, second) = shared
+    assert len(first.get_movies()) == 2
+    build = make_library(tmp_path / "build.db")
+    build.add_movies_to_db(4, "New Movie", 5400000, "/library/metadata/4", "Movies", "PG", "", "1994-01-01",
+        str([]), str([]), str([]), "Studio A")
+    build.conn.close()
+
+    PseudoChannelDatabase.backup_database(str(tmp_path / "library.db"), str(tmp_path / "library.bak"))
+    PseudoChannelDatabase.install_database(str(tmp_path / "build.db"), str(tmp_path / "library.db"))
+
+    assert not (tmp_path / "build.db").exists()
+    assert sorted(movie[3] for movie in first.get_movies()) == ["Drama Movie", "Kids Movie", "New Movie"]
+    assert len(PseudoChannelDatabase(str(tmp_path / "library.bak")).get_movies()) == 2
+
+def test_library_is_reattached(shared, tmp_path):
+
+    library, (first, second) = shared
+    first.reattach_library(None)
+    assert first.library is None
+
+    first.reattach_library(str(tmp_path / "library.db"))
+    assert len(first.get_movies()) == 2
+
+def test_channel_copy_is_replaced_by_state(tmp_path):
+
+    make_library(tmp_path / "library.db")
+    old = make_library(tmp_path / "channel.db")
+    old.update_shows_table_with_last_episode("A Show", "/library/metadata/32")
+    old.conn.close()
+
+    channel = PseudoChannelDatabase(str(tmp_path / "channel.db"), str(tmp_path / "library.db"))
+    channel.create_tables()
+
+    assert channel.import_state_from_copy()
+    assert not channel.import_state_from_copy()
+    assert channel.cursor.execute("SELECT name FROM main.sqlite_master WHERE name = 'shows'").fetchone() is None
+    assert channel.get_shows("A Show")[5] == "/library/metadata/32"
+
+@pytest.mark.parametrize("min, max, airDate, genres, rating, expected", [
+    (1200000, 1500000, None, None, None, ["A Show"]),
+    (2400000, 3000000, None, None, None, ["Long Show"]),
+    (2400000, 3000000, "199*", None, None, ["Long Show"]),
+    (2400000, 3000000, "200*", None, None, ["Long Show"]),
+    (1200000, 1500000, None, "Drama", "US,TV-PG,=", ["A Show"]),
+    (1200000, 1500000, None, "Comedy", "US,TV-PG,<", ["A Show"]),
+    (60000, 120000, None, None, None, [None]),
+])
+@pytest.mark.parametrize("stats", [False, True])
+def test_random_show_needs_an_episode_in_the_window(db, min, max, airDate, genres, rating, expected, stats):
+
+    db.add_shows_to_db(4, "Long Show", 3600000, '', "1995-01-01", "/library/metadata/4", "TV Shows", "TV-14",
+        str(['Comedy']), str([]), str([]), "Studio B")
+    db.add_episodes_to_db(3, "Short One", 1320000, 1, 1, "A Show", "/library/metadata/31", "TV Shows", "TV-PG", "1990-01-01", "")
+    db.add_episodes_to_db(4, "Long One", 2700000, 1, 1, "Long Show", "/library/metadata/41", "TV Shows", "TV-14", "1995-01-01", "")
+    db.rebuild_tag_tables()
+    if stats:
+        db.rebuild_show_stats()
+
+    picks = set()
+    for i in range(20):
+        the_show = db.get_random_show_data("TV Shows", min, max, airDate, genres, None, None, rating, None)
+        picks.add(the_show[3] if the_show is not None else None)
+
+    assert sorted(picks, key=str) == expected
+
+def test_show_stats_sum_up_episodes(db):
+
+    for number, (duration, airDate, season) in enumerate([(1320000, "1990-01-01", 1), (1500000, "1991-01-01", 2),
+            (1380000, "", 2)]):
+        db.add_episodes_to_db(3, "Episode " + str(number), duration, number, season, "A Show",
+            "/library/metadata/3" + str(number), "TV Shows", "TV-PG", airDate, "")
+    db.ensure_show_stats()
+
+    assert db.cursor.execute("SELECT * FROM show_stats").fetchall() == [(3, 3, 1320000, 1500000, 1380000, "1990-01-01", "1991-01-01", 2)]
+    assert db.add_show_stats_filter(MediaQuery('shows'), 0, 1, "199").params == [0, 1, "199", "199\uffff"]
+
+@pytest.fixture
+def ended(db):
+
+    db.add_shows_to_db(4, "Other Show", 1800000, '', "1990-01-01", "/library/metadata/4", "TV Shows", "TV-PG",
+        "", "", "", "Studio B")
+    db.add_shows_to_db(5, "Rated Show", 1700000, '', "1990-01-01", "/library/metadata/5", "TV Shows", "TV-MA",
+        "", "", "", "Studio B")
+    db.add_shows_to_db(6, "Long Show", 3600000, '', "1990-01-01", "/library/metadata/6", "TV Shows", "TV-PG",
+        "", "", "", "Studio B")
+    for mediaID, show in [(3, "A Show"), (4, "Other Show"), (5, "Rated Show"), (6, "Long Show")]:
+        db.add_episodes_to_db(mediaID, show + " 1", 1800000 if mediaID != 6 else 3600000, 1, 1, show,
+            "/library/metadata/" + str(mediaID) + "1", "TV Shows", "TV-PG", "1990-01-01", "")
+    db.add_schedule_to_db(24, "A Show", "60", "08:00:00", "08:30:00", "everyday", 0, "TV Shows", "true", 15, 15,
+        None, 0, None, None, None, None, None, None, None)
+    return db
+
+@pytest.mark.parametrize("method, args, scheduled, expected", [
+    ("get_any", (1800000, ), set(), ["A Show", "Other Show", "Rated Show"]),
+    ("get_any", (1800000, ), {"A Show", "Other Show"}, ["Rated Show"]),
+    ("get_any", (600000, ), set(), [None]),
+    ("get_by_rating", (1800000, "TV-PG"), {"A Show"}, ["Other Show"]),
+    ("get_by_rating", (1800000, "TV-Y"), set(), [None]),
+    ("get_similar", (1800000, ), set(), ["Other Show"]),
+    ("get_similar", (1800000, ), {"Other Show"}, [None]),
+])
+def test_replacement_show_skips_scheduled_shows(ended, method, args, scheduled, expected):
+
+    picks = set(getattr(ended, method)("A Show", *args, scheduled=scheduled) for i in range(30))
+
+    assert sorted(picks, key=str) == expected
+
+def test_ended_show_is_replaced_in_schedule(ended):
+
+    scheduled = ended.get_scheduled_show_titles()
+    entry = ended.get_schedule()[0]
+    ended.update_shows_table_with_last_episode("A Show", "/library/metadata/31")
+
+    first_episode = ended.get_next_episode("A Show", entry, scheduled)
+
+    assert first_episode[7] in ("Other Show", "Rated Show")
+    assert scheduled == {first_episode[7]}
+    assert ended.get_schedule()[0][3] == first_episode[7]
+
+def test_replaced_show_stays_scheduled_while_it_has_another_slot(ended):
+
+    ended.add_schedule_to_db(24, "A Show", "60", "09:00:00", "09:30:00", "everyday", 0, "TV Shows", "true", 15, 15,
+        None, 0, None, None, None, None, None, None, None)
+    scheduled = ended.get_scheduled_show_titles()
+    ended.update_shows_table_with_last_episode("A Show", "/library/metadata/31")
+
+    first_episode = ended.get_next_episode("A Show", ended.get_schedule()[0], scheduled)
+
+    assert scheduled == {"A Show", first_episode[7]}
+
+def test_replacement_show_needs_an_episode_of_the_length(ended):
+
+    ended.add_shows_to_db(7, "Padded Show", 1800000, '', "1990-01-01", "/library/metadata/7", "TV Shows", "TV-PG",
+        "", "", "", "Studio B")
+    ended.add_episodes_to_db(7, "Padded Show 1", 3000000, 1, 1, "Padded Show", "/library/metadata/71", "TV Shows",
+        "TV-PG", "1990-01-01", "")
+    assert "Padded Show" in set(ended.get_any("A Show", 1800000, scheduled={"A Show"}) for i in range(60))
+
+    ended.rebuild_show_stats()
+
+    assert set(ended.get_any("A Show", 1800000, scheduled={"A Show"}) for i in range(60)) == {"Other Show", "Rated Show"}
+
+@pytest.mark.parametrize("method, args, expected", [
+    ("get_movies_data", ("Movies", 0, 9999999, "1994", None, None, None, None, None), ["Drama Movie", "Melodrama Movie"]),
+    ("get_movies_data", ("Movies", 0, 9999999, "199*", None, None, None, "US,PG,=", None), ["Drama Movie", "Melodrama Movie"]),
+    ("get_movies_data", ("Movies", 0, 9999999, "2001", None, None, None, None, None), []),
+    ("get_movies_data", ("Movies", 0, 9999999, None, None, None, None, "US,G,<", None), []),
+    ("get_movies_xtra", (0, 9999999, ["releaseYear:2001"]), []),
+    ("get_movies_xtra", (0, 9999999, ["decade:1990"]), ["Drama Movie", "Melodrama Movie"]),
+])
+def test_movie_filters_by_year_and_rating(db, method, args, expected):
+
+    assert sorted(movie[3] for movie in getattr(db, method)(*args)) == expected
+
+def test_filter_results_are_cached_until_cleared(db):
+
+    first = db.get_movies_data("Movies", 0, 9999999, None, "Drama", None, None, None, None)
+    db.update_movies_table_with_last_played_date("Drama Movie")
+    db.cursor.execute("UPDATE movies SET duration = 1 WHERE title = 'Drama Movie'")
+
+    cached = db.get_movies_data("Movies", 0, 9999999, None, "Drama", None, None, None, None)
+    db.clear_filter_cache()
+    fresh = db.get_movies_data("Movies", 5000000, 9999999, None, "Drama", None, None, None, None)
+
+    assert len(db.filter_cache) == 1
+    assert [movie[3] for movie in first] == [movie[3] for movie in cached] == ["Drama Movie"]
+    assert cached[0][5] is not None
+    assert fresh == []
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from src.DurationIndex import DurationIndex
+
+@pytest.fixture
+def index():
+
+    return DurationIndex([(duration, "item " + str(duration)) for duration in [30000, 15000, 60000, 15000, 45000]])
+
+@pytest.mark.parametrize("min, max, expected", [
+    (None, None, 5),
+    (15000, 15000, 2),
+    (15001, 44999, 1),
+    (15000, 45000, 4),
+    (60001, None, 0),
+    (None, 14999, 0),
+])
+def test_count_matches_between(index, min, max, expected):
+
+    assert index.count(min, max) == expected
+
+def test_pick_stays_in_range_and_covers_it(index):
+
+    rng = random.Random(7)
+    picked = set(index.pick(15000, 45000, rng) for i in range(200))
+
+    assert picked == {(15000, "item 15000"), (30000, "item 30000"), (45000, "item 45000")}
+
+def test_pick_outside_range_is_none(index):
+
+    assert index.pick(61000, 90000) is None
+
+def test_database_random_pick_uses_fresh_index():
+
+    from src.PseudoChannelDatabase import PseudoChannelDatabase
+
+    db = PseudoChannelDatabase(":memory:")
+    db.create_tables()
+    db.add_commercials_to_db(3, "Short", 15000, "/library/metadata/1", "Commercials")
+    assert db.get_random_by_duration('commercials', 1000, 20000)[3] == "Short"
+    assert db.get_random_by_duration('commercials', 20000, 40000) is None
+    db.add_commercials_to_db(3, "Long", 30000, "/library/metadata/2", "Commercials")
+    assert db.get_random_by_duration('commercials', 20000, 40000)[3] == "Long"
@@ -0,0 +1,66 @@
+import pytest
+
+from src.PseudoChannelGapPacker import PseudoChannelGapPacker
+
+COMMERCIALS = [
+    (i, 0, 3, "Commercial " + str(i), duration, "/library/metadata/" + str(i), "Commercials")
+    for i, duration in enumerate([15000, 15000, 20000, 30000, 30000, 45000, 60000, 60000, 90000, 120000, 29000, 31000])
+]
+
+def run_length(packer, packed):
+
+    # back to back, the last commercial needs neither padding nor spacing after it
+    return sum(packer.cost(commercial) for commercial in packed) - packer.padding_ms - packer.SPACING_MS
+
+@pytest.mark.parametrize("gap_ms", [0, 14000, 47000, 300000, 900000, 1800000, 3600000])
+def test_pack_fits_gap(gap_ms):
+
+    packer = PseudoChannelGapPacker(COMMERCIALS, 1000, seed=1)
+    packed, left = packer.pack(gap_ms)
+
+    if packed:
+        assert run_length(packer, packed) <= gap_ms
+    assert left >= 0
+    if gap_ms >= 300000:
+        assert left < 2000
+
+@pytest.mark.parametrize("gap_ms", [0, -1000, -2000, -2001, -900000])
+def test_pack_places_nothing_when_the_previous_item_overruns(gap_ms):
+
+    packer = PseudoChannelGapPacker(COMMERCIALS, 1000, seed=1)
+    packed, left = packer.pack(gap_ms)
+
+    assert packed == []
+    assert left == gap_ms if gap_ms <= -2000 else left > 0
+    assert packer.fill_exactly(gap_ms) == []
+
+def test_pack_is_reproducible_with_seed():
+
+    first = PseudoChannelGapPacker(COMMERCIALS, 1000, no_repeat_window=3, seed="channel-1").pack(1800000)
+    second = PseudoChannelGapPacker(COMMERCIALS, 1000, no_repeat_window=3, seed="channel-1").pack(1800000)
+
+    assert first == second
+
+def test_pack_avoids_recent_commercials():
+
+    packer = PseudoChannelGapPacker(COMMERCIALS, 0, no_repeat_window=4, seed=3)
+    packed, left = packer.pack(120000)
+    ids = [commercial[5] for commercial in packed]
+
+    assert len(ids) == len(set(ids))
+
+# Plex durations are not whole seconds (21919, 29838 ms...); enough of them to fill the exact-fill tail
+ODD_COMMERCIALS = [
+    (i, 0, 3, "Commercial " + str(i), 14000 + (i * 7919) % 47000, "/library/metadata/" + str(i), "Commercials")
+    for i in range(1, 41)
+]
+
+@pytest.mark.parametrize("gap_ms", [47000, 180000, 301370, 600000, 1234567])
+@pytest.mark.parametrize("seed", range(5))
+def test_pack_fills_gap_with_non_round_durations(gap_ms, seed):
+
+    packer = PseudoChannelGapPacker(ODD_COMMERCIALS, 1000, seed=seed)
+    packed, left = packer.pack(gap_ms)
+
+    assert run_length(packer, packed) <= gap_ms
+    assert 0 <= left <= packer.padding_ms
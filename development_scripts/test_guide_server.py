@@ -0,0 +1,76 @@
+import http.client
+import json
+import os
+
+import pytest
+
+from src.PseudoGuideServer import PseudoGuideServer, GuideChannel
+
+@pytest.fixture
+def server(tmp_path):
+
+    for name in ("pseudo-channel_01", "pseudo-channel_02"):
+        os.makedirs(str(tmp_path / name / "schedules"))
+        (tmp_path / name / "schedules" / "index.html").write_text("guide " + name)
+    (tmp_path / "pseudo-channel_02" / "schedules" / "now_playing.json").write_text(json.dumps({'item' : {'title' : 'Other'}}))
+    server = PseudoGuideServer(0, '127.0.0.1')
+    server.add_channel("01", str(tmp_path / "pseudo-channel_01" / "schedules"))
+    server.add_sibling_channels(str(tmp_path))
+    yield server
+    server.shutdown()
+
+def get(server, path):
+
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    return response.status, response.read().decode('utf-8')
+
+@pytest.mark.parametrize("path, expected", [
+    ("/", "guide pseudo-channel_01"),
+    ("/index.html", "guide pseudo-channel_01"),
+    ("/channels/01/index.html", "guide pseudo-channel_01"),
+    ("/channels/02/", "guide pseudo-channel_02"),
+])
+def test_guides_of_every_channel_are_served(server, path, expected):
+
+    assert get(server, path) == (200, expected)
+
+def test_now_playing_comes_from_memory_or_the_channel_file(server):
+
+    server.publish("01", {'item' : {'title' : 'Live'}})
+
+    assert json.loads(get(server, "/channels/01/now_playing.json")[1]) == {'item' : {'title' : 'Live'}}
+    assert json.loads(get(server, "/channels/02/now_playing.json")[1]) == {'item' : {'title' : 'Other'}}
+    assert [channel['name'] for channel in json.loads(get(server, "/channels.json")[1])] == ["01", "02"]
+    assert get(server, "/channels/03/")[0] == 404
+
+def test_events_push_each_item_change(server):
+
+    server.publish("01", {'item' : {'title' : 'First'}})
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    connection.request('GET', '/channels/01/events')
+    response = connection.getresponse()
+    assert response.getheader('Content-Type') == 'text/event-stream'
+
+    def next_event():
+        lines = []
+        while True:
+            line = response.fp.readline().decode('utf-8').rstrip('\n')
+            if line == '':
+                return lines
+            lines.append(line)
+
+    assert next_event() == ['id: 1', 'event: now_playing', 'data: {"item": {"title": "First"}}']
+    server.publish("01", {'item' : {'title' : 'Second'}})
+    assert next_event() == ['id: 2', 'event: now_playing', 'data: {"item": {"title": "Second"}}']
+    connection.close()
+
+@pytest.mark.parametrize("channelDir, expected", [
+    ("/opt/pseudo-channel/pseudo-channel_01", "01"),
+    ("/opt/pseudo-channel/pseudo-channel_01/", "01"),
+    ("/opt/tv", "tv"),
+])
+def test_channel_names(channelDir, expected):
+
+    assert GuideChannel.name_for(channelDir) == expected
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from src.PseudoGuide import GuideTemplate
+
+XML = ('<schedule currently_playing_bg_image="' + GuideTemplate.field('bg') + '">'
+       '<time current="' + GuideTemplate.row(1) + '">08:00:00</time>'
+       '<time current="' + GuideTemplate.row(12) + '">09:30:00</time>'
+       '<time current="' + GuideTemplate.row(2) + '">10:00:00</time>'
+       '</schedule>')
+
+@pytest.mark.parametrize("currentID, expected", [
+    (None, ["false", "false", "false"]),
+    (1, ["true", "false", "false"]),
+    (12, ["false", "true", "false"]),
+    ("2", ["false", "false", "true"]),
+    (99, ["false", "false", "false"]),
+])
+def test_only_the_current_row_is_marked(currentID, expected):
+
+    rendered = GuideTemplate(XML, 'true', 'false').render(currentID, bg="/art")
+
+    assert rendered.startswith('<schedule currently_playing_bg_image="/art">')
+    assert [part.split('"')[0] for part in rendered.split('current="')[1:]] == expected
+
+def test_missing_fields_render_empty_and_text_is_kept():
+
+    template = GuideTemplate("<h3>Now Playing: " + GuideTemplate.field('title') + "</h3> @@ not a slot @@", 'x', '')
+
+    assert template.render() == "<h3>Now Playing: </h3> @@ not a slot @@"
+    assert template.render(title="Seinfeld") == "<h3>Now Playing: Seinfeld</h3> @@ not a slot @@"
+
+def test_write_atomic_replaces_without_leftovers(tmp_path):
+
+    path = str(tmp_path / "index.html")
+    GuideTemplate.write_atomic(path, "old")
+    GuideTemplate.write_atomic(path, "new é")
+
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == "new é"
+    assert os.listdir(str(tmp_path)) == ["index.html"]
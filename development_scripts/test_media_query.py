@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from src.MediaQuery import MediaQuery
+
+def build(ratings, genres, release):
+
+    return (MediaQuery('movies').between('duration', 0, 5400000).any_of('rating', ratings)
+        .starts_with('releaseYear', release).tagged('genre', genres))
+
+@pytest.mark.parametrize("first, second", [
+    ((['G', 'PG'], ['Drama'], "199"), (['PG-13', 'R', 'NC-17'], ['Comedy', 'Horror'], "201")),
+    ((['PG'], [], None), (['R'], [], None)),
+    (([], [" Drama ", "Comedy"], "1994"), ([], ["Western", ""], "2001")),
+])
+def test_statement_only_depends_on_the_filters_used(first, second):
+
+    assert build(*first).sql() == build(*second).sql()
+    assert build(*first).params != build(*second).params
+
+def test_values_are_bound_parameters():
+
+    query = build(['PG', '"R"'], ["Rock 'n' Roll"], '19"')
+
+    assert '"' not in query.sql() and "'" not in query.sql()
+    assert query.params == [0, 5400000, json.dumps(['PG', '"R"']), '19"%', 'genre', json.dumps(["Rock 'n' Roll"]), 1]
+
+def test_unused_filters_are_left_out():
+
+    query = MediaQuery('shows').any_of('rating', [None]).starts_with('airDate', None).tagged('genre', [" ", None])
+
+    assert query.sql() == "SELECT * FROM shows WHERE 1"
+    assert query.params == []
+
+def test_repeated_tags_count_once():
+
+    assert MediaQuery('shows').tagged('genre', ["Drama", "drama"]).params[-1] == 1
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from src.ScheduleIndex import ScheduleIndex
+from src.ScheduleRow import DailyScheduleRow
+
+DAY_MS = 86400000
+
+def row(id, startTime, endTime):
+
+    return DailyScheduleRow(id, 0, 0, "Item " + str(id), None, None, "", 0, startTime, endTime, "everyday",
+        "Movies", "/library/metadata/" + str(id), "Movies", "")
+
+def scan(schedule, nowMs):
+
+    """Every item that is on at nowMs."""
+    return [item for item in schedule
+        if item.start_ms <= nowMs < item.end_ms or nowMs + DAY_MS < item.end_ms]
+
+SCHEDULE = [
+    row(1, "00:30:00", "1900-01-01 01:00:00"),
+    row(2, "08:00:00", "1900-01-01 12:00:00"),
+    # inside item 2, and over before it is
+    row(3, "09:00:00", "1900-01-01 09:30:00"),
+    row(4, "23:00:00", "1900-01-02 00:15:00"),
+]
+
+@pytest.mark.parametrize("clock, expected, elapsed", [
+    ("00:10:00", 4, 70 * 60000),
+    ("00:20:00", None, 0),
+    ("00:30:00", 1, 0),
+    ("08:59:59", 2, 3599000),
+    ("09:10:00", 3, 600000),
+    ("10:00:00", 2, 7200000),
+    ("12:00:00", None, 0),
+    ("23:59:59", 4, 3599000),
+])
+def test_lookup(clock, expected, elapsed):
+
+    nowMs = DailyScheduleRow.parse_clock(clock) * 1000
+    item, elapsedMs = ScheduleIndex(SCHEDULE).lookup(nowMs)
+
+    assert (item.id if item is not None else None) == expected
+    assert elapsedMs == elapsed
+
+def test_lookup_matches_a_scan_of_contiguous_schedules():
+
+    rng = random.Random(3)
+    schedule = []
+    start = rng.randrange(0, 3600)
+    while start < 86400:
+        end = start + rng.randrange(15, 7200)
+        schedule.append(row(len(schedule) + 1, "%02d:%02d:%02d" % (start // 3600, start // 60 % 60, start % 60),
+            "1900-01-%02d %02d:%02d:%02d" % (1 + end // 86400, end // 3600 % 24, end // 60 % 60, end % 60)))
+        start = end + rng.choice([0, 0, 0, 30])
+    index = ScheduleIndex(schedule)
+
+    for nowMs in [rng.randrange(0, DAY_MS) for i in range(2000)]:
+        on = scan(schedule, nowMs)
+        assert index.lookup(nowMs)[0] == (on[0] if on else None)
+
+@pytest.mark.parametrize("clock, count, expected", [
+    ("08:30:00", 2, [2, 3]),
+    ("12:30:00", 3, [4, 1, 2]),
+    ("00:10:00", 2, [4, 1]),
+    ("00:10:00", 9, [4, 1, 2, 3]),
+])
+def test_upcoming(clock, count, expected):
+
+    nowMs = DailyScheduleRow.parse_clock(clock) * 1000
+
+    assert [item.id for item in ScheduleIndex(SCHEDULE).upcoming(nowMs, count)] == expected
@@ -0,0 +1,59 @@
+import datetime
+import json
+
+import pytest
+
+from src.PseudoChannelDatabase import PseudoChannelDatabase
+from src.ScheduleRow import DailyScheduleRow, EpisodeRow
+
+@pytest.fixture
+def db():
+
+    db = PseudoChannelDatabase(":memory:")
+    db.create_tables()
+    db.add_daily_schedule_to_db(2, "Pilot", 1, 1, "A Show", 1800000, "23:45:00", "1900-01-02 00:15:00.500000",
+        "everyday", "TV Shows", "/library/metadata/11", "TV Shows", "")
+    db.add_daily_schedule_to_db(0, "A Movie", None, None, "", 5400000, "08:00:00", "1900-01-01 09:30:00",
+        "everyday", "Movies", "/library/metadata/1", "Movies", "")
+    db.add_episodes_to_db(3, "Pilot", 1800000, 1, 1, "A Show", "/library/metadata/11", "TV Shows", "TV-PG", "1990-01-01", "")
+    return db
+
+def test_select_star_rows_are_typed(db):
+
+    schedule = db.get_daily_schedule()
+    episode = db.get_episode_from_plexMediaID("/library/metadata/11")
+
+    assert [type(row) for row in schedule] == [DailyScheduleRow, DailyScheduleRow]
+    assert type(episode) is EpisodeRow
+    assert db.cursor.execute("SELECT title, duration FROM episodes").fetchone() == ("Pilot", 1800000)
+
+def test_rows_read_like_the_tuples_they_replace(db):
+
+    movie = [row for row in db.get_daily_schedule() if row.sectionType == "Movies"][0]
+
+    assert movie[3] == movie.title == "A Movie"
+    assert movie[-1] == ""
+    assert movie[8:10] == ("08:00:00", "1900-01-01 09:30:00")
+    assert len(movie) == len(DailyScheduleRow.FIELDS)
+    assert json.loads(json.dumps(list(movie)))[3] == "A Movie"
+    assert DailyScheduleRow(*json.loads(json.dumps(list(movie)))) == movie
+
+def test_start_and_end_are_parsed_once(db):
+
+    show = [row for row in db.get_daily_schedule() if row.sectionType == "TV Shows"][0]
+
+    assert show.start_ms == (23 * 3600 + 45 * 60) * 1000
+    assert show.end_ms == (24 * 3600 + 15 * 60) * 1000 + 500
+    assert show.start_time == datetime.datetime(1900, 1, 1, 23, 45)
+    assert show.end_time == datetime.datetime(1900, 1, 2, 0, 15, 0, 500000)
+    assert show.display_title == "A Show - Pilot"
+
+@pytest.mark.parametrize("start, expected", [
+    ("07:05:09", 25509),
+    ("07:05:09 PM", 68709),
+    ("not a time", None),
+    (None, None),
+])
+def test_start_formats(start, expected):
+
+    assert DailyScheduleRow.parse_clock(start) == expected
@@ -0,0 +1,61 @@
+import datetime
+import itertools
+import random
+
+import pytest
+
+from src.ScheduleTime import ScheduleTime, TimeGrid
+
+def scanned_ceil(seconds, step_minutes):
+
+    """The slot the scheduler used to find by scanning every "%H:%M:%S" slot of the day."""
+    for h, m in itertools.product(range(0, 24), range(0, 60, step_minutes)):
+        if h * 3600 + m * 60 >= seconds:
+            return h * 3600 + m * 60
+
+@pytest.mark.parametrize("value, expected", [
+    ("00:00:00", 0),
+    ("07:05:09", 7 * 3600 + 5 * 60 + 9),
+    ("23:59:59", 86399),
+    (datetime.datetime(1900, 1, 2, 1, 30, 15, 500), 5415),
+    (datetime.time(12, 0), 43200),
+])
+def test_to_seconds(value, expected):
+
+    assert ScheduleTime.to_seconds(value) == expected
+
+@pytest.mark.parametrize("value", ["24:00:00", "12:60:00", "noon"])
+def test_to_seconds_rejects_invalid_times(value):
+
+    with pytest.raises(ValueError):
+        ScheduleTime.to_seconds(value)
+
+@pytest.mark.parametrize("time1, time2, expected", [
+    ("10:00:00", "10:30:00", 30),
+    ("10:30:00", "10:00:00", -30),
+    ("10:00:00", "10:00:59", 0),
+    ("10:00:59", "10:00:00", 0),
+    ("10:00:00", "09:58:30", -1),
+])
+def test_diff_minutes_truncates_towards_zero(time1, time2, expected):
+
+    assert ScheduleTime.diff_minutes(time1, time2) == expected
+
+@pytest.mark.parametrize("step", [1, 5, 7, 15, 25, 30, 45, 59, 60])
+def test_grid_matches_scanned_slots(step):
+
+    grid = TimeGrid.get(step)
+    rng = random.Random(step)
+    samples = [0, 1, grid.last - 1, grid.last] + [rng.randrange(0, grid.last) for i in range(500)]
+    for h in range(24):
+        samples.extend([h * 3600 + grid.last_in_hour, h * 3600 + grid.last_in_hour + 1])
+
+    for seconds in samples:
+        if seconds <= grid.last:
+            assert grid.ceil(seconds) == scanned_ceil(seconds, step)
+
+@pytest.mark.parametrize("step", [0, -15])
+def test_grid_rejects_non_positive_steps(step):
+
+    with pytest.raises(ValueError):
+        TimeGrid(step)
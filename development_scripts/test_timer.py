@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+import pytest
+
+from src.PseudoChannelTimer import PseudoChannelTimer
+
+class FakeClock():
+
+    def __init__(self):
+
+        self.monotonic = 1000.0
+        self.wall = datetime.datetime(2020, 6, 3, 12, 0, 0)
+
+    def advance(self, seconds):
+
+        self.monotonic += seconds
+        self.wall += datetime.timedelta(seconds=seconds)
+
+class InlineExecutor():
+
+    def submit(self, fn, *args):
+
+        fn(*args)
+
+@pytest.fixture
+def clock():
+
+    return FakeClock()
+
+@pytest.fixture
+def timer(clock):
+
+    return PseudoChannelTimer(lambda: clock.monotonic, lambda: clock.wall, InlineExecutor())
+
+def test_jobs_run_in_deadline_order_once_due(timer, clock):
+
+    ran = []
+    timer.schedule_daily("12:00:30", ran.append, "second")
+    timer.schedule_daily("12:00:10", ran.append, "first")
+
+    clock.advance(9)
+    assert timer.run_pending() == 0
+    clock.advance(25)
+    assert timer.run_pending() == 2
+
+    assert ran == ["first", "second"]
+    assert timer.pending() == []
+
+def test_drift_is_measured_against_the_deadline(timer, clock):
+
+    timer.schedule_daily("12:00:10", lambda: None, label="late")
+    clock.advance(10.25)
+    timer.run_pending()
+
+    assert timer.drift[-1][0] == "late"
+    assert timer.drift[-1][2] == 250
+    assert timer.drift_stats()['max_ms'] == 250
+
+@pytest.mark.parametrize("time_of_day, weekday, expected", [
+    ("12:30", None, datetime.datetime(2020, 6, 3, 12, 30)),
+    ("11:00:00", None, datetime.datetime(2020, 6, 4, 11, 0)),
+    ("00:00", 4, datetime.datetime(2020, 6, 5, 0, 0)),
+    ("13:00", 2, datetime.datetime(2020, 6, 3, 13, 0)),
+    ("11:00", 2, datetime.datetime(2020, 6, 10, 11, 0)),
+])
+def test_next_occurrence(timer, time_of_day, weekday, expected):
+
+    assert timer.next_occurrence(time_of_day, weekday) == expected
+
+def test_cancel_and_repeat(timer, clock):
+
+    ran = []
+    timer.schedule_daily("12:00:10", ran.append, "cancelled", tag='daily-tasks')
+    timer.schedule_weekly(2, "12:00:20", ran.append, "weekly")
+    timer.cancel('daily-tasks')
+
+    clock.advance(30)
+    timer.run_pending()
+
+    assert ran == ["weekly"]
+    assert [job.when for job in timer.pending()] == [datetime.datetime(2020, 6, 10, 12, 0, 20)]
+
+def test_run_forever_wakes_for_a_job_added_later():
+
+    timer = PseudoChannelTimer()
+    done = threading.Event()
+    thread = threading.Thread(target=timer.run_forever)
+    thread.start()
+    try:
+        timer.schedule_at(datetime.datetime.now() + datetime.timedelta(milliseconds=50), done.set)
+        assert done.wait(5)
+    finally:
+        timer.stop()
+        thread.join(5)
+    assert not thread.is_alive()
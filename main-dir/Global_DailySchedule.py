@@ -1,8 +1,21 @@
 #!/usr/bin/env python
 import os
+import sys
+import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+import pseudo_config as config
 
 channelsDir=os.path.abspath(os.path.dirname(__file__))
+LOG_FILE = "daily-schedule.log"
+
+parser = argparse.ArgumentParser(description="Generate the daily schedule of every channel")
+parser.add_argument('-j', '--jobs', type=int,
+    default=getattr(config, 'dailyScheduleWorkers', 0),
+    help='how many channels to generate at the same time (0 = one per CPU)')
+args = parser.parse_args()
+
 #get list of available channels and arrange in numerical order
 dirList = sorted(next(os.walk(channelsDir))[1])
 chanList = []
@@ -14,12 +27,42 @@ for chan in chanList:
     channelNumber = chan.split('_')
     channelNumber = channelNumber[1]
     channelsList.append(channelNumber)
-    
-#execute PseudoChannel.py -g in specified channel
-os.chdir(os.path.abspath(os.path.dirname(__file__)))
-for channel in channelsList:
-    os.chdir(os.path.abspath(os.path.dirname(__file__))+'/pseudo-channel_'+channel)
-    print("GENERATING SCHEDULE FOR CHANNEL "+channel)
-    process = subprocess.call(["python3", "-u", "PseudoChannel.py", "-g"], stdout=None, stderr=None, stdin=None)
-    os.chdir('../')
-print("ALERT: ALL DAILY SCHEDULE GENERATION COMPLETE")
\ No newline at end of file
+
+def generate_channel(channel):
+    #execute PseudoChannel.py -g in specified channel, its output going to the channel's own log
+    channelDir = os.path.join(channelsDir, 'pseudo-channel_'+channel)
+    started = perf_counter()
+    with open(os.path.join(channelDir, LOG_FILE), 'w') as log:
+        returnCode = subprocess.call(["python3", "-u", "PseudoChannel.py", "-g"], cwd=channelDir, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+    return channel, returnCode, perf_counter() - started
+
+def log_tail(channel, lines=10):
+
+    try:
+        with open(os.path.join(channelsDir, 'pseudo-channel_'+channel, LOG_FILE)) as log:
+            return log.readlines()[-lines:]
+    except OSError:
+        return []
+
+#every channel has its own database, so they are generated side by side, each in its own process
+workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+workers = max(1, min(workers, len(channelsList)))
+print("GENERATING SCHEDULES FOR {} CHANNELS, {} AT A TIME".format(len(channelsList), workers))
+started = perf_counter()
+results = []
+with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = [executor.submit(generate_channel, channel) for channel in channelsList]
+    for future in as_completed(futures):
+        channel, returnCode, seconds = future.result()
+        results.append((channel, returnCode, seconds))
+        print("{}: CHANNEL {} IN {:.1f}s".format("DONE" if returnCode == 0 else "FAILED", channel, seconds))
+
+failures = [result for result in results if result[1] != 0]
+print("INFO: Per channel wall time (log in pseudo-channel_<N>/{}):".format(LOG_FILE))
+for channel, returnCode, seconds in sorted(results, key=lambda result: channelsList.index(result[0])):
+    print("  {:>6}  {:8.1f}s  {}".format(channel, seconds, "ok" if returnCode == 0 else "exit code "+str(returnCode)))
+for channel, returnCode, seconds in failures:
+    print("ERROR: Channel {} failed, last lines of its log:".format(channel))
+    sys.stdout.write(''.join(log_tail(channel)))
+print("ALERT: ALL DAILY SCHEDULE GENERATION COMPLETE IN {:.1f}s ({} FAILED)".format(perf_counter() - started, len(failures)))
+sys.exit(1 if failures else 0)
@@ -7,12 +7,10 @@ Created on Thu Jun 28 17:33:59 2018
 """
 import sys
 import argparse
-import sqlite3
 import os
 import datetime
 import time
 import math
-from shutil import copy2
 from pseudo_config import plexLibraries as global_commercials
 from src import PseudoChannelDatabase
 
@@ -27,9 +25,13 @@ parser.add_argument('-i','--install',action='store_true',help='update ALL elemen
 parser.add_argument('-um','--update_movies',action='store_true',help='update MOVIE elements')
 parser.add_argument('-utv','--update_tv',action='store_true',help='update TV elements')
 parser.add_argument('-uc','--update_comm',action='store_true',help='update COMMERCIAL elements')
+parser.add_argument('-s','--sync',action='store_true',help='only update what changed in PLEX since the last update (default when run without arguments and a database exists)')
 args = parser.parse_args()
 
-if args.update_all or len(sys.argv) == 1 or args.install:
+os.chdir(os.path.abspath(os.path.dirname(__file__)))
+if args.sync or (len(sys.argv) == 1 and os.path.isfile("pseudo-channel.db")):
+    update_flags = '-us'
+elif args.update_all or len(sys.argv) == 1 or args.install:
     update_flags = '-u'
 else:
     update_flags=''
@@ -41,89 +43,68 @@ else:
         update_flags+=' -uc'
 
 
-update_call = "python3 PseudoChannel.py %s" % update_flags
-
+library_path = os.path.abspath("pseudo-channel.db")
+build_path = library_path + ".new"
 
 # Step ONE: Global database update 
-os.chdir(os.path.abspath(os.path.dirname(__file__)))
+# The channels (and the daemon) keep pseudo-channel.db open, so it is never renamed: the backup is taken
+# with SQLite's backup API and a full update is built in a separate file, then copied in (install_database)
 print("ACTION: Doing global update from PLEX: %s" % update_flags)
-try:
-    os.rename("pseudo-channel.db", "pseudo-channel.bak")
-except OSError:
-    pass
-try:
-    os.system(update_call)
-except:
+if os.path.isfile(library_path):
+    PseudoChannelDatabase.backup_database(library_path, "pseudo-channel.bak")
+if update_flags == '-us':
+    # a sync updates the existing database in place
+    update_call = "python3 PseudoChannel.py %s" % update_flags
+else:
+    if os.path.isfile(build_path):
+        os.remove(build_path)
+    update_call = "python3 PseudoChannel.py -db %s %s" % (os.path.basename(build_path), update_flags)
+if os.system(update_call) != 0:
     print("ERROR: Global Update Failed!")
-    os.remove("pseudo-channel.db")
-    os.rename("pseudo-channel.bak", "pseudo-channel.db")
+    if os.path.isfile(build_path):
+        os.remove(build_path)
     sys.exit()
+if update_flags != '-us':
+    PseudoChannelDatabase.install_database(build_path, library_path)
 
 
-base_dirA = os.path.dirname(os.path.abspath(__file__))
 locations = "pseudo-channel"+channel_dir_increment_symbol
 channel_dirs = [ item for item in os.listdir('.') if os.path.isdir(os.path.join('.', item)) ]
 channel_dirs = list(filter(lambda x: x.startswith(locations),channel_dirs))
 
 for channel_dir in channel_dirs:
-    # Step TWO: Go to each folder, export the following information
-    # - Show title, lastEpisodeTitle
-    # - Movie title, lastPlayedDate
-    # - Current channel schedule that the daily schedule is sourced from
-    # - Daily schedule currently being executed
+    # The channels share the database built above (see libraryDatabase in pseudo_config.py), their own
+    # pseudo-channel.db only holds their schedules, queues and the libraries they leave out. The channel
+    # dirs sit right next to this script, also when it is installed in a dir named channels/, so the
+    # default "../pseudo-channel.db" of a channel is this database either way.
     os.chdir(channel_dir)
-    
-    channel_dirA = os.path.dirname(os.path.abspath(__file__))
-    print(channel_dirA.split('/')[-1])
-    if channel_dirA.split('/')[-1] == "channels":
-        os.chdir(os.path.join(channel_dirA, channel_dir))
-        channel_dirA = os.getcwd()
-    db_path = os.path.join(channel_dirA, "pseudo-channel.db")
-    print("ACTION: Importing from " + db_path)
-        
-    try:
-        conn = sqlite3.connect(db_path)
-        table = conn.cursor()
-        
-            
-        lastEpisode_export = table.execute('SELECT lastEpisodeTitle,title FROM shows').fetchall()
-        lastEpisode_export = list(lastEpisode_export)
-        lastMovie_export = table.execute('SELECT lastPlayedDate,title FROM movies').fetchall()
-        lastMovie_export = list(lastMovie_export)
-        schedule = table.execute('SELECT * FROM schedule').fetchall()
-        daily_schedule = table.execute('SELECT * FROM daily_schedule').fetchall()
-        
-        
-        
-        conn.commit()
-        conn.close()
-    except:
-        print("NOTICE: Database experiencing errors or hasn't been formed yet; creating fresh one")
-        lastEpisode_export = []
-        lastMovie_export = []
-        schedule = []
-        daily_schedule = []
-    
-    
-    # Step THREE: Delete the previous database, replace with the recently created global one
-    print("ACTION: Copying global update to " + db_path)
-    copy2('../pseudo-channel.db','.')
-    
-    
-    # Step FOUR: Import the previous information we exported previously
-    print("ACTION: Exporting to " + db_path)
-    conn = sqlite3.connect(db_path)
-    table = conn.cursor()
-    
-    for i in range(0,len(lastEpisode_export)):
-        sql = "UPDATE shows SET lastEpisodeTitle=? WHERE title=?"
-        table.execute(sql,lastEpisode_export[i])
-        
-    for i in range(0,len(lastMovie_export)):
-        sql = "UPDATE movies SET lastPlayedDate=? WHERE title=?"
-        table.execute(sql,lastMovie_export[i])
+    db_path = os.path.abspath("pseudo-channel.db")
+    print("ACTION: Updating " + db_path)
+    db = PseudoChannelDatabase(db_path, library_path)
+    db.create_tables()
+
+    # Step TWO: A database from before the shared library holds its own copy of it, keep only its
+    # queue (lastEpisodeTitle) and movie play dates
+    if db.import_state_from_copy():
+        print("NOTICE: Replaced the copy of the library in " + db_path + " with its queue")
+
+    # Step THREE: Leave out any media not in the directories set of commercial archives
+    print("NOTICE: Trimming library at " + db_path)
+    os.system('python report_MediaFolders.py')
+    local_commercials = open('Commercial_Libraries.txt').read().splitlines()
+    local_movies = open('Movie_Libraries.txt').read().splitlines()
+    local_tvs = open('TV_Libraries.txt').read().splitlines()
+
+    db.set_library_exclusions({
+        "Commercials" : [x for x in global_commercials["Commercials"] if x not in local_commercials],
+        "Movies" : [x for x in global_commercials["Movies"] if x not in local_movies],
+        "TV Shows" : [x for x in global_commercials["TV Shows"] if x not in local_tvs],
+    })
+
+    # Step FOUR: A channel without a schedule gets a default one
+    table = db.cursor
+    schedule = db.get_schedule()
     if len(schedule) == 0:
-        #db = PseudoChannelDatabase("./pseudo-channel.db")
         print("NOTICE: Schedule Not Found, Creating Default Schedule")
         entryList = {}
         entryList['id'] = "1"
@@ -194,60 +175,8 @@ for channel_dir in channel_dirs:
                 print("INFO: "+str(timediff.seconds)+" to midnight\033[K",end='\n') 
             else:
                 endloop = 1
-    else:
-        for i in range(0,len(schedule)):
-            try:
-                sql = "INSERT INTO schedule(id,unix,mediaID,title,duration,startTime,endTime,dayOfWeek,startTimeUnix,section,strictTime,timeShift,overlapMax,xtra,rerun,year,genres,actors,collections,rating,studio,seasonEpisode)  \
-                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-                table.execute(sql,schedule[i])
-            except Exception as e:
-                print("ERROR: "+str(e))
-                print("INFO: Importing Legacy Database")
-                sql = "INSERT INTO schedule(id,unix,mediaID,title,duration,startTime,endTime,dayOfWeek,startTimeUnix,section,strictTime,timeShift,overlapMax,xtra)  \
-                    VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-                table.execute(sql,schedule[i])
-    for i in range(0,len(daily_schedule)):
-        try:
-            sql = "INSERT INTO daily_schedule(id,unix,mediaID,title,episodeNumber,seasonNumber,showTitle,duration,startTime,endTime,dayOfWeek,sectionType,plexMediaID,customSectionName,notes)  \
-                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-            table.execute(sql,daily_schedule[i])
-        except Exception as e:
-            print("ERROR: "+str(e))
-            print("INFO: Importing Legacy Database")
-            sql = "INSERT INTO daily_schedule(id,unix,mediaID,title,episodeNumber,seasonNumber,showTitle,duration,startTime,endTime,dayOfWeek,sectionType,plexMediaID,customSectionName)  \
-                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-            table.execute(sql,daily_schedule[i])
-        
-    # Step FIVE: Remove any media not in the directories set of commerical archives
-    print("NOTICE: Trimming database at " + db_path)
-    os.system('python report_MediaFolders.py')
-    local_commercials = open('Commercial_Libraries.txt').read().splitlines()
-    local_movies = open('Movie_Libraries.txt').read().splitlines()
-    local_tvs = open('TV_Libraries.txt').read().splitlines()
-    
-    commercial_removal = [x for x in global_commercials["Commercials"] if x not in local_commercials]
-    movie_removal = [x for x in global_commercials["Movies"] if x not in local_movies]
-    tv_removal = [x for x in global_commercials["TV Shows"] if x not in local_tvs]
-    
-#    print(db_path)
-#    print(local_commercials)
-#    print(global_commercials["Commercials"])
-#    print(commercial_removal)
-    
-    for commercial in commercial_removal:
-        sql = "DELETE FROM commercials WHERE customSectionName=?"
-        table.execute(sql,(commercial,))
-    for movie in movie_removal:
-        sql = "DELETE FROM movies WHERE customSectionName=?"
-        table.execute(sql,(movie,))
-    for tv in tv_removal:
-        sql = "DELETE FROM shows WHERE customSectionName=?"
-        table.execute(sql,(tv,))
-        sql = "DELETE FROM episodes WHERE customSectionName=?"
-        table.execute(sql,(tv,))
-    
-    conn.commit()
-    conn.close()
+    db.conn.commit()
+    db.conn.close()
 
     os.chdir('..')
     
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+"""
+Runs every pseudo-channel_N from one long-lived process: the schedules stay in memory, the Plex
+connection is made once, and switching channels is a command on a local socket instead of
+killing one PseudoChannel.py -r and starting another. controls.py uses it when it is running:
+
+    screen -d -m bash -c 'python3 PseudoChannelDaemon.py; exec sh'
+
+Commands (one line each, answered with one line of JSON): channel <N>, up, down, last, stop,
+restart, reload [N], status, quit
+"""
+import os
+import sys
+import json
+import signal
+import socket
+import socketserver
+import threading
+import importlib.util
+from time import perf_counter
+from plexapi.server import PlexServer
+from src import PseudoChannelDatabase
+from src import PseudoDailyScheduleController
+from src import PseudoChannelTimer
+from src import PseudoChannelRunner
+import pseudo_config as config
+
+MAIN_DIR = os.path.abspath(os.path.dirname(__file__))
+CHANNEL_DIR_PREFIX = 'pseudo-channel_'
+
+class Channel():
+
+    def __init__(self, number, directory, config, runner):
+
+        self.number = number
+        self.directory = directory
+        self.config = config
+        self.runner = runner
+
+class PseudoChannelDaemon():
+
+    def __init__(self, mainDir=MAIN_DIR):
+
+        self.main_dir = mainDir
+        self.plex = PlexServer(config.baseurl, config.token)
+        self.timer = PseudoChannelTimer()
+        self.channels = {}
+        # channel numbers in numerical order
+        self.order = []
+        self.active = None
+        self.last = None
+        self.lock = threading.Lock()
+        self.switch_ms = None
+
+    def get_channel_numbers(self):
+
+        #get list of available channels and arrange in numerical order
+        numbers = [name[len(CHANNEL_DIR_PREFIX):] for name in next(os.walk(self.main_dir))[1] if name.startswith(CHANNEL_DIR_PREFIX)]
+        return sorted(numbers, key=lambda number: (int(number) if number.isdigit() else float('inf'), number))
+
+    def load_channel_config(self, number, directory):
+
+        """The channel's own pseudo_config.py (its clients, web server, debug...)."""
+        spec = importlib.util.spec_from_file_location('pseudo_config_'+number, os.path.join(directory, 'pseudo_config.py'))
+        channelConfig = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(channelConfig)
+        return channelConfig
+
+    def find_library(self, directory, channelConfig):
+
+        return PseudoChannelDatabase.find_library(directory, getattr(channelConfig, 'libraryDatabase', PseudoChannelDatabase.LIBRARY_DATABASE))
+
+    def load_channel(self, number):
+
+        directory = os.path.join(self.main_dir, CHANNEL_DIR_PREFIX+number)
+        channelConfig = self.load_channel_config(number, directory)
+        db = PseudoChannelDatabase(os.path.join(directory, "pseudo-channel.db"), self.find_library(directory, channelConfig))
+        controller = PseudoDailyScheduleController(
+            channelConfig.baseurl,
+            channelConfig.token,
+            channelConfig.plexClients,
+            channelConfig.controllerServerPath,
+            channelConfig.controllerServerPort,
+            channelConfig.debug_mode,
+            channelConfig.htmlPseudoTitle,
+            artworkLookup=db.get_art,
+            schedulesDir=os.path.join(directory, "schedules"),
+            channelName=number,
+            plex=self.plex
+        )
+        runner = PseudoChannelRunner(db, controller, self.timer, tag='channel-'+number)
+        runner.running = False
+        self.prepare(runner)
+        return Channel(number, directory, channelConfig, runner)
+
+    def prepare(self, runner):
+
+        """Read the schedule and render the guide now, so a switch only has to play."""
+        schedule = runner.load()
+        if schedule:
+            runner.controller.get_guide(schedule)
+
+    def load(self):
+
+        for number in self.get_channel_numbers():
+            try:
+                self.channels[number] = self.load_channel(number)
+                print("NOTICE: Loaded channel {} ({} items)".format(number, len(self.channels[number].runner.schedule)))
+            except Exception as e:
+                print("ERROR: Could not load channel {}: {}".format(number, e))
+        self.order = [number for number in self.get_channel_numbers() if number in self.channels]
+
+    def switch(self, number):
+
+        """Stop the active channel and play number from where its schedule is now."""
+        channel = self.channels.get(number)
+        if channel is None:
+            return {'ok' : False, 'message' : "No channel "+str(number)}
+        started = perf_counter()
+        previous = self.active
+        if previous is not None:
+            previous.runner.stop()
+            if previous is not channel:
+                self.last = previous.number
+        self.active = channel
+        item = channel.runner.start()
+        if item is None and previous is not None and previous is not channel:
+            # nothing on now: don't leave the old channel playing
+            previous.runner.controller.stop_media()
+        self.switch_ms = (perf_counter() - started) * 1000
+        print("NOTICE: Switched to channel {} in {:.1f} ms".format(number, self.switch_ms))
+        self.preroll_neighbours()
+        return {'ok' : True, 'message' : "Playing channel "+number, 'playing' : item.title if item is not None else None}
+
+    def preroll_neighbours(self):
+
+        """Look up what is on now on the channels up / down from the active one, so the next switch
+        finds its Plex item (and clients) cached."""
+        if self.active is None or self.active.number not in self.order:
+            return
+        position = self.order.index(self.active.number)
+        for number in set([self.order[(position + 1) % len(self.order)], self.order[position - 1]]):
+            runner = self.channels[number].runner
+            if number != self.active.number and runner.schedule:
+                runner.controller.preroll_executor.submit(runner.controller.preroll, runner.upcoming(2))
+
+    def step(self, direction):
+
+        numbers = self.order
+        if not numbers:
+            return {'ok' : False, 'message' : "No channels"}
+        current = self.active.number if self.active is not None else self.last
+        position = numbers.index(current) + direction if current in numbers else 0
+        return self.switch(numbers[position % len(numbers)])
+
+    def stop(self):
+
+        if self.active is None:
+            return {'ok' : True, 'message' : "No channel playing"}
+        self.active.runner.stop()
+        self.active.runner.controller.stop_media()
+        self.last = self.active.number
+        self.active = None
+        return {'ok' : True, 'message' : "Stopped channel "+self.last}
+
+    def reload(self, number=None):
+
+        """Re-read the daily schedules (after PseudoChannel.py -g) and attach the shared library again (after
+        Global_DatabaseUpdate.py); the active channel restarts on its new schedule."""
+        if self.active is not None and (number is None or self.active.number == number):
+            self.active.runner.stop()
+        for channel in self.channels.values():
+            if number is None or channel.number == number:
+                channel.runner.db.reattach_library(self.find_library(channel.directory, channel.config))
+                self.prepare(channel.runner)
+        if self.active is not None and (number is None or self.active.number == number):
+            return self.switch(self.active.number)
+        return {'ok' : True, 'message' : "Reloaded"}
+
+    def status(self):
+
+        return {
+            'ok' : True,
+            'active' : self.active.number if self.active is not None else None,
+            'last' : self.last,
+            'channels' : self.order,
+            'switch_ms' : self.switch_ms,
+            'drift' : self.timer.drift_stats(),
+        }
+
+    def handle_command(self, line):
+
+        words = line.split()
+        if not words:
+            return {'ok' : False, 'message' : "Empty command"}
+        command, args = words[0].lower(), words[1:]
+        with self.lock:
+            if command == 'channel' and args:
+                return self.switch(args[0])
+            if command == 'up':
+                return self.step(1)
+            if command == 'down':
+                return self.step(-1)
+            if command == 'last':
+                return self.switch(self.last) if self.last is not None else {'ok' : False, 'message' : "No last channel"}
+            if command == 'restart':
+                target = self.active.number if self.active is not None else self.last
+                return self.switch(target) if target is not None else {'ok' : False, 'message' : "No channel to restart"}
+            if command == 'stop':
+                return self.stop()
+            if command == 'reload':
+                return self.reload(args[0] if args else None)
+            if command == 'status':
+                return self.status()
+            if command == 'quit':
+                self.stop()
+                self.timer.stop()
+                return {'ok' : True, 'message' : "Quitting"}
+        return {'ok' : False, 'message' : "Unknown command: "+line.strip()}
+
+class ControlHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+
+        line = self.rfile.readline().decode('utf-8')
+        try:
+            reply = self.server.daemon.handle_command(line)
+        except Exception as e:
+            reply = {'ok' : False, 'message' : "ERROR: "+str(e)}
+        self.wfile.write((json.dumps(reply)+"\n").encode('utf-8'))
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+def get_socket_path():
+
+    return os.path.join(MAIN_DIR, getattr(config, 'daemonSocket', 'pseudo-channel-daemon.sock'))
+
+def open_control_socket(daemon):
+
+    socketPath = get_socket_path()
+    if os.path.exists(socketPath):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socketPath)
+            print("ERROR: PseudoChannelDaemon.py is already running ({})".format(socketPath))
+            sys.exit(1)
+        except OSError:
+            # left over from a daemon that did not exit cleanly
+            os.remove(socketPath)
+        finally:
+            probe.close()
+    server = ControlServer(socketPath, ControlHandler)
+    server.daemon = daemon
+    threading.Thread(target=server.serve_forever, name='control-socket', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+
+    daemon = PseudoChannelDaemon()
+    daemon.load()
+    server = open_control_socket(daemon)
+    print("NOTICE: PseudoChannelDaemon listening on "+get_socket_path())
+
+    def signal_term_handler(signal, frame):
+
+        daemon.handle_command('quit')
+
+    signal.signal(signal.SIGTERM, signal_term_handler)
+    try:
+        daemon.timer.run_forever()
+    except KeyboardInterrupt:
+        print('ALERT: Manual break by user!')
+        daemon.handle_command('quit')
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.remove(get_socket_path())
@@ -5,6 +5,8 @@ import glob
 import time
 import argparse
 import subprocess
+import json
+import socket
 import pseudo_config as config
 import signal
 
@@ -21,6 +23,29 @@ def execfile(filename, globals=None, locals=None):
     with open(filename, "r") as fh:
         exec(fh.read()+"\n", globals, locals)
 
+def send_daemon_command(command, quiet=False):
+    #send a command to PseudoChannelDaemon.py, None when the daemon isn't running
+    socketPath = os.path.join(os.path.abspath(os.path.dirname(__file__)), getattr(config, 'daemonSocket', 'pseudo-channel-daemon.sock'))
+    if not os.path.exists(socketPath):
+        return None
+    data = b''
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(30)
+            s.connect(socketPath)
+            s.sendall((command+"\n").encode('utf-8'))
+            while not data.endswith(b'\n'):
+                chunk = s.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        reply = json.loads(data.decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not quiet:
+        print(("NOTICE: " if reply.get('ok') else "ERROR: ")+str(reply.get('message', reply)))
+    return reply
+
 def get_channels(channelsDir=os.path.abspath(os.path.dirname(__file__))):
     #get list of available channels and arrange in numerical order
     dirList = sorted(next(os.walk(channelsDir))[1])
@@ -210,6 +235,26 @@ parser.add_argument('-u', '--updatedatabase',
     
 args = parser.parse_args()
 
+#with PseudoChannelDaemon.py running, the channels are switched through its control socket
+if args.channel and send_daemon_command("channel "+args.channel) is not None:
+    args.channel = None
+if args.stop and send_daemon_command("stop") is not None:
+    args.stop = False
+if args.channelup and send_daemon_command("up") is not None:
+    args.channelup = False
+if args.channeldown and send_daemon_command("down") is not None:
+    args.channeldown = False
+if args.last and send_daemon_command("last") is not None:
+    args.last = False
+if args.restart and send_daemon_command("restart") is not None:
+    args.restart = False
+if args.generateschedules and send_daemon_command("status", quiet=True) is not None:
+    print("GENERATING DAILY SCHEDULES")
+    os.chdir(os.path.abspath(os.path.dirname(__file__)))
+    subprocess.call(["python3", "-u", "Global_DailySchedule.py"], stdout=None, stderr=None, stdin=None)
+    send_daemon_command("reload")
+    args.generateschedules = False
+
 if args.channel:
     print("CHECKING IF PSEUDO CHANNEL IS ALREADY RUNNING")
     playing = get_playing()